@@ -0,0 +1,175 @@
+"""오래된 done/trash todo 보관
+
+    python -m app.archive [--days n] [--batch-size n] [--interval seconds]
+
+TODO_ARCHIVE_AFTER_DAYS 동안 바뀌지 않은 done/trash todo 를 todos_archive 로 옮긴다.
+한 배치를 짧은 트랜잭션 하나로 옮기고 커밋하므로 행 잠금이 오래 유지되지 않는다.
+--interval 을 주면 그 간격으로 계속 실행한다.
+
+보관된 todo 는 해당 상태를 직접 조회할 때만 읽고, 수정하거나 삭제하면 todos 로
+되돌린 뒤 처리한다. 상태별 개수와 seq 는 보관 여부와 관계없이 유지된다.
+"""
+
+import argparse
+import asyncio
+import logging
+import sys
+from collections.abc import Iterable
+from datetime import datetime, timedelta
+
+from sqlalchemy import delete, insert, select, union_all, update
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from sqlalchemy.orm import aliased
+from sqlalchemy.orm.util import AliasedClass
+
+from app.config import settings
+from app.models import ArchivedTodo, Todo, TodoState, User
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_STATES = (TodoState.done, TodoState.trash)
+
+# todos 와 todos_archive 에 공통으로 있는 컬럼
+TODO_FIELDS = tuple(column.key for column in Todo.__table__.columns)
+
+
+def _fields(entity) -> list:
+    return [getattr(entity, field) for field in TODO_FIELDS]
+
+
+def todos_with_archive(
+    user_id: int, state: TodoState | None = None, since: int | None = None
+) -> AliasedClass[Todo]:
+    """todos 와 todos_archive 를 합친 Todo 별칭
+
+    조건을 양쪽 SELECT 에 각각 걸어 두 테이블의 (user_id, ...) 인덱스를 쓰게 한다.
+    """
+    selects = []
+    for entity in (Todo, ArchivedTodo):
+        stmt = select(*_fields(entity)).where(entity.user_id == user_id)
+        if state is not None:
+            stmt = stmt.where(entity.state == state)
+        if since is not None:
+            stmt = stmt.where(entity.seq > since)
+        selects.append(stmt)
+
+    return aliased(Todo, union_all(*selects).subquery("todos"), adapt_on_names=True)
+
+
+async def archive_batch(db: AsyncSession, before: datetime, batch_size: int) -> int:
+    """before 이전에 바뀐 done/trash todo 를 최대 batch_size 개 옮긴다, 커밋은 호출한 쪽이 한다
+
+    todo 쓰기와 같은 순서로 users 행을 먼저 잠그고 todos 를 옮긴다.
+    """
+    eligible = (Todo.state.in_(ARCHIVE_STATES), Todo.updated_at < before)
+    candidates = (
+        await db.execute(
+            select(Todo.id, Todo.user_id)
+            .where(*eligible)
+            .order_by(Todo.id)
+            .limit(batch_size)
+        )
+    ).all()
+    if not candidates:
+        return 0
+
+    # 여러 사용자를 잠그므로 id 순서로 잠가 archive 끼리도 교착되지 않게 한다
+    await db.execute(
+        select(User.id)
+        .where(User.id.in_({user_id for _, user_id in candidates}))
+        .order_by(User.id)
+        .with_for_update()
+    )
+
+    # 조회와 잠금 사이에 바뀐 행은 조건을 다시 확인해 남긴다
+    rows = (
+        await db.execute(
+            delete(Todo)
+            .where(Todo.id.in_([todo_id for todo_id, _ in candidates]), *eligible)
+            .returning(*_fields(Todo))
+        )
+    ).all()
+    if not rows:
+        return 0
+
+    await db.execute(insert(ArchivedTodo), [row._asdict() for row in rows])
+    # 목록 ETag 와 캐시가 옮겨진 행을 계속 보여주지 않도록 버전을 올린다
+    await db.execute(
+        update(User)
+        .where(User.id.in_({row.user_id for row in rows}))
+        .values(todos_version=User.todos_version + 1)
+        .execution_options(synchronize_session=False)
+    )
+    return len(rows)
+
+
+async def restore_todos(
+    db: AsyncSession, user_id: int, ids: Iterable[int]
+) -> list[int]:
+    """보관된 todo 를 todos 로 되돌리고 되돌린 id 를 돌려준다"""
+    rows = (
+        await db.execute(
+            delete(ArchivedTodo)
+            .where(ArchivedTodo.user_id == user_id, ArchivedTodo.id.in_(list(ids)))
+            .returning(*_fields(ArchivedTodo))
+        )
+    ).all()
+    if rows:
+        await db.execute(insert(Todo), [row._asdict() for row in rows])
+
+    return [row.id for row in rows]
+
+
+async def compact(
+    session_factory: async_sessionmaker[AsyncSession],
+    before: datetime,
+    batch_size: int,
+    pause: float = 0,
+) -> int:
+    """옮길 행이 없을 때까지 배치마다 새 트랜잭션으로 옮긴다"""
+    archived = 0
+    while True:
+        async with session_factory() as db:
+            moved = await archive_batch(db, before, batch_size)
+            await db.commit()
+
+        archived += moved
+        if moved < batch_size:
+            return archived
+
+        # 다른 쓰기가 끼어들 틈을 준다
+        await asyncio.sleep(pause)
+
+
+async def main(argv: list[str]):
+    from app.database import dispose_engine, get_shard_sessionmaker, shard_names
+
+    parser = argparse.ArgumentParser(prog="python -m app.archive")
+    parser.add_argument("--days", type=float, default=settings.TODO_ARCHIVE_AFTER_DAYS)
+    parser.add_argument(
+        "--batch-size", type=int, default=settings.TODO_ARCHIVE_BATCH_SIZE
+    )
+    parser.add_argument("--interval", type=float)
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    try:
+        while True:
+            before = datetime.now() - timedelta(days=args.days)
+            for shard in shard_names():
+                archived = await compact(
+                    get_shard_sessionmaker(shard),
+                    before,
+                    args.batch_size,
+                    settings.TODO_ARCHIVE_PAUSE_SECONDS,
+                )
+                logger.info("shard %s 에서 todo %d 개를 보관했습니다.", shard, archived)
+            if args.interval is None:
+                break
+            await asyncio.sleep(args.interval)
+    finally:
+        await dispose_engine()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(sys.argv[1:]))
@@ -0,0 +1,114 @@
+import time
+from collections import OrderedDict
+from collections.abc import Hashable
+from dataclasses import dataclass
+from threading import Lock
+from typing import Any
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    size: int = 0
+    bytes: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+
+class TTLCache:
+    """크기 제한(LRU)과 만료 시간(TTL)을 갖는 프로세스 내 캐시
+
+    maxbytes 를 주면 값은 bytes 여야 하고, 값 길이의 합도 그 안으로 제한한다.
+    maxbytes 보다 큰 값은 저장하지 않는다.
+    """
+
+    def __init__(self, maxsize: int, ttl: float, maxbytes: int | None = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.maxbytes = maxbytes
+        self._data: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+        self._bytes = 0
+        self._lock = Lock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self._misses += 1
+                return default
+
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                self._pop(key)
+                self._misses += 1
+                return default
+
+            self._data.move_to_end(key)
+            self._hits += 1
+            return value
+
+    def _size(self, value: Any) -> int:
+        return 0 if self.maxbytes is None else len(value)
+
+    def _pop(self, key: Hashable) -> None:
+        entry = self._data.pop(key, None)
+        if entry is not None:
+            self._bytes -= self._size(entry[1])
+
+    def _over_limit(self) -> bool:
+        if len(self._data) > self.maxsize:
+            return True
+        return self.maxbytes is not None and self._bytes > self.maxbytes
+
+    def set(self, key: Hashable, value: Any, ttl: float | None = None) -> None:
+        if self.maxsize <= 0:
+            return
+
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        if ttl <= 0:
+            return
+
+        size = self._size(value)
+        with self._lock:
+            self._pop(key)
+            if self.maxbytes is not None and size > self.maxbytes:
+                return
+
+            self._data[key] = (time.monotonic() + ttl, value)
+            self._bytes += size
+            while self._over_limit():
+                oldest = next(iter(self._data))
+                self._pop(oldest)
+                self._evictions += 1
+
+    def invalidate(self, *keys: Hashable) -> None:
+        with self._lock:
+            for key in keys:
+                self._pop(key)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self._bytes = 0
+            self._hits = self._misses = self._evictions = 0
+
+    def stats(self) -> CacheStats:
+        with self._lock:
+            return CacheStats(
+                hits=self._hits,
+                misses=self._misses,
+                evictions=self._evictions,
+                size=len(self._data),
+                bytes=self._bytes,
+            )
+
+    def __len__(self) -> int:
+        return len(self._data)
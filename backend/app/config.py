@@ -1,3 +1,4 @@
+from fastapi import Request
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 
@@ -11,6 +12,60 @@ class Settings(BaseSettings):
     CONFIRMATION_TOKEN_EXPIRE_MINUTES: int = 15
     MAILGUN_DOMAIN: str
     MAILGUN_API_KEY: str
+    MAILGUN_API_URL: str = "https://api.mailgun.net"
+    USER_CACHE_MAXSIZE: int = 1024
+    USER_CACHE_TTL_SECONDS: int = 60
+    TOKEN_CACHE_MAXSIZE: int = 4096
+    TOKEN_CACHE_TTL_SECONDS: int = 300
+    PASSWORD_HASH_WORKERS: int = 2
+    PASSWORD_HASH_QUEUE_SIZE: int = 32
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: float = 30
+    DB_POOL_RECYCLE: int = -1
+    DB_POOL_PRE_PING: bool = False
+    DATABASE_REPLICA_URLS: list[str] = []
+    DB_REPLICA_EJECT_SECONDS: float = 30
+    DB_READ_AFTER_WRITE_SECONDS: float = 5
+    DB_RECENT_WRITERS_MAXSIZE: int = 10000
+    # 이름 -> URL, DATABASE_URL 은 항상 "default" shard 이며 사용자 디렉터리를 둔다
+    DATABASE_SHARDS: dict[str, str] = {}
+    # 새 사용자를 받지 않고 rebalance 로 비울 shard
+    SHARD_DRAIN: list[str] = []
+    SHARD_VIRTUAL_NODES: int = 64
+    # shard 마다 todo id 를 이 크기의 구간에서 나눠 준다, Postgres int4 안에 들어가야 한다
+    SHARD_ID_BLOCK_SIZE: int = 100_000_000
+    SHARD_REBALANCE_PAUSE_SECONDS: float = 0.1
+    TODO_LIST_CACHE_MAXSIZE: int = 1024
+    TODO_LIST_CACHE_TTL_SECONDS: int = 60
+    # 워커 하나가 목록 응답 캐시에 쓰는 최대 바이트
+    TODO_LIST_CACHE_MAX_BYTES: int = 32 * 1024 * 1024
+    FAST_JSON_RESPONSES: bool = False
+    OUTBOX_CONCURRENCY: int = 10
+    OUTBOX_BATCH_SIZE: int = 100
+    OUTBOX_MAX_ATTEMPTS: int = 8
+    OUTBOX_BACKOFF_SECONDS: float = 5
+    OUTBOX_BACKOFF_MAX_SECONDS: float = 3600
+    OUTBOX_LEASE_SECONDS: float = 60
+    OUTBOX_POLL_INTERVAL_SECONDS: float = 1
+    LOGIN_RATE_LIMIT_IP_ATTEMPTS: int = 20
+    LOGIN_RATE_LIMIT_IP_WINDOW_SECONDS: float = 60
+    LOGIN_RATE_LIMIT_EMAIL_ATTEMPTS: int = 5
+    LOGIN_RATE_LIMIT_EMAIL_WINDOW_SECONDS: float = 60
+    LOGIN_RATE_LIMIT_MAXSIZE: int = 10000
+    DEBUG: bool = False
+    SLOW_QUERY_THRESHOLD_MS: float = 200
+    N_PLUS_ONE_THRESHOLD: int = 5
+    SSE_QUEUE_SIZE: int = 100
+    SSE_HEARTBEAT_SECONDS: float = 15
+    TODO_ARCHIVE_AFTER_DAYS: float = 30
+    TODO_ARCHIVE_BATCH_SIZE: int = 500
+    TODO_ARCHIVE_PAUSE_SECONDS: float = 0.1
 
 
 settings = Settings()
+
+
+def get_settings(request: Request) -> Settings:
+    """create_app 에 넘긴 설정, 라우터만 붙인 앱이면 기본 설정"""
+    return getattr(request.app.state, "settings", settings)
@@ -0,0 +1,121 @@
+"""사용자별 상태별 todo 개수
+
+    python -m app.counters [user_id ...]
+
+todos 를 바꾸는 쪽은 같은 트랜잭션에서 adjust_todo_counts 로 변화량을 반영한다.
+CLI 는 todos 와 todos_archive 에서 개수를 다시 계산해 카운터를 복구한다.
+"""
+
+import asyncio
+import sys
+from collections import Counter
+from collections.abc import Iterable, Mapping
+
+from sqlalchemy import delete, func, insert, select, union_all, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models import ArchivedTodo, Todo, TodoState, TodoStateCount
+
+UPSERT_DIALECTS = {
+    "postgresql": postgresql.insert,
+    "sqlite": sqlite.insert,
+}
+
+
+def count_states(states: Iterable[TodoState], sign: int = 1) -> Counter:
+    deltas = Counter()
+    for state in states:
+        deltas[state] += sign
+    return deltas
+
+
+async def adjust_todo_counts(
+    db: AsyncSession, user_id: int, deltas: Mapping[TodoState, int]
+) -> None:
+    rows = [
+        {"user_id": user_id, "state": state, "count": delta}
+        for state, delta in deltas.items()
+        if delta
+    ]
+    if not rows:
+        return
+
+    dialect = db.get_bind().dialect.name
+    upsert = UPSERT_DIALECTS.get(dialect)
+    if upsert is not None:
+        stmt = upsert(TodoStateCount)
+        await db.execute(
+            stmt.on_conflict_do_update(
+                index_elements=[TodoStateCount.user_id, TodoStateCount.state],
+                set_={"count": TodoStateCount.count + stmt.excluded.count},
+            ),
+            rows,
+        )
+        return
+
+    for row in rows:
+        result = await db.execute(
+            update(TodoStateCount)
+            .where(
+                TodoStateCount.user_id == user_id,
+                TodoStateCount.state == row["state"],
+            )
+            .values(count=TodoStateCount.count + row["count"])
+        )
+        if result.rowcount == 0:
+            await db.execute(insert(TodoStateCount), row)
+
+
+async def get_todo_counts(db: AsyncSession, user_id: int) -> dict[TodoState, int]:
+    rows = await db.execute(
+        select(TodoStateCount.state, TodoStateCount.count).where(
+            TodoStateCount.user_id == user_id
+        )
+    )
+    return dict(rows.all())
+
+
+async def recompute_todo_counts(
+    db: AsyncSession, user_ids: Iterable[int] | None = None
+) -> None:
+    """카운터를 todos 와 todos_archive 기준으로 다시 만든다, user_ids 가 없으면 전체"""
+    clear = delete(TodoStateCount)
+    todos = select(Todo.user_id, Todo.state)
+    archived = select(ArchivedTodo.user_id, ArchivedTodo.state)
+    if user_ids is not None:
+        user_ids = list(user_ids)
+        clear = clear.where(TodoStateCount.user_id.in_(user_ids))
+        todos = todos.where(Todo.user_id.in_(user_ids))
+        archived = archived.where(ArchivedTodo.user_id.in_(user_ids))
+
+    rows = union_all(todos, archived).subquery()
+    counts = select(rows.c.user_id, rows.c.state, func.count()).group_by(
+        rows.c.user_id, rows.c.state
+    )
+
+    await db.execute(clear)
+    await db.execute(
+        insert(TodoStateCount).from_select(
+            [TodoStateCount.user_id, TodoStateCount.state, TodoStateCount.count],
+            counts,
+        )
+    )
+
+
+async def main(argv: list[str]):
+    from app.database import dispose_engine, get_shard_sessionmaker, shard_names
+
+    user_ids = [int(arg) for arg in argv] or None
+    try:
+        # 사용자는 한 shard 에만 있으므로 shard 마다 그 shard 의 todo 로 계산한다
+        for shard in shard_names():
+            async with get_shard_sessionmaker(shard)() as db:
+                await recompute_todo_counts(db, user_ids)
+                await db.commit()
+    finally:
+        await dispose_engine()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(sys.argv[1:]))
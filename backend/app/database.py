@@ -1,13 +1,337 @@
-from sqlalchemy import create_engine
-from sqlalchemy.orm import Session
+import logging
+import math
+import time
+from collections.abc import AsyncIterator, Hashable
+from contextlib import asynccontextmanager
 
-from app.config import Settings
+from fastapi import Request, Response
+from sqlalchemy.engine import URL, make_url
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import (
+    AsyncEngine,
+    AsyncSession,
+    async_sessionmaker,
+    create_async_engine,
+)
 
-engine = create_engine(Settings().DATABASE_URL)
+from app.cache import TTLCache
+from app.config import Settings, settings
+from app.pool import PoolMonitor
+from app.querylog import QueryTracker
+from app.replicas import ReplicaSet
 
-# Session = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+logger = logging.getLogger(__name__)
 
+# DATABASE_URL 에 동기 드라이버가 지정되어 있으면 대응하는 async 드라이버로 바꾼다
+ASYNC_DRIVERS = {
+    "pysqlite": "aiosqlite",
+    "psycopg2": "asyncpg",
+}
 
-def get_db():
-    with Session(engine) as session:
+
+def get_async_url(url: str | URL) -> URL:
+    url = make_url(url)
+    driver = ASYNC_DRIVERS.get(url.get_driver_name())
+    if driver is None:
+        return url
+
+    return url.set(drivername=f"{url.get_backend_name()}+{driver}")
+
+
+def get_pool_options(url: URL, settings: Settings) -> dict:
+    options = {
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+    }
+
+    # 메모리 SQLite 는 StaticPool 을 쓰므로 크기 관련 옵션을 받지 않는다
+    if url.get_backend_name() == "sqlite" and url.database in (None, "", ":memory:"):
+        return options
+
+    return options | {
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+    }
+
+
+def build_engine(
+    settings: Settings,
+    monitor: PoolMonitor | None = None,
+    tracker: QueryTracker | None = None,
+    url: str | None = None,
+    pre_ping: bool | None = None,
+) -> AsyncEngine:
+    url = get_async_url(url or settings.DATABASE_URL)
+    options = get_pool_options(url, settings)
+    if pre_ping is not None:
+        options["pool_pre_ping"] = pre_ping
+    engine = create_async_engine(url, **options)
+    if monitor is not None:
+        monitor.attach(engine.sync_engine)
+    if tracker is not None:
+        tracker.attach(engine.sync_engine)
+
+    return engine
+
+
+pool_monitor = PoolMonitor()
+
+query_tracker = QueryTracker(slow_query_seconds=settings.SLOW_QUERY_THRESHOLD_MS / 1000)
+
+# 읽기 전용 메서드, 이 요청은 replica 로 보낼 수 있다
+READ_METHODS = frozenset({"GET", "HEAD", "OPTIONS"})
+# 쓰기 직후 이 쿠키가 있는 동안은 읽기도 primary 에서 한다
+LAST_WRITE_COOKIE = "db_last_write"
+
+# DATABASE_URL 의 shard 이름, 사용자 디렉터리와 outbox 도 여기에 둔다
+DEFAULT_SHARD = "default"
+
+# 엔진은 import 시점이 아니라 앱 lifespan 이나 첫 사용 시점에 만든다
+_engine: AsyncEngine | None = None
+_engine_settings: Settings | None = None
+_sessionmaker: async_sessionmaker[AsyncSession] | None = None
+_replicas = ReplicaSet([], eject_seconds=settings.DB_REPLICA_EJECT_SECONDS)
+_read_after_write_seconds = settings.DB_READ_AFTER_WRITE_SECONDS
+# 최근에 쓴 사용자, 쿠키를 보내지 않는 API 클라이언트도 자기 쓰기를 primary 에서 읽는다
+# 워커마다 따로 기록하므로 다른 워커로 간 읽기는 쿠키로만 알 수 있다
+_recent_writers = TTLCache(
+    maxsize=settings.DB_RECENT_WRITERS_MAXSIZE, ttl=_read_after_write_seconds
+)
+# 기본 shard 를 뺀 shard 이름 -> 세션 팩토리
+_shard_sessionmakers: dict[str, async_sessionmaker[AsyncSession]] = {}
+
+
+def init_engine(settings: Settings = settings) -> AsyncEngine:
+    """settings 로 엔진을 만든다
+
+    엔진은 프로세스에 하나다. 다른 설정으로 만든 엔진이 남아 있으면 그 DB 를 쓰지 않도록
+    RuntimeError 를 낸다, 설정을 바꾸려면 dispose_engine 을 먼저 호출한다.
+    """
+    global _engine, _engine_settings, _sessionmaker, _replicas
+    global _read_after_write_seconds, _recent_writers, _shard_sessionmakers
+    if _engine is not None:
+        if settings != _engine_settings:
+            raise RuntimeError("다른 설정으로 만든 엔진이 이미 있습니다.")
+        return _engine
+
+    query_tracker.slow_query_seconds = settings.SLOW_QUERY_THRESHOLD_MS / 1000
+    _engine = build_engine(settings, pool_monitor, query_tracker)
+    _sessionmaker = async_sessionmaker(_engine, expire_on_commit=False)
+    # 풀에 남은 커넥션으로는 죽은 replica 를 알 수 없으므로 꺼낼 때마다 확인한다
+    _replicas = ReplicaSet(
+        [
+            build_engine(settings, tracker=query_tracker, url=url, pre_ping=True)
+            for url in settings.DATABASE_REPLICA_URLS
+        ],
+        eject_seconds=settings.DB_REPLICA_EJECT_SECONDS,
+    )
+    _read_after_write_seconds = settings.DB_READ_AFTER_WRITE_SECONDS
+    _recent_writers = TTLCache(
+        maxsize=settings.DB_RECENT_WRITERS_MAXSIZE, ttl=_read_after_write_seconds
+    )
+    _shard_sessionmakers = {
+        name: async_sessionmaker(
+            build_engine(settings, tracker=query_tracker, url=url),
+            expire_on_commit=False,
+        )
+        for name, url in settings.DATABASE_SHARDS.items()
+        if name != DEFAULT_SHARD
+    }
+
+    _engine_settings = settings
+    return _engine
+
+
+def _ensure_engine() -> None:
+    # 앱 lifespan 밖(CLI, 워커)에서는 기본 설정으로 처음 쓸 때 만든다
+    if _engine is None:
+        init_engine()
+
+
+def get_sessionmaker() -> async_sessionmaker[AsyncSession]:
+    _ensure_engine()
+    return _sessionmaker
+
+
+def get_replicas() -> ReplicaSet:
+    return _replicas
+
+
+def shard_names() -> list[str]:
+    _ensure_engine()
+    return [DEFAULT_SHARD, *_shard_sessionmakers]
+
+
+def get_shard_sessionmaker(shard: str) -> async_sessionmaker[AsyncSession]:
+    if shard == DEFAULT_SHARD:
+        return get_sessionmaker()
+
+    _ensure_engine()
+    try:
+        return _shard_sessionmakers[shard]
+    except KeyError:
+        raise LookupError(f"설정되지 않은 shard 입니다: {shard}") from None
+
+
+async def dispose_engine() -> None:
+    global _engine, _engine_settings, _sessionmaker, _replicas, _shard_sessionmakers
+    engine, _engine, _engine_settings, _sessionmaker = _engine, None, None, None
+    replicas, _replicas = _replicas, ReplicaSet([], _replicas.eject_seconds)
+    shards, _shard_sessionmakers = _shard_sessionmakers, {}
+    if engine is not None:
+        await engine.dispose()
+    await replicas.dispose()
+    for sessionmaker in shards.values():
+        await sessionmaker.kw["bind"].dispose()
+
+
+@asynccontextmanager
+async def _primary_session(shard: str = DEFAULT_SHARD) -> AsyncIterator[AsyncSession]:
+    async with get_shard_sessionmaker(shard)() as session:
+        started = time.perf_counter()
+        await session.connection()
+        # 풀 지표는 기본 shard 의 풀만 본다
+        if shard == DEFAULT_SHARD:
+            pool_monitor.observe_wait(time.perf_counter() - started)
+
+        yield session
+
+
+@asynccontextmanager
+async def session_for_shard(
+    shard: str, session: AsyncSession, session_shard: str = DEFAULT_SHARD
+) -> AsyncIterator[AsyncSession]:
+    """shard 가 session 과 같은 DB 면 session 을, 아니면 그 shard 의 primary 세션을 연다
+
+    같은 DB 에 커넥션을 하나 더 열지 않으므로 SQLite 에서도 쓰기 잠금을 기다리지 않는다.
+    """
+    if shard == session_shard:
+        yield session
+        return
+
+    async with _primary_session(shard) as other:
+        yield other
+
+
+def _eject_replica(engine: AsyncEngine) -> None:
+    _replicas.eject(engine)
+    logger.warning(
+        "replica 연결 실패, %s 초 동안 제외합니다: %s",
+        _replicas.eject_seconds,
+        engine.url,
+    )
+
+
+async def _connect_replica() -> AsyncSession | None:
+    for engine in _replicas.candidates():
+        session = AsyncSession(engine, expire_on_commit=False)
+        try:
+            await session.connection()
+        except (DBAPIError, OSError):
+            await session.close()
+            _eject_replica(engine)
+            continue
+
+        return session
+
+    return None
+
+
+def _wrote_recently(request: Request, writer: Hashable | None = None) -> bool:
+    if writer is not None and _recent_writers.get(writer) is not None:
+        return True
+
+    try:
+        last_write = float(request.cookies.get(LAST_WRITE_COOKIE, ""))
+    except ValueError:
+        return False
+
+    return time.time() - last_write < _read_after_write_seconds
+
+
+@asynccontextmanager
+async def _read_session(
+    request: Request, writer: Hashable | None = None
+) -> AsyncIterator[AsyncSession]:
+    _ensure_engine()
+    session = None
+    if _replicas and not _wrote_recently(request, writer):
+        session = await _connect_replica()
+
+    # replica 가 없거나 모두 제외되었으면 primary 에서 읽는다
+    if session is None:
+        async with _primary_session() as session:
+            yield session
+        return
+
+    async with session:
+        try:
+            yield session
+        except DBAPIError as e:
+            # 커넥션을 얻은 뒤에 끊기면 이번 요청은 실패하고 다음 요청부터 뺀다
+            if e.connection_invalidated:
+                _eject_replica(session.bind)
+            raise
+
+
+def _mark_write(response: Response, writer: Hashable | None = None) -> None:
+    _ensure_engine()
+    if _replicas:
+        if writer is not None:
+            _recent_writers.set(writer, time.time())
+        response.set_cookie(
+            LAST_WRITE_COOKIE,
+            str(time.time()),
+            max_age=math.ceil(_read_after_write_seconds),
+            httponly=True,
+            samesite="lax",
+        )
+
+
+@asynccontextmanager
+async def request_session(
+    request: Request,
+    response: Response | None = None,
+    shard: str = DEFAULT_SHARD,
+    read: bool | None = None,
+    writer: Hashable | None = None,
+) -> AsyncIterator[AsyncSession]:
+    """요청에 쓸 shard 세션, read 를 주지 않으면 메서드로 정한다
+
+    replica 는 기본 shard 에만 있으므로 다른 shard 는 읽기도 primary 에서 한다.
+    writer 는 요청한 사용자를 가리키는 키로, 쓴 직후의 읽기를 쿠키 없이도 primary 로 보낸다.
+    """
+    if read is None:
+        read = request.method in READ_METHODS
+
+    if read and shard == DEFAULT_SHARD:
+        async with _read_session(request, writer) as session:
+            yield session
+        return
+
+    if not read and response is not None:
+        _mark_write(response, writer)
+    async with _primary_session(shard) as session:
+        yield session
+
+
+async def get_read_db(request: Request):
+    async with request_session(request, read=True) as session:
+        yield session
+
+
+async def get_write_db(request: Request, response: Response):
+    async with request_session(request, response, read=False) as session:
+        yield session
+
+
+async def get_db(request: Request, response: Response):
+    """기본 shard 의 세션, 읽기 메서드는 replica 에서 나머지는 primary 에서 연다
+
+    사용자 디렉터리처럼 모든 사용자에 걸친 데이터를 다룰 때 쓴다. 사용자의 todo 는
+    security.get_user_db 로 그 사용자의 shard 에서 읽고 쓴다. GET 이지만 쓰는 라우트는
+    get_write_db 를 쓴다.
+    """
+    async with request_session(request, response) as session:
         yield session
@@ -0,0 +1,110 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from threading import Lock
+
+from app.metrics import Histogram, HistogramSnapshot
+
+# bcrypt 한 번이 수백 ms 이므로 대기 시간 버킷도 초 단위까지 둔다
+WAIT_TIME_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+
+class ExecutorBusyError(Exception):
+    pass
+
+
+@dataclass
+class ExecutorStats:
+    queue_depth: int = 0
+    running: int = 0
+    completed: int = 0
+    rejected: int = 0
+    total_wait_seconds: float = 0.0
+    max_wait_seconds: float = 0.0
+    wait_time: HistogramSnapshot | None = None
+
+    @property
+    def avg_wait_seconds(self) -> float:
+        return self.total_wait_seconds / self.completed if self.completed else 0.0
+
+
+class BoundedExecutor:
+    """공유 threadpool 과 분리된 전용 워커 풀
+
+    실행 중인 작업과 대기 중인 작업의 합이 max_workers + max_queue 를 넘으면
+    대기열에 넣지 않고 ExecutorBusyError 를 발생시킨다.
+    """
+
+    def __init__(self, max_workers: int, max_queue: int, name: str):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.name = name
+        self._executor: ThreadPoolExecutor | None = None
+        self._lock = Lock()
+        self._pending = 0
+        self._running = 0
+        self._completed = 0
+        self._rejected = 0
+        self._total_wait = 0.0
+        self._max_wait = 0.0
+        self.wait_time = Histogram(WAIT_TIME_BUCKETS)
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.max_workers, thread_name_prefix=self.name
+            )
+        return self._executor
+
+    async def run(self, func, *args):
+        with self._lock:
+            if self._pending >= self.max_workers + self.max_queue:
+                self._rejected += 1
+                raise ExecutorBusyError(f"{self.name} 작업 대기열이 가득 찼습니다.")
+            self._pending += 1
+            executor = self._get_executor()
+
+        submitted_at = time.perf_counter()
+
+        def call():
+            wait = time.perf_counter() - submitted_at
+            with self._lock:
+                self._running += 1
+                self._total_wait += wait
+                self._max_wait = max(self._max_wait, wait)
+            self.wait_time.observe(wait)
+            try:
+                return func(*args)
+            finally:
+                with self._lock:
+                    self._running -= 1
+                    self._completed += 1
+
+        # 기다리던 요청이 취소되어도 스레드는 끝까지 돌므로 작업이 끝날 때 자리를 돌려준다
+        # 시작 전에 취소된 작업은 call 이 돌지 않고 취소 시점에 돌려준다
+        future = executor.submit(call)
+        future.add_done_callback(self._release)
+        return await asyncio.wrap_future(future)
+
+    def _release(self, future):
+        with self._lock:
+            self._pending -= 1
+
+    def stats(self) -> ExecutorStats:
+        with self._lock:
+            return ExecutorStats(
+                queue_depth=self._pending - self._running,
+                running=self._running,
+                completed=self._completed,
+                rejected=self._rejected,
+                total_wait_seconds=self._total_wait,
+                max_wait_seconds=self._max_wait,
+                wait_time=self.wait_time.snapshot(),
+            )
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
@@ -0,0 +1,138 @@
+import codecs
+import csv
+import json
+import pickle
+import tempfile
+from collections.abc import AsyncIterator, Iterator
+from typing import Literal
+
+from pydantic import ValidationError
+
+from app.schemas import TodoSchema
+
+
+class RowError(Exception):
+    pass
+
+
+async def iter_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    """바이트 청크를 줄 단위로 나눈다, 줄바꿈 문자는 유지한다"""
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    buffer = ""
+    async for chunk in chunks:
+        buffer += decoder.decode(chunk)
+        *lines, buffer = buffer.split("\n")
+        for line in lines:
+            yield line + "\n"
+
+    buffer += decoder.decode(b"", final=True)
+    if buffer:
+        yield buffer
+
+
+async def iter_ndjson(
+    lines: AsyncIterator[str],
+) -> AsyncIterator[tuple[int, dict | RowError]]:
+    line_no = 0
+    async for line in lines:
+        line_no += 1
+        if not line.strip():
+            continue
+
+        try:
+            row = json.loads(line)
+        except json.JSONDecodeError:
+            yield line_no, RowError("JSON 형식이 잘못되었습니다.")
+            continue
+
+        if not isinstance(row, dict):
+            yield line_no, RowError("각 줄은 JSON 객체여야 합니다.")
+            continue
+
+        yield line_no, row
+
+
+async def iter_csv(
+    lines: AsyncIterator[str],
+) -> AsyncIterator[tuple[int, dict | RowError]]:
+    # 따옴표 안의 줄바꿈을 처리하기 위해 따옴표 개수가 짝수가 될 때까지 줄을 모은다
+    header = None
+    record, start, line_no = "", 0, 0
+    async for line in lines:
+        line_no += 1
+        if not record:
+            start = line_no
+        record += line
+        if record.count('"') % 2:
+            continue
+
+        values = next(csv.reader([record]), [])
+        record = ""
+        if not any(value.strip() for value in values):
+            continue
+
+        if header is None:
+            header = [value.strip() for value in values]
+            continue
+
+        if len(values) != len(header):
+            yield start, RowError("컬럼 수가 헤더와 다릅니다.")
+            continue
+
+        yield start, dict(zip(header, values))
+
+    if record:
+        yield start, RowError("닫히지 않은 따옴표가 있습니다.")
+
+
+def validate_row(row: dict) -> TodoSchema:
+    try:
+        return TodoSchema.model_validate(row)
+    except ValidationError as e:
+        raise RowError(
+            "; ".join(
+                f"{'.'.join(map(str, error['loc']))}: {error['msg']}"
+                for error in e.errors()
+            )
+        )
+
+
+async def iter_todos(
+    chunks: AsyncIterator[bytes], format: Literal["ndjson", "csv"]
+) -> AsyncIterator[tuple[int, TodoSchema | RowError]]:
+    parse = iter_csv if format == "csv" else iter_ndjson
+    async for line_no, row in parse(iter_lines(chunks)):
+        if isinstance(row, RowError):
+            yield line_no, row
+            continue
+
+        try:
+            yield line_no, validate_row(row)
+        except RowError as e:
+            yield line_no, e
+
+
+class RowSpool:
+    """검증한 행을 청크 단위로 모아 두는 임시 파일, max_size 를 넘으면 디스크에 쓴다"""
+
+    def __init__(self, max_size: int):
+        self._file = tempfile.SpooledTemporaryFile(max_size=max_size)
+        self.rows = 0
+
+    def append(self, rows: list[dict]) -> None:
+        pickle.dump(rows, self._file)
+        self.rows += len(rows)
+
+    def __iter__(self) -> Iterator[list[dict]]:
+        self._file.seek(0)
+        while True:
+            try:
+                yield pickle.load(self._file)
+            except EOFError:
+                return
+
+    def __enter__(self) -> "RowSpool":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self._file.close()
@@ -1,14 +1,50 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 
-from app.routes import auth, todos, users
+from app.config import Settings, settings
+from app.database import dispose_engine, init_engine
+from app.middleware import MetricsMiddleware, QueryStatsMiddleware
+from app.routes import auth, metrics, todos, users
+from app.security import password_hasher
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    init_engine(app.state.settings)
+    yield
+    await dispose_engine()
+    password_hasher.shutdown()
+
+
+def create_app(settings: Settings = settings) -> FastAPI:
+    """settings 로 앱을 만든다
+
+    settings 는 DB 엔진(기본 DB, replica, shard 와 풀 옵션), 미들웨어, 토큰 서명과
+    만료에 쓰인다. 캐시, 비밀번호 해시 풀, 로그인 제한, 응답 옵션처럼 모듈에서 만드는
+    값은 프로세스에 하나씩이라 import 시점의 환경 설정을 따른다.
+    엔진도 프로세스에 하나이므로 다른 설정의 앱은 앞의 앱이 끝난 뒤에 시작해야 한다.
+    """
+    app = FastAPI(lifespan=lifespan)
+    app.state.settings = settings
+
+    app.add_middleware(
+        QueryStatsMiddleware,
+        n_plus_one_threshold=settings.N_PLUS_ONE_THRESHOLD,
+        debug=settings.DEBUG,
+    )
+    app.add_middleware(MetricsMiddleware, metrics=metrics.request_metrics)
+
+    app.include_router(users.router)
+    app.include_router(auth.router)
+    app.include_router(todos.router)
+    app.include_router(metrics.router)
 
-app = FastAPI()
+    @app.get("/", status_code=200)
+    def read_root():
+        return {"Hello": "World"}
 
-app.include_router(users.router)
-app.include_router(auth.router)
-app.include_router(todos.router)
+    return app
 
 
-@app.get("/", status_code=200)
-def read_root():
-    return {"Hello": "World"}
+app = create_app()
@@ -0,0 +1,138 @@
+from bisect import bisect_left
+from collections.abc import Sequence
+from dataclasses import dataclass
+from threading import Lock
+
+
+@dataclass
+class HistogramSnapshot:
+    buckets: tuple[float, ...]
+    # 각 버킷(le) 에 해당하는 누적 개수, 마지막 값은 +Inf 버킷
+    counts: tuple[int, ...]
+    sum: float
+    count: int
+
+
+class Histogram:
+    def __init__(self, buckets: Sequence[float]):
+        self.buckets = tuple(sorted(buckets))
+        self._counts = [0] * (len(self.buckets) + 1)
+        self._sum = 0.0
+        self._count = 0
+        self._lock = Lock()
+
+    def observe(self, value: float) -> None:
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            self._counts[index] += 1
+            self._sum += value
+            self._count += 1
+
+    def snapshot(self) -> HistogramSnapshot:
+        with self._lock:
+            counts = list(self._counts)
+            total, count = self._sum, self._count
+
+        cumulative = []
+        running = 0
+        for value in counts:
+            running += value
+            cumulative.append(running)
+
+        return HistogramSnapshot(
+            buckets=self.buckets, counts=tuple(cumulative), sum=total, count=count
+        )
+
+    def reset(self) -> None:
+        with self._lock:
+            self._counts = [0] * (len(self.buckets) + 1)
+            self._sum = 0.0
+            self._count = 0
+
+
+# 요청 처리 시간 버킷 (초)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+
+class RequestMetrics:
+    """route 템플릿(예: /todos/{todo_id}) 별 요청 수, 상태 코드, 처리 시간
+
+    요청마다 호출되므로 락을 쓰지 않는다, 이벤트 루프 스레드에서만 갱신하고 읽는다.
+    """
+
+    def __init__(self, buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self.in_flight = 0
+        self._requests: dict[tuple[str, str, int], int] = {}
+        self._latency: dict[tuple[str, str], Histogram] = {}
+
+    def start(self) -> None:
+        self.in_flight += 1
+
+    def finish(self, method: str, route: str, status: int, seconds: float) -> None:
+        self.in_flight -= 1
+        key = (method, route, status)
+        self._requests[key] = self._requests.get(key, 0) + 1
+        histogram = self._latency.get((method, route))
+        if histogram is None:
+            histogram = self._latency[method, route] = Histogram(self.buckets)
+        histogram.observe(seconds)
+
+    def requests(self) -> dict[tuple[str, str, int], int]:
+        return dict(self._requests)
+
+    def latency(self) -> dict[tuple[str, str], HistogramSnapshot]:
+        return {key: histogram.snapshot() for key, histogram in self._latency.items()}
+
+    def reset(self) -> None:
+        self._requests.clear()
+        self._latency.clear()
+
+
+def _format_labels(labels: dict[str, object]) -> str:
+    if not labels:
+        return ""
+    pairs = ",".join(
+        '{}="{}"'.format(
+            key,
+            str(value).replace("\\", r"\\").replace('"', r"\"").replace("\n", r"\n"),
+        )
+        for key, value in labels.items()
+    )
+    return "{" + pairs + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class PrometheusWriter:
+    """Prometheus text exposition format (0.0.4) 작성기"""
+
+    CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+    def __init__(self):
+        self._lines: list[str] = []
+
+    def metric(self, name: str, type: str, help: str) -> "PrometheusWriter":
+        self._lines.append(f"# HELP {name} {help}")
+        self._lines.append(f"# TYPE {name} {type}")
+        return self
+
+    def sample(self, name: str, value: float, **labels) -> "PrometheusWriter":
+        self._lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+        return self
+
+    def histogram(
+        self, name: str, snapshot: HistogramSnapshot, **labels
+    ) -> "PrometheusWriter":
+        for le, count in zip(snapshot.buckets + (float("inf"),), snapshot.counts):
+            self.sample(f"{name}_bucket", count, **labels, le=_format_value(le))
+        self.sample(f"{name}_sum", snapshot.sum, **labels)
+        self.sample(f"{name}_count", snapshot.count, **labels)
+        return self
+
+    def render(self) -> str:
+        return "\n".join(self._lines) + "\n"
@@ -0,0 +1,95 @@
+import logging
+import time
+
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.metrics import RequestMetrics
+from app.querylog import track_queries
+
+logger = logging.getLogger(__name__)
+
+# 어떤 route 에도 매칭되지 않은 요청, 경로를 그대로 쓰면 label 수가 무한히 늘어난다
+UNMATCHED_ROUTE = "<unmatched>"
+
+
+class MetricsMiddleware:
+    """요청 수, 상태 코드, 처리 중인 요청 수, 처리 시간을 route 템플릿 별로 기록한다
+
+    route 템플릿은 라우팅이 끝난 뒤 scope["route"] 에서 읽는다.
+    """
+
+    def __init__(self, app: ASGIApp, metrics: RequestMetrics):
+        self.app = app
+        self.metrics = metrics
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        self.metrics.start()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get("route")
+            self.metrics.finish(
+                scope["method"],
+                getattr(route, "path_format", UNMATCHED_ROUTE),
+                status_code,
+                time.perf_counter() - started,
+            )
+
+
+class QueryStatsMiddleware:
+    """요청마다 실행된 쿼리 수와 DB 시간을 집계한다
+
+    같은 문장이 n_plus_one_threshold 번 이상 실행되면 N+1 의심으로 로그를 남기고,
+    debug 모드에서는 집계를 응답 헤더로 내려준다. 스트리밍 응답의 헤더에는
+    본문을 보내기 전까지 실행된 쿼리만 포함된다.
+    """
+
+    def __init__(self, app: ASGIApp, n_plus_one_threshold: int, debug: bool = False):
+        self.app = app
+        self.n_plus_one_threshold = n_plus_one_threshold
+        self.debug = debug
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        with track_queries() as stats:
+
+            async def send_wrapper(message: Message) -> None:
+                if self.debug and message["type"] == "http.response.start":
+                    headers = MutableHeaders(scope=message)
+                    headers["X-DB-Query-Count"] = str(stats.count)
+                    headers["X-DB-Query-Time-Ms"] = f"{stats.total_seconds * 1000:.2f}"
+                    headers["X-DB-Repeated-Queries"] = str(
+                        len(stats.repeated(self.n_plus_one_threshold))
+                    )
+                await send(message)
+
+            try:
+                await self.app(scope, receive, send_wrapper)
+            finally:
+                for statement, count in stats.repeated(
+                    self.n_plus_one_threshold
+                ).items():
+                    logger.warning(
+                        "N+1 의심: %s %s 에서 같은 쿼리가 %d 번 실행되었습니다: %s",
+                        scope["method"],
+                        scope["path"],
+                        count,
+                        statement,
+                    )
@@ -1,6 +1,7 @@
+from datetime import datetime
 from enum import Enum
 
-from sqlalchemy import ForeignKey
+from sqlalchemy import DDL, ForeignKey, Index, event, func, literal
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship
 
 
@@ -12,6 +13,12 @@ class TodoState(str, Enum):
     trash = "trash"
 
 
+class OutboxStatus(str, Enum):
+    pending = "pending"
+    sent = "sent"
+    failed = "failed"
+
+
 class Base(DeclarativeBase):
     pass
 
@@ -20,23 +27,171 @@ class User(Base):
     __tablename__ = "users"
 
     id: Mapped[int] = mapped_column(primary_key=True)
-    username: Mapped[str]
+    username: Mapped[str] = mapped_column(unique=True, index=True)
     password: Mapped[str]
-    email: Mapped[str]
+    email: Mapped[str] = mapped_column(unique=True, index=True)
     is_active: Mapped[bool] = mapped_column(default=False)
+    # todo 가 바뀔 때마다 증가하며 목록 응답의 ETag 에 쓰인다
+    todos_version: Mapped[int] = mapped_column(default=0, server_default="0")
 
     todos: Mapped[list["Todo"]] = relationship(
         back_populates="user", cascade="all, delete-orphan"
     )
 
 
+# 로그인이 대소문자를 가리지 않으므로 유일성도 소문자 기준으로 지킨다
+Index("ix_users_email_lower", func.lower(User.email), unique=True)
+
+
+# 사용자 id -> shard, 기본 shard 에만 있다
+# id 는 모든 shard 에서 유일해야 하므로 여기서 발급하고 users 에 그대로 쓴다
+class UserDirectory(Base):
+    __tablename__ = "user_directory"
+    __table_args__ = ({"sqlite_autoincrement": True},)
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    username: Mapped[str] = mapped_column(unique=True)
+    email: Mapped[str] = mapped_column(unique=True)
+    shard: Mapped[str] = mapped_column(default="default", server_default="default")
+
+
+Index("ix_user_directory_email_lower", func.lower(UserDirectory.email), unique=True)
+
+
+# shard 별 todo id 시작값, shard 사이에서 사용자를 옮겨도 id 가 겹치지 않는다
+class Shard(Base):
+    __tablename__ = "shards"
+
+    name: Mapped[str] = mapped_column(primary_key=True)
+    id_base: Mapped[int] = mapped_column(unique=True)
+
+
 class Todo(Base):
     __tablename__ = "todos"
+    __table_args__ = (
+        Index("ix_todos_user_id_state_id", "user_id", "state", "id"),
+        Index("ix_todos_user_id_seq", "user_id", "seq"),
+        # 보관 테이블로 옮긴 id 를 SQLite 가 다시 쓰지 않도록 한다
+        {"sqlite_autoincrement": True},
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True)
     title: Mapped[str]
     description: Mapped[str]
     state: Mapped[TodoState]
     user_id: Mapped[int] = mapped_column(ForeignKey("users.id"))
+    # 마지막으로 바뀐 시점의 users.todos_version, GET /todos/changes 의 커서로 쓰인다
+    seq: Mapped[int] = mapped_column(default=0, server_default="0")
+    updated_at: Mapped[datetime] = mapped_column(
+        default=datetime.now, onupdate=datetime.now
+    )
 
     user: Mapped[User] = relationship(back_populates="todos")
+
+
+# 오래된 done/trash todo 를 옮겨 두는 테이블, id 와 seq 를 그대로 유지한다
+class ArchivedTodo(Base):
+    __tablename__ = "todos_archive"
+    __table_args__ = (
+        Index("ix_todos_archive_user_id_state_id", "user_id", "state", "id"),
+        Index("ix_todos_archive_user_id_seq", "user_id", "seq"),
+    )
+
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=False)
+    title: Mapped[str]
+    description: Mapped[str]
+    state: Mapped[TodoState]
+    user_id: Mapped[int] = mapped_column(ForeignKey("users.id"))
+    seq: Mapped[int]
+    updated_at: Mapped[datetime]
+    archived_at: Mapped[datetime] = mapped_column(default=datetime.now)
+
+
+# 삭제된 todo 의 기록, 변경분 동기화에서 삭제를 전달한다
+class TodoTombstone(Base):
+    __tablename__ = "todo_tombstones"
+    __table_args__ = (Index("ix_todo_tombstones_user_id_seq", "user_id", "seq"),)
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    user_id: Mapped[int] = mapped_column(ForeignKey("users.id"))
+    todo_id: Mapped[int]
+    seq: Mapped[int]
+
+
+# 사용자별 상태별 todo 개수, todo 를 쓰는 쪽이 같은 트랜잭션에서 갱신한다
+class TodoStateCount(Base):
+    __tablename__ = "todo_state_counts"
+
+    user_id: Mapped[int] = mapped_column(ForeignKey("users.id"), primary_key=True)
+    state: Mapped[TodoState] = mapped_column(primary_key=True)
+    count: Mapped[int] = mapped_column(default=0)
+
+
+class EmailOutbox(Base):
+    __tablename__ = "email_outbox"
+    __table_args__ = (
+        Index("ix_email_outbox_status_next_attempt_at", "status", "next_attempt_at"),
+    )
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    recipient: Mapped[str]
+    subject: Mapped[str]
+    body: Mapped[str]
+    status: Mapped[OutboxStatus] = mapped_column(default=OutboxStatus.pending)
+    attempts: Mapped[int] = mapped_column(default=0)
+    next_attempt_at: Mapped[datetime] = mapped_column(default=datetime.now)
+    last_error: Mapped[str | None]
+    created_at: Mapped[datetime] = mapped_column(default=datetime.now)
+    sent_at: Mapped[datetime | None]
+
+
+# 검색용 tsvector, 한국어 형태소 분석기가 없으므로 'simple' 설정을 쓴다
+# 인덱스와 쿼리가 같은 식을 써야 Postgres 가 GIN 인덱스를 사용한다
+def todo_search_vector():
+    document = Todo.title.concat(literal(" ", literal_execute=True))
+    document = document.concat(Todo.description)
+    return func.to_tsvector(literal("simple", literal_execute=True), document)
+
+
+Index("ix_todos_search", todo_search_vector(), postgresql_using="gin").ddl_if(
+    dialect="postgresql"
+)
+
+# SQLite 는 FTS5 외부 콘텐츠 테이블과 트리거로 검색 인덱스를 유지한다
+TODOS_FTS_DDL = [
+    """
+    CREATE VIRTUAL TABLE todos_fts
+    USING fts5(title, description, content='todos', content_rowid='id')
+    """,
+    """
+    CREATE TRIGGER todos_fts_insert AFTER INSERT ON todos BEGIN
+        INSERT INTO todos_fts(rowid, title, description)
+        VALUES (new.id, new.title, new.description);
+    END
+    """,
+    """
+    CREATE TRIGGER todos_fts_delete AFTER DELETE ON todos BEGIN
+        INSERT INTO todos_fts(todos_fts, rowid, title, description)
+        VALUES ('delete', old.id, old.title, old.description);
+    END
+    """,
+    """
+    CREATE TRIGGER todos_fts_update AFTER UPDATE ON todos BEGIN
+        INSERT INTO todos_fts(todos_fts, rowid, title, description)
+        VALUES ('delete', old.id, old.title, old.description);
+        INSERT INTO todos_fts(rowid, title, description)
+        VALUES (new.id, new.title, new.description);
+    END
+    """,
+]
+
+for statement in TODOS_FTS_DDL:
+    event.listen(
+        Todo.__table__, "after_create", DDL(statement).execute_if(dialect="sqlite")
+    )
+
+event.listen(
+    Todo.__table__,
+    "before_drop",
+    DDL("DROP TABLE IF EXISTS todos_fts").execute_if(dialect="sqlite"),
+)
@@ -0,0 +1,25 @@
+# 전송은 app.tasks 의 OutboxWorker 가 맡는다
+# 요청 경로에서 httpx 를 import 하지 않도록 기록하는 쪽만 분리했다
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models import EmailOutbox
+
+
+def enqueue_email(db: AsyncSession, to: str, subject: str, body: str) -> EmailOutbox:
+    """메일을 outbox 에 기록한다, 호출한 쪽의 트랜잭션과 함께 커밋된다"""
+    message = EmailOutbox(recipient=to, subject=subject, body=body)
+    db.add(message)
+    return message
+
+
+def enqueue_user_registration_email(db: AsyncSession, email: str, activation_url: str):
+    return enqueue_email(
+        db,
+        email,
+        "성공적으로 회원가입이 완료되었습니다.",
+        (
+            f"성공적으로 회원가입이 완료되었습니다. "
+            f"이메일 인증을 통해 계정을 활성화해주세요. "
+            f"인증 링크: {activation_url}"
+        ),
+    )
@@ -0,0 +1,56 @@
+import base64
+import binascii
+import json
+from collections.abc import Sequence
+from enum import Enum
+
+from fastapi import HTTPException
+from sqlalchemy import Select, tuple_
+from sqlalchemy.orm import InstrumentedAttribute
+
+
+def encode_cursor(values: Sequence) -> str:
+    values = [value.value if isinstance(value, Enum) else value for value in values]
+    raw = json.dumps(values, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, size: int) -> list:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        values = json.loads(raw)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        values = None
+
+    if not isinstance(values, list) or len(values) != size:
+        raise HTTPException(status_code=400, detail="커서가 잘못되었습니다.")
+
+    return values
+
+
+# keys 순서로 정렬하고 cursor 가 가리키는 행 다음부터 가져온다
+def apply_keyset(
+    stmt: Select, keys: Sequence[InstrumentedAttribute], cursor: str | None
+) -> Select:
+    stmt = stmt.order_by(*keys)
+    if cursor is None:
+        return stmt
+
+    values = decode_cursor(cursor, len(keys))
+    if len(keys) == 1:
+        return stmt.where(keys[0] > values[0])
+
+    return stmt.where(tuple_(*keys) > tuple(values))
+
+
+# limit + 1 개를 조회한 결과에서 다음 페이지가 있으면 잘라내고 커서를 만든다
+def split_page(
+    rows: Sequence, keys: Sequence[InstrumentedAttribute], limit: int | None
+) -> tuple[list, str | None]:
+    rows = list(rows)
+    if limit is None or limit < 1 or len(rows) <= limit:
+        return rows, None
+
+    rows = rows[:limit]
+    last = rows[-1]
+    return rows, encode_cursor([getattr(last, key.key) for key in keys])
@@ -0,0 +1,92 @@
+from dataclasses import dataclass
+from threading import Lock
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app.metrics import Histogram, HistogramSnapshot
+
+# 커넥션 checkout 대기 시간 버킷 (초)
+WAIT_TIME_BUCKETS = (0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 5)
+
+
+@dataclass
+class PoolStats:
+    size: int | None
+    checked_out: int | None
+    overflow: int | None
+    checkouts: int
+    connections_opened: int
+    connections_closed: int
+    invalidated: int
+    wait_time: HistogramSnapshot
+
+
+class PoolMonitor:
+    """pool 이벤트로 커넥션 사용량과 churn 을 집계한다
+
+    checkout 대기 시간은 pool 이벤트로 잡을 수 없으므로 세션을 여는 쪽에서
+    observe_wait 로 기록한다.
+    """
+
+    def __init__(self):
+        self.wait_time = Histogram(WAIT_TIME_BUCKETS)
+        self._engine: Engine | None = None
+        self._lock = Lock()
+        self._checkouts = 0
+        self._opened = 0
+        self._closed = 0
+        self._invalidated = 0
+
+    def attach(self, engine: Engine) -> None:
+        self._engine = engine
+        event.listen(engine, "connect", self._on_connect)
+        event.listen(engine, "checkout", self._on_checkout)
+        event.listen(engine, "close", self._on_close)
+        event.listen(engine, "close_detached", self._on_close)
+        event.listen(engine, "invalidate", self._on_invalidate)
+
+    def _on_connect(self, dbapi_connection, connection_record):
+        with self._lock:
+            self._opened += 1
+
+    def _on_checkout(self, dbapi_connection, connection_record, connection_proxy):
+        with self._lock:
+            self._checkouts += 1
+
+    def _on_close(self, dbapi_connection, *args):
+        with self._lock:
+            self._closed += 1
+
+    def _on_invalidate(self, dbapi_connection, connection_record, exception):
+        with self._lock:
+            self._invalidated += 1
+
+    def observe_wait(self, seconds: float) -> None:
+        self.wait_time.observe(seconds)
+
+    def stats(self) -> PoolStats:
+        pool = self._engine.pool if self._engine is not None else None
+
+        # StaticPool, NullPool 등은 크기 정보를 제공하지 않는다
+        def read(name):
+            method = getattr(pool, name, None)
+            return method() if method is not None else None
+
+        overflow = read("overflow")
+        with self._lock:
+            return PoolStats(
+                size=read("size"),
+                checked_out=read("checkedout"),
+                overflow=None if overflow is None else max(overflow, 0),
+                checkouts=self._checkouts,
+                connections_opened=self._opened,
+                connections_closed=self._closed,
+                invalidated=self._invalidated,
+                wait_time=self.wait_time.snapshot(),
+            )
+
+    def reset(self) -> None:
+        with self._lock:
+            self._checkouts = self._opened = self._closed = self._invalidated = 0
+        self.wait_time.reset()
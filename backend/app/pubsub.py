@@ -0,0 +1,95 @@
+import asyncio
+from collections.abc import Hashable
+from dataclasses import dataclass
+from typing import Any
+
+# 버퍼가 넘친 구독자에게 보내는 이벤트, 받은 쪽은 목록을 다시 받아야 한다
+RESET = {"type": "reset"}
+
+
+@dataclass
+class BrokerStats:
+    subscribers: int = 0
+    published: int = 0
+    dropped: int = 0
+
+
+class Subscription:
+    """구독자 하나의 크기 제한 버퍼
+
+    버퍼가 가득 차면 쌓인 이벤트를 버리고 RESET 하나만 남긴다. 느린 구독자가
+    메모리를 계속 늘리거나 발행하는 쪽을 막지 않는다.
+    """
+
+    def __init__(self, broker: "Broker", key: Hashable, maxsize: int):
+        self._broker = broker
+        self.key = key
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize)
+
+    def put(self, event: Any) -> bool:
+        try:
+            self._queue.put_nowait(event)
+            return True
+        except asyncio.QueueFull:
+            while not self._queue.empty():
+                self._queue.get_nowait()
+            self._queue.put_nowait(RESET)
+            return False
+
+    async def get(self, timeout: float | None = None) -> Any:
+        """다음 이벤트, timeout 안에 없으면 None"""
+        try:
+            return await asyncio.wait_for(self._queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    def close(self) -> None:
+        self._broker._unsubscribe(self)
+
+    def __enter__(self) -> "Subscription":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+class Broker:
+    """프로세스 내 pub/sub, 같은 이벤트 루프에서만 publish 하고 구독한다
+
+    워커가 여러 개면 각 워커가 자기 구독자에게만 전달한다.
+    """
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._subscriptions: dict[Hashable, set[Subscription]] = {}
+        self._published = 0
+        self._dropped = 0
+
+    def subscribe(self, key: Hashable) -> Subscription:
+        subscription = Subscription(self, key, self.maxsize)
+        self._subscriptions.setdefault(key, set()).add(subscription)
+        return subscription
+
+    def _unsubscribe(self, subscription: Subscription) -> None:
+        subscriptions = self._subscriptions.get(subscription.key)
+        if subscriptions is None:
+            return
+
+        subscriptions.discard(subscription)
+        if not subscriptions:
+            del self._subscriptions[subscription.key]
+
+    def publish(self, key: Hashable, *events: Any) -> None:
+        for subscription in self._subscriptions.get(key, ()):
+            for event in events:
+                if not subscription.put(event):
+                    self._dropped += 1
+                    break
+        self._published += len(events)
+
+    def stats(self) -> BrokerStats:
+        return BrokerStats(
+            subscribers=sum(map(len, self._subscriptions.values())),
+            published=self._published,
+            dropped=self._dropped,
+        )
@@ -0,0 +1,78 @@
+import logging
+import time
+from collections import Counter
+from collections.abc import Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class QueryStats:
+    count: int = 0
+    total_seconds: float = 0.0
+    # SQL 문 -> 실행 횟수, 파라미터만 다른 같은 문장은 하나로 센다
+    statements: Counter[str] = field(default_factory=Counter)
+
+    def record(self, statement: str, seconds: float) -> None:
+        self.count += 1
+        self.total_seconds += seconds
+        self.statements[statement] += 1
+
+    def repeated(self, threshold: int) -> dict[str, int]:
+        """threshold 번 이상 실행된 문장, N+1 쿼리일 가능성이 높다"""
+        return {
+            statement: count
+            for statement, count in self.statements.items()
+            if count >= threshold
+        }
+
+
+_current_stats: ContextVar[QueryStats | None] = ContextVar("query_stats", default=None)
+
+
+@contextmanager
+def track_queries() -> Iterator[QueryStats]:
+    """블록 안에서 실행된 쿼리를 집계한다, 요청 단위로는 QueryStatsMiddleware 가 연다"""
+    stats = QueryStats()
+    token = _current_stats.set(stats)
+    try:
+        yield stats
+    finally:
+        _current_stats.reset(token)
+
+
+class QueryTracker:
+    """cursor 실행 이벤트로 쿼리 수와 실행 시간을 현재 track_queries 블록에 기록한다
+
+    slow_query_seconds 이상 걸린 쿼리는 블록 밖에서 실행되어도 로그로 남긴다.
+    """
+
+    def __init__(self, slow_query_seconds: float):
+        self.slow_query_seconds = slow_query_seconds
+
+    def attach(self, engine: Engine) -> None:
+        event.listen(engine, "before_cursor_execute", self._before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", self._after_cursor_execute)
+
+    def _before_cursor_execute(
+        self, conn, cursor, statement, parameters, context, executemany
+    ):
+        context._query_started = time.perf_counter()
+
+    def _after_cursor_execute(
+        self, conn, cursor, statement, parameters, context, executemany
+    ):
+        elapsed = time.perf_counter() - context._query_started
+
+        stats = _current_stats.get()
+        if stats is not None:
+            stats.record(statement, elapsed)
+
+        if elapsed >= self.slow_query_seconds:
+            logger.warning("느린 쿼리 (%.1f ms): %s", elapsed * 1000, statement)
@@ -0,0 +1,119 @@
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from threading import Lock
+from typing import Protocol
+
+
+class RateLimitExceeded(Exception):
+    def __init__(self, scope: str, retry_after: float):
+        super().__init__(f"{scope} 요청 한도를 초과했습니다.")
+        self.scope = scope
+        self.retry_after = retry_after
+
+
+@dataclass(frozen=True)
+class RateLimit:
+    scope: str
+    attempts: int
+    window_seconds: float
+
+    @property
+    def refill_rate(self) -> float:
+        return self.attempts / self.window_seconds
+
+
+@dataclass
+class RateLimitStats:
+    allowed: int = 0
+    rejected: dict[str, int] = field(default_factory=dict)
+
+    @property
+    def total_rejected(self) -> int:
+        return sum(self.rejected.values())
+
+
+class RateLimitBackend(Protocol):
+    def acquire(self, key: str, capacity: int, refill_rate: float) -> float:
+        """토큰을 하나 소비하고 0 을, 부족하면 다시 시도할 수 있을 때까지의 초를 돌려준다"""
+        ...
+
+    def clear(self) -> None: ...
+
+
+class MemoryBackend:
+    """프로세스 내 token bucket 저장소
+
+    워커마다 따로 집계하므로 실제 한도는 워커 수만큼 늘어난다. 여러 워커가
+    한도를 공유해야 하면 같은 인터페이스로 Redis 등의 백엔드를 구현한다.
+    """
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._buckets: OrderedDict[str, tuple[float, float]] = OrderedDict()
+        self._lock = Lock()
+
+    def acquire(self, key: str, capacity: int, refill_rate: float) -> float:
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated_at = self._buckets.get(key, (capacity, now))
+            tokens = min(capacity, tokens + (now - updated_at) * refill_rate)
+
+            if tokens >= 1:
+                tokens -= 1
+                retry_after = 0.0
+            else:
+                retry_after = (1 - tokens) / refill_rate
+
+            self._buckets[key] = (tokens, now)
+            self._buckets.move_to_end(key)
+            # 가장 오래 쓰이지 않은 버킷부터 버린다, 버려진 키는 가득 찬 버킷으로 다시 시작한다
+            while len(self._buckets) > self.maxsize:
+                self._buckets.popitem(last=False)
+
+        return retry_after
+
+    def clear(self) -> None:
+        with self._lock:
+            self._buckets.clear()
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+
+class RateLimiter:
+    """scope 별 한도를 순서대로 검사한다, 하나라도 넘으면 RateLimitExceeded"""
+
+    def __init__(self, backend: RateLimitBackend, *limits: RateLimit):
+        self.backend = backend
+        self.limits = limits
+        self._lock = Lock()
+        self._allowed = 0
+        self._rejected = {limit.scope: 0 for limit in limits}
+
+    def hit(self, **keys: str) -> None:
+        for limit in self.limits:
+            key = keys.get(limit.scope)
+            if key is None or limit.attempts <= 0:
+                continue
+
+            retry_after = self.backend.acquire(
+                f"{limit.scope}:{key}", limit.attempts, limit.refill_rate
+            )
+            if retry_after > 0:
+                with self._lock:
+                    self._rejected[limit.scope] += 1
+                raise RateLimitExceeded(limit.scope, retry_after)
+
+        with self._lock:
+            self._allowed += 1
+
+    def stats(self) -> RateLimitStats:
+        with self._lock:
+            return RateLimitStats(allowed=self._allowed, rejected=dict(self._rejected))
+
+    def clear(self) -> None:
+        self.backend.clear()
+        with self._lock:
+            self._allowed = 0
+            self._rejected = dict.fromkeys(self._rejected, 0)
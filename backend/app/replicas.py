@@ -0,0 +1,60 @@
+import time
+from collections.abc import Sequence
+from dataclasses import dataclass
+
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+
+@dataclass
+class ReplicaStats:
+    replicas: int
+    healthy: int
+    ejections: int
+
+
+class ReplicaSet:
+    """읽기 replica 를 round-robin 으로 고르고 연결에 실패한 replica 는 잠시 뺀다
+
+    eject 된 replica 는 eject_seconds 가 지나면 다시 후보가 된다. 이벤트 루프
+    스레드에서만 쓰므로 잠금을 두지 않는다.
+    """
+
+    def __init__(self, engines: Sequence[AsyncEngine], eject_seconds: float):
+        self.engines = list(engines)
+        self.eject_seconds = eject_seconds
+        self._next = 0
+        self._ejected_until: dict[AsyncEngine, float] = {}
+        self._ejections = 0
+
+    def __bool__(self) -> bool:
+        return bool(self.engines)
+
+    def _is_healthy(self, engine: AsyncEngine, now: float) -> bool:
+        return self._ejected_until.get(engine, 0) <= now
+
+    def candidates(self) -> list[AsyncEngine]:
+        """이번 차례의 replica 부터 시도할 순서, eject 된 replica 는 빠진다"""
+        if not self.engines:
+            return []
+
+        start = self._next
+        self._next = (start + 1) % len(self.engines)
+        now = time.monotonic()
+        ordered = self.engines[start:] + self.engines[:start]
+        return [engine for engine in ordered if self._is_healthy(engine, now)]
+
+    def eject(self, engine: AsyncEngine) -> None:
+        self._ejected_until[engine] = time.monotonic() + self.eject_seconds
+        self._ejections += 1
+
+    def stats(self) -> ReplicaStats:
+        now = time.monotonic()
+        return ReplicaStats(
+            replicas=len(self.engines),
+            healthy=sum(self._is_healthy(engine, now) for engine in self.engines),
+            ejections=self._ejections,
+        )
+
+    async def dispose(self) -> None:
+        for engine in self.engines:
+            await engine.dispose()
@@ -1,47 +1,96 @@
+import math
 from typing import Annotated
 
-from app.database import get_db
+from app.config import get_settings, settings
+from app.database import get_read_db, session_for_shard
 from app.models import User
+from app.ratelimit import MemoryBackend, RateLimit, RateLimiter, RateLimitExceeded
 from app.schemas import Token
-from app.security import create_access_token, get_current_user, verify_password
-from fastapi import APIRouter, Depends, HTTPException
+from app.security import create_access_token, get_current_user, verify_password_async
+from app.sharding import locate_user
+from fastapi import APIRouter, Depends, HTTPException, Request, status
 from fastapi.security import OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
 
 router = APIRouter(prefix="/auth", tags=["auth"])
 
 OAuth2Form = Annotated[OAuth2PasswordRequestForm, Depends()]
-SessionDep = Annotated[Session, Depends(get_db)]
+# 로그인은 조회만 하므로 POST 지만 읽기 세션을 쓴다
+# 다른 shard 의 사용자는 그 shard 의 primary 에서 읽는다
+ReadSessionDep = Annotated[AsyncSession, Depends(get_read_db)]
+
+# 비밀번호 검증(bcrypt) 전에 IP 와 대상 이메일 기준으로 로그인 시도를 제한한다
+login_rate_limiter = RateLimiter(
+    MemoryBackend(maxsize=settings.LOGIN_RATE_LIMIT_MAXSIZE),
+    RateLimit(
+        "ip",
+        settings.LOGIN_RATE_LIMIT_IP_ATTEMPTS,
+        settings.LOGIN_RATE_LIMIT_IP_WINDOW_SECONDS,
+    ),
+    RateLimit(
+        "email",
+        settings.LOGIN_RATE_LIMIT_EMAIL_ATTEMPTS,
+        settings.LOGIN_RATE_LIMIT_EMAIL_WINDOW_SECONDS,
+    ),
+)
+
+
+def check_login_rate_limit(request: Request, email: str) -> None:
+    ip = request.client.host if request.client else "unknown"
+    try:
+        login_rate_limiter.hit(ip=ip, email=email)
+    except RateLimitExceeded as e:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="로그인 시도가 너무 많습니다. 잠시 후 다시 시도해주세요.",
+            headers={"Retry-After": str(math.ceil(e.retry_after))},
+        )
 
 
 @router.post("/token", response_model=Token)
-def login_for_access_token(
+async def login_for_access_token(
     form_data: OAuth2Form,
-    db: SessionDep,
+    db: ReadSessionDep,
+    request: Request,
 ):
-    user = db.query(User).filter(User.email == form_data.username).first()
+    email = form_data.username.lower()
+    check_login_rate_limit(request, email)
+
+    user = None
+    shard = await locate_user(email)
+    if shard is not None:
+        async with session_for_shard(shard, db) as shard_db:
+            user = await shard_db.scalar(
+                select(User).where(func.lower(User.email) == email)
+            )
 
     if not user:
         raise HTTPException(
             status_code=400, detail="이메일 또는 비밀번호가 틀렸습니다."
         )
 
-    if not verify_password(form_data.password, user.password):
+    if not await verify_password_async(form_data.password, user.password):
         raise HTTPException(
             status_code=400, detail="이메일 또는 비밀번호가 틀렸습니다."
         )
     if not user.is_active:
         raise HTTPException(status_code=400, detail="계정이 활성화 되지 않았습니다.")
 
-    access_token = create_access_token(data={"sub": user.email})
+    access_token = create_access_token(
+        data={"sub": user.email}, settings=get_settings(request)
+    )
 
     return {"access_token": access_token, "token_type": "bearer"}
 
 
 @router.post("/refresh_token", response_model=Token)
-def refresh_access_token(
+async def refresh_access_token(
+    request: Request,
     user: User = Depends(get_current_user),
 ):
-    new_access_token = create_access_token(data={"sub": user.email})
+    new_access_token = create_access_token(
+        data={"sub": user.email}, settings=get_settings(request)
+    )
 
     return {"access_token": new_access_token, "token_type": "bearer"}
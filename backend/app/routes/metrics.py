@@ -0,0 +1,148 @@
+from fastapi import APIRouter
+from fastapi.responses import Response
+
+from app.database import get_replicas, pool_monitor
+from app.metrics import PrometheusWriter, RequestMetrics
+from app.routes.auth import login_rate_limiter
+from app.routes.todos import todo_events, todo_list_cache
+from app.security import claims_cache, password_hasher, user_cache
+from app.sharding import user_shard_cache
+
+router = APIRouter(tags=["metrics"])
+
+request_metrics = RequestMetrics()
+
+CACHES = {
+    "user": user_cache,
+    "claims": claims_cache,
+    "todo_list": todo_list_cache,
+    "user_shard": user_shard_cache,
+}
+
+
+def write_request_metrics(writer: PrometheusWriter) -> None:
+    writer.metric("http_requests_total", "counter", "HTTP 요청 수")
+    for (method, route, status), count in sorted(request_metrics.requests().items()):
+        writer.sample(
+            "http_requests_total", count, method=method, route=route, status=status
+        )
+
+    writer.metric(
+        "http_request_duration_seconds", "histogram", "HTTP 요청 처리 시간 (초)"
+    )
+    for (method, route), snapshot in sorted(request_metrics.latency().items()):
+        writer.histogram(
+            "http_request_duration_seconds", snapshot, method=method, route=route
+        )
+
+    writer.metric("http_requests_in_flight", "gauge", "처리 중인 HTTP 요청 수")
+    writer.sample("http_requests_in_flight", request_metrics.in_flight)
+
+
+def write_pool_metrics(writer: PrometheusWriter) -> None:
+    stats = pool_monitor.stats()
+    for name, value in (
+        ("size", stats.size),
+        ("checked_out", stats.checked_out),
+        ("overflow", stats.overflow),
+    ):
+        if value is not None:
+            writer.metric(f"db_pool_{name}", "gauge", f"커넥션 풀 {name}")
+            writer.sample(f"db_pool_{name}", value)
+
+    for name, value in (
+        ("checkouts", stats.checkouts),
+        ("connections_opened", stats.connections_opened),
+        ("connections_closed", stats.connections_closed),
+        ("invalidated", stats.invalidated),
+    ):
+        writer.metric(f"db_pool_{name}_total", "counter", f"커넥션 풀 {name}")
+        writer.sample(f"db_pool_{name}_total", value)
+
+    writer.metric("db_pool_wait_seconds", "histogram", "커넥션 checkout 대기 시간 (초)")
+    writer.histogram("db_pool_wait_seconds", stats.wait_time)
+
+
+def write_replica_metrics(writer: PrometheusWriter) -> None:
+    stats = get_replicas().stats()
+    writer.metric("db_replicas", "gauge", "설정된 읽기 replica 수")
+    writer.sample("db_replicas", stats.replicas)
+    writer.metric("db_replicas_healthy", "gauge", "제외되지 않은 읽기 replica 수")
+    writer.sample("db_replicas_healthy", stats.healthy)
+    writer.metric(
+        "db_replica_ejections_total", "counter", "연결 실패로 replica 를 제외한 횟수"
+    )
+    writer.sample("db_replica_ejections_total", stats.ejections)
+
+
+def write_password_hasher_metrics(writer: PrometheusWriter) -> None:
+    stats = password_hasher.stats()
+    writer.metric("password_hasher_queue_depth", "gauge", "대기 중인 해시 작업 수")
+    writer.sample("password_hasher_queue_depth", stats.queue_depth)
+    writer.metric("password_hasher_running", "gauge", "실행 중인 해시 작업 수")
+    writer.sample("password_hasher_running", stats.running)
+    writer.metric("password_hasher_completed_total", "counter", "완료된 해시 작업 수")
+    writer.sample("password_hasher_completed_total", stats.completed)
+    writer.metric("password_hasher_rejected_total", "counter", "거절된 해시 작업 수")
+    writer.sample("password_hasher_rejected_total", stats.rejected)
+    writer.metric(
+        "password_hasher_wait_seconds", "histogram", "해시 작업의 대기열 대기 시간 (초)"
+    )
+    writer.histogram("password_hasher_wait_seconds", stats.wait_time)
+    writer.metric(
+        "password_hasher_max_wait_seconds", "gauge", "해시 작업의 최대 대기 시간 (초)"
+    )
+    writer.sample("password_hasher_max_wait_seconds", stats.max_wait_seconds)
+
+
+def write_cache_metrics(writer: PrometheusWriter) -> None:
+    stats = {name: cache.stats() for name, cache in CACHES.items()}
+    for field, type in (
+        ("hits", "counter"),
+        ("misses", "counter"),
+        ("evictions", "counter"),
+        ("size", "gauge"),
+        ("bytes", "gauge"),
+    ):
+        name = f"cache_{field}_total" if type == "counter" else f"cache_{field}"
+        writer.metric(name, type, f"프로세스 내 캐시 {field}")
+        for cache, cache_stats in stats.items():
+            writer.sample(name, getattr(cache_stats, field), cache=cache)
+
+
+def write_rate_limit_metrics(writer: PrometheusWriter) -> None:
+    stats = login_rate_limiter.stats()
+    writer.metric("login_attempts_allowed_total", "counter", "허용된 로그인 시도 수")
+    writer.sample("login_attempts_allowed_total", stats.allowed)
+    writer.metric(
+        "login_attempts_rejected_total", "counter", "한도 초과로 거절된 로그인 시도 수"
+    )
+    for scope, count in stats.rejected.items():
+        writer.sample("login_attempts_rejected_total", count, scope=scope)
+
+
+def write_event_metrics(writer: PrometheusWriter) -> None:
+    stats = todo_events.stats()
+    writer.metric("todo_stream_subscribers", "gauge", "GET /todos/stream 구독자 수")
+    writer.sample("todo_stream_subscribers", stats.subscribers)
+    writer.metric("todo_events_published_total", "counter", "발행된 todo 이벤트 수")
+    writer.sample("todo_events_published_total", stats.published)
+    writer.metric(
+        "todo_events_dropped_total", "counter", "버퍼가 넘쳐 reset 으로 바뀐 구독 수"
+    )
+    writer.sample("todo_events_dropped_total", stats.dropped)
+
+
+# request_metrics 를 이벤트 루프 스레드에서 읽도록 async 로 둔다
+@router.get("/metrics", include_in_schema=False)
+async def read_metrics():
+    writer = PrometheusWriter()
+    write_request_metrics(writer)
+    write_pool_metrics(writer)
+    write_replica_metrics(writer)
+    write_password_hasher_metrics(writer)
+    write_cache_metrics(writer)
+    write_rate_limit_metrics(writer)
+    write_event_metrics(writer)
+
+    return Response(writer.render(), media_type=PrometheusWriter.CONTENT_TYPE)
@@ -1,88 +1,586 @@
-from typing import Annotated
+import csv
+import io
+import json
+from collections import Counter
+from collections.abc import Iterable
+from datetime import datetime
+from typing import Annotated, Literal
 
-from app.database import get_db
-from app.models import Todo, User
-from app.schemas import Message, TodoList, TodoPublic, TodoSchema, TodoUpdate
-from app.security import get_current_user
-from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
+from app.archive import ARCHIVE_STATES, restore_todos, todos_with_archive
+from app.cache import TTLCache
+from app.config import settings
+from app.counters import adjust_todo_counts, count_states, get_todo_counts
+from app.etag import etag_matches, make_etag
+from app.importer import RowError, RowSpool, iter_todos
+from app.models import ArchivedTodo, Todo, TodoState, TodoTombstone, User
+from app.pagination import apply_keyset, split_page
+from app.pubsub import RESET, Broker, Subscription
+from app.schemas import (
+    Message,
+    TodoBatchCreate,
+    TodoBatchDelete,
+    TodoBatchResponse,
+    TodoBatchUpdate,
+    TodoChanges,
+    TodoImportResult,
+    TodoList,
+    TodoPublic,
+    TodoSchema,
+    TodoStats,
+    TodoUpdate,
+    todo_list_adapter,
+)
+from app.search import apply_search
+from app.security import (
+    create_user_moved_exception,
+    forget_user,
+    get_current_user,
+    get_user_db,
+)
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import Response, StreamingResponse
+from sqlalchemy import delete, insert, select, update
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
 
 router = APIRouter(prefix="/todos", tags=["todos"])
 
 CurrentUser = Annotated[User, Depends(get_current_user)]
-SessionDep = Annotated[Session, Depends(get_db)]
+SessionDep = Annotated[AsyncSession, Depends(get_user_db)]
+
+TODO_ORDERINGS = {
+    "id": (Todo.id,),
+    "state": (Todo.state, Todo.id),
+}
+
+TODO_NOT_FOUND = "Todo를 찾을 수 없습니다."
+
+TODO_COLUMNS = (Todo.id, Todo.title, Todo.description, Todo.state)
+EXPORT_BATCH_SIZE = 1000
+EXPORT_MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv; charset=utf-8",
+}
+
+IMPORT_CHUNK_SIZE = 1000
+IMPORT_MAX_ERRORS = 100
+# 이보다 큰 본문은 검증한 행을 디스크에 모은다
+IMPORT_SPOOL_MAX_SIZE = 8 * 1024 * 1024
+IMPORT_COLUMNS = ("title", "description", "state", "user_id", "seq", "updated_at")
+
+SSE_RETRY_MILLISECONDS = 3000
+
+# 사용자 id -> 커밋된 todo 변경 이벤트, GET /todos/stream 구독자에게 전달된다
+todo_events = Broker(maxsize=settings.SSE_QUEUE_SIZE)
+
+# ETag -> 직렬화된 목록 응답, limit 없는 목록도 담기므로 바이트 합으로도 제한한다
+todo_list_cache = TTLCache(
+    maxsize=settings.TODO_LIST_CACHE_MAXSIZE,
+    ttl=settings.TODO_LIST_CACHE_TTL_SECONDS,
+    maxbytes=settings.TODO_LIST_CACHE_MAX_BYTES,
+)
+
+
+def _check_user_version(user: User, version: int | None) -> int:
+    # 사용자 행이 없으면 캐시된 스냅샷과 위치가 옮기기 전의 shard 를 가리킨다
+    if version is None:
+        forget_user(user.email)
+        raise create_user_moved_exception()
+
+    return version
+
+
+async def _get_todos_version(db: AsyncSession, user: User, lock: bool = False) -> int:
+    """현재 버전, lock 이면 버전을 올리지 않고 users 행만 커밋까지 잠근다"""
+    stmt = select(User.todos_version).where(User.id == user.id)
+    if lock:
+        stmt = stmt.with_for_update()
+    return _check_user_version(user, await db.scalar(stmt))
+
+
+async def _bump_todos_version(db: AsyncSession, user: User) -> int:
+    """새 버전을 돌려준다, 이번 트랜잭션에서 바뀐 todo 의 seq 로 쓴다
+
+    users 행의 잠금이 커밋까지 유지되므로 같은 사용자의 쓰기는 seq 순서대로 커밋된다.
+    shard 를 옮기는 동안에도 이 잠금에서 기다린다.
+    """
+    version = await db.scalar(
+        update(User)
+        .where(User.id == user.id)
+        .values(todos_version=User.todos_version + 1)
+        .returning(User.todos_version)
+        .execution_options(synchronize_session=False)
+    )
+    return _check_user_version(user, version)
+
+
+async def _write_tombstones(
+    db: AsyncSession, user_id: int, seq: int, todo_ids: Iterable[int]
+):
+    await db.execute(
+        insert(TodoTombstone),
+        [{"user_id": user_id, "todo_id": todo_id, "seq": seq} for todo_id in todo_ids],
+    )
+
+
+def _todo_event(type: str, todo: Todo) -> dict:
+    return {
+        "type": type,
+        "seq": todo.seq,
+        "todo": TodoPublic.model_validate(todo, from_attributes=True).model_dump(
+            mode="json"
+        ),
+    }
+
+
+def _deleted_event(todo_id: int, seq: int) -> dict:
+    return {"type": "deleted", "seq": seq, "id": todo_id}
 
 
 @router.post("/", response_model=TodoPublic)
-def create_todo(todo: TodoSchema, user: CurrentUser, db: Session = Depends(get_db)):
+async def create_todo(todo: TodoSchema, user: CurrentUser, db: SessionDep):
+    seq = await _bump_todos_version(db, user)
     db_todo = Todo(
         title=todo.title,
         description=todo.description,
         state=todo.state,
         user_id=user.id,
+        seq=seq,
     )
     db.add(db_todo)
-    db.commit()
-    db.refresh(db_todo)
+    await adjust_todo_counts(db, user.id, {todo.state: 1})
+    await db.commit()
+    await db.refresh(db_todo)
+    todo_events.publish(user.id, _todo_event("created", db_todo))
 
     return db_todo
 
 
 @router.get("/", response_model=TodoList)
-def get_todos(
+async def get_todos(
+    request: Request,
     db: SessionDep,
     user: CurrentUser,
     title: str = Query(None),
     description: str = Query(None),
     state: str = Query(None),
-    offset: int = Query(None),
-    limit: int = Query(None),
+    offset: int = Query(None, ge=0),
+    limit: int = Query(None, ge=1),
+    cursor: str = Query(None),
+    order: Literal["id", "state"] = Query("id"),
+    q: str = Query(None),
 ):
-    q = db.query(Todo).filter(Todo.user_id == user.id)
+    # 버전과 쿼리 파라미터가 같으면 todos 테이블을 읽지 않고 응답한다
+    version = await _get_todos_version(db, user)
+    etag = make_etag(user.id, version, sorted(request.query_params.multi_items()))
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+
+    content = todo_list_cache.get(etag)
+    if content is not None:
+        return Response(content, media_type="application/json", headers=headers)
+
+    fast = settings.FAST_JSON_RESPONSES
+    todo = _todo_source(user.id, state)
+    keys = [getattr(todo, key.key) for key in TODO_ORDERINGS[order]]
+    stmt = select(*_columns(todo)) if fast else select(todo)
+    stmt = stmt.where(todo.user_id == user.id)
 
     if title:
-        q = q.filter(Todo.title.contains(title))
+        stmt = stmt.where(todo.title.contains(title))
 
     if description:
-        q = q.filter(Todo.description.contains(description))
+        stmt = stmt.where(todo.description.contains(description))
 
     if state:
-        q = q.filter(Todo.state == state)
+        stmt = stmt.where(todo.state == state)
 
-    todos = q.offset(offset).limit(limit).all()
+    # 검색 결과는 관련도 순이므로 커서 대신 offset 으로만 페이지를 나눈다
+    if q and q.strip():
+        if cursor:
+            raise HTTPException(
+                status_code=400, detail="검색 결과에는 커서를 사용할 수 없습니다."
+            )
+        stmt = apply_search(stmt, q, db.get_bind().dialect.name, todo)
+        stmt = stmt.offset(offset).limit(limit)
+    else:
+        stmt = apply_keyset(stmt, keys, cursor).offset(offset)
+        if limit is not None:
+            stmt = stmt.limit(limit + 1)
 
-    return {"todos": todos}
+    result = await db.execute(stmt) if fast else await db.scalars(stmt)
+    if q and q.strip():
+        todos, next_cursor = result.all(), None
+    else:
+        todos, next_cursor = split_page(result, keys, limit)
 
+    if fast:
+        content = todo_list_adapter.dump_json(
+            {"todos": [todo._asdict() for todo in todos], "next_cursor": next_cursor}
+        )
+    else:
+        content = (
+            TodoList.model_validate(
+                {"todos": todos, "next_cursor": next_cursor}, from_attributes=True
+            )
+            .model_dump_json()
+            .encode()
+        )
+    todo_list_cache.set(etag, content)
 
-@router.patch("/{todo_id}", response_model=TodoPublic)
-def patch_todo(todo_id: int, db: SessionDep, user: CurrentUser, todo: TodoUpdate):
-    db_todo = (
-        db.query(Todo).filter(Todo.user_id == user.id, Todo.id == todo_id).scalar()
+    return Response(content, media_type="application/json", headers=headers)
+
+
+def _todo_source(user_id: int, state: str | None):
+    """done/trash 를 직접 조회할 때만 보관 테이블을 함께 읽는다"""
+    if state in ARCHIVE_STATES:
+        return todos_with_archive(user_id, state=state)
+    return Todo
+
+
+def _columns(todo) -> tuple:
+    return tuple(getattr(todo, column.key) for column in TODO_COLUMNS)
+
+
+def _encode_ndjson(rows) -> str:
+    return "".join(
+        json.dumps(
+            {"id": id, "title": title, "description": description, "state": state},
+            ensure_ascii=False,
+        )
+        + "\n"
+        for id, title, description, state in rows
     )
 
+
+def _encode_csv(rows) -> str:
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(rows)
+    return buffer.getvalue()
+
+
+async def _stream_export(bind: AsyncEngine, stmt, format: str):
+    # 의존성으로 받은 세션은 응답 전송 전에 닫히므로 스트리밍용 세션을 따로 연다
+    async with AsyncSession(bind) as session:
+        if format == "csv":
+            yield _encode_csv([[column.key for column in TODO_COLUMNS]])
+
+        encode = _encode_csv if format == "csv" else _encode_ndjson
+        result = await session.stream(stmt)
+        async for rows in result.partitions():
+            yield encode(
+                (id, title, desc, state.value) for id, title, desc, state in rows
+            )
+
+
+@router.get("/stats", response_model=TodoStats)
+async def get_todo_stats(db: SessionDep, user: CurrentUser):
+    await _get_todos_version(db, user)
+    counts = await get_todo_counts(db, user.id)
+
+    return {state.value: count for state, count in counts.items()} | {
+        "total": sum(counts.values())
+    }
+
+
+@router.get("/changes", response_model=TodoChanges)
+async def get_todo_changes(
+    db: SessionDep, user: CurrentUser, since: int = Query(0, ge=0)
+):
+    # 버전을 먼저 읽는다, 그 뒤에 커밋된 변경은 이번 응답에 섞여도 다음 요청에서 다시 온다
+    seq = await _get_todos_version(db, user)
+    if since > seq:
+        raise HTTPException(
+            status_code=410,
+            detail="since 가 현재 seq 보다 큽니다. 목록을 다시 받으세요.",
+        )
+
+    todo = todos_with_archive(user.id, since=since)
+    todos = await db.scalars(select(todo).order_by(todo.seq, todo.id))
+    deleted = await db.execute(
+        select(TodoTombstone.todo_id, TodoTombstone.seq)
+        .where(TodoTombstone.user_id == user.id, TodoTombstone.seq > since)
+        .order_by(TodoTombstone.seq, TodoTombstone.todo_id)
+    )
+
+    return {
+        "todos": todos.all(),
+        "deleted": [
+            {"id": todo_id, "seq": deleted_seq} for todo_id, deleted_seq in deleted
+        ],
+        "seq": seq,
+    }
+
+
+async def _stream_events(subscription: Subscription):
+    with subscription:
+        yield f"retry: {SSE_RETRY_MILLISECONDS}\n\n"
+        while True:
+            event = await subscription.get(timeout=settings.SSE_HEARTBEAT_SECONDS)
+            if event is None:
+                # 프록시가 유휴 연결을 끊지 않도록 주석 줄을 보낸다
+                yield ": keep-alive\n\n"
+                continue
+
+            yield f"event: {event['type']}\ndata: {json.dumps(event)}\n\n"
+
+
+@router.get("/stream")
+async def stream_todos(db: SessionDep, user: CurrentUser):
+    await _get_todos_version(db, user)
+    # 응답을 시작하기 전에 구독해야 그 사이의 이벤트를 놓치지 않는다
+    # 의존성 세션은 스트리밍 전에 닫히므로 연결은 DB 커넥션을 잡고 있지 않는다
+    subscription = todo_events.subscribe(user.id)
+
+    return StreamingResponse(
+        _stream_events(subscription),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.get("/export")
+async def export_todos(
+    db: SessionDep,
+    user: CurrentUser,
+    format: Literal["ndjson", "csv"] = Query("ndjson"),
+    state: TodoState = Query(None),
+):
+    await _get_todos_version(db, user)
+    todo = _todo_source(user.id, state)
+    stmt = (
+        select(*_columns(todo))
+        .where(todo.user_id == user.id)
+        .order_by(todo.id)
+        .execution_options(yield_per=EXPORT_BATCH_SIZE)
+    )
+    if state:
+        stmt = stmt.where(todo.state == state)
+
+    return StreamingResponse(
+        _stream_export(db.bind, stmt, format),
+        media_type=EXPORT_MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="todos.{format}"'},
+    )
+
+
+async def _write_import_chunk(db: AsyncSession, rows: list[dict]):
+    if db.get_bind().dialect.driver == "asyncpg":
+        # Postgres 에서는 COPY 로 executemany 보다 훨씬 빠르게 적재한다
+        connection = await db.connection()
+        raw = await connection.get_raw_connection()
+        # COPY 는 컬럼 기본값을 채우지 않는다
+        updated_at = datetime.now()
+        await raw.driver_connection.copy_records_to_table(
+            Todo.__tablename__,
+            records=[
+                (
+                    row["title"],
+                    row["description"],
+                    row["state"].name,
+                    row["user_id"],
+                    row["seq"],
+                    updated_at,
+                )
+                for row in rows
+            ],
+            columns=IMPORT_COLUMNS,
+        )
+        return
+
+    await db.execute(insert(Todo.__table__), rows)
+
+
+@router.post("/import", response_model=TodoImportResult)
+async def import_todos(
+    request: Request,
+    db: SessionDep,
+    user: CurrentUser,
+    format: Literal["ndjson", "csv"] = Query("ndjson"),
+):
+    failed = 0
+    errors = []
+    states = Counter()
+    # 느린 업로드가 사용자의 쓰기를 막지 않도록 본문을 다 받고 검증한 뒤에 잠근다
+    with RowSpool(IMPORT_SPOOL_MAX_SIZE) as spool:
+        chunk = []
+        async for line_no, todo in iter_todos(request.stream(), format):
+            if isinstance(todo, RowError):
+                failed += 1
+                if len(errors) < IMPORT_MAX_ERRORS:
+                    errors.append({"line": line_no, "detail": str(todo)})
+                continue
+
+            chunk.append(todo.model_dump())
+            if len(chunk) >= IMPORT_CHUNK_SIZE:
+                spool.append(chunk)
+                chunk = []
+        if chunk:
+            spool.append(chunk)
+
+        imported = spool.rows
+        if imported:
+            # 가져온 행은 모두 같은 seq 를 갖는다
+            seq = await _bump_todos_version(db, user)
+            for chunk in spool:
+                rows = [row | {"user_id": user.id, "seq": seq} for row in chunk]
+                await _write_import_chunk(db, rows)
+                states.update(row["state"] for row in chunk)
+            await adjust_todo_counts(db, user.id, states)
+        else:
+            await _get_todos_version(db, user)
+
+    await db.commit()
+    if imported:
+        # 행마다 이벤트를 보내지 않고 목록을 다시 받도록 한다
+        todo_events.publish(user.id, RESET)
+
+    return {"imported": imported, "failed": failed, "errors": errors}
+
+
+# 배치 요청은 각 항목을 하나의 트랜잭션 안에서 다중 행 INSERT/UPDATE/DELETE 로 처리한다
+@router.post("/batch", response_model=TodoBatchResponse)
+async def create_todos_batch(batch: TodoBatchCreate, user: CurrentUser, db: SessionDep):
+    seq = await _bump_todos_version(db, user)
+    rows = [
+        todo.model_dump() | {"user_id": user.id, "seq": seq} for todo in batch.todos
+    ]
+    todos = await db.scalars(
+        insert(Todo).returning(Todo, sort_by_parameter_order=True), rows
+    )
+    results = [{"id": todo.id, "status": 201, "todo": todo} for todo in todos]
+    await adjust_todo_counts(db, user.id, count_states(row["state"] for row in rows))
+    await db.commit()
+    todo_events.publish(
+        user.id, *(_todo_event("created", result["todo"]) for result in results)
+    )
+
+    return {"results": results}
+
+
+@router.patch("/batch", response_model=TodoBatchResponse)
+async def patch_todos_batch(batch: TodoBatchUpdate, user: CurrentUser, db: SessionDep):
+    # 읽기 전에 users 행부터 잠가 그 사이에 archive 가 행을 옮기지 못하게 한다
+    await _get_todos_version(db, user, lock=True)
+    ids = {item.id for item in batch.todos}
+    owned_stmt = select(Todo.id).where(Todo.user_id == user.id, Todo.id.in_(ids))
+    owned = set(await db.scalars(owned_stmt))
+    seq = None
+    if ids - owned:
+        seq = await _bump_todos_version(db, user)
+        if await restore_todos(db, user.id, ids - owned):
+            owned = set(await db.scalars(owned_stmt))
+
+    columns = Todo.__table__.columns.keys()
+    rows = []
+    for item in batch.todos:
+        values = item.model_dump(exclude_unset=True, exclude={"id"})
+        values = {key: value for key, value in values.items() if key in columns}
+        if item.id in owned and values:
+            rows.append(values | {"id": item.id})
+
+    if rows:
+        seq = seq or await _bump_todos_version(db, user)
+        await db.execute(update(Todo), [row | {"seq": seq} for row in rows])
+
+    todos = {
+        todo.id: todo
+        for todo in await db.scalars(select(Todo).where(Todo.id.in_(list(owned))))
+    }
+    await db.commit()
+    updated = {row["id"] for row in rows}
+    todo_events.publish(
+        user.id, *(_todo_event("updated", todos[todo_id]) for todo_id in updated)
+    )
+
+    results = [
+        {"id": item.id, "status": 200, "todo": todos[item.id]}
+        if item.id in owned
+        else {"id": item.id, "status": 404, "detail": TODO_NOT_FOUND}
+        for item in batch.todos
+    ]
+
+    return {"results": results}
+
+
+@router.delete("/batch", response_model=TodoBatchResponse)
+async def delete_todos_batch(batch: TodoBatchDelete, user: CurrentUser, db: SessionDep):
+    # 지우기 전에 users 행부터 잠근다, 지운 행이 없으면 되돌린다
+    seq = await _bump_todos_version(db, user)
+    deleted = {}
+    for entity in (Todo, ArchivedTodo):
+        missing = set(batch.ids) - deleted.keys()
+        if not missing:
+            break
+        rows = await db.execute(
+            delete(entity)
+            .where(entity.user_id == user.id, entity.id.in_(missing))
+            .returning(entity.id, entity.state)
+        )
+        deleted |= dict(rows.all())
+    if deleted:
+        await _write_tombstones(db, user.id, seq, deleted)
+        await adjust_todo_counts(db, user.id, count_states(deleted.values(), -1))
+        await db.commit()
+        todo_events.publish(
+            user.id, *(_deleted_event(todo_id, seq) for todo_id in deleted)
+        )
+    else:
+        await db.rollback()
+
+    results = [
+        {"id": todo_id, "status": 200}
+        if todo_id in deleted
+        else {"id": todo_id, "status": 404, "detail": TODO_NOT_FOUND}
+        for todo_id in batch.ids
+    ]
+
+    return {"results": results}
+
+
+async def _get_todo(db: AsyncSession, user_id: int, todo_id: int) -> Todo | None:
+    stmt = select(Todo).where(Todo.user_id == user_id, Todo.id == todo_id)
+    db_todo = await db.scalar(stmt)
+    # 보관된 todo 는 todos 로 되돌린 뒤 수정하거나 삭제한다
+    if db_todo is None and await restore_todos(db, user_id, [todo_id]):
+        db_todo = await db.scalar(stmt)
+
+    return db_todo
+
+
+@router.patch("/{todo_id}", response_model=TodoPublic)
+async def patch_todo(todo_id: int, db: SessionDep, user: CurrentUser, todo: TodoUpdate):
+    # users 행을 먼저 잠근다, 404 면 커밋하지 않으므로 올린 버전도 되돌아간다
+    seq = await _bump_todos_version(db, user)
+    db_todo = await _get_todo(db, user.id, todo_id)
+
     if not db_todo:
-        raise HTTPException(status_code=404, detail="Todo를 찾을 수 없습니다.")
+        raise HTTPException(status_code=404, detail=TODO_NOT_FOUND)
 
+    db_todo.seq = seq
     for key, value in todo.model_dump(exclude_unset=True).items():
         setattr(db_todo, key, value)
 
     db.add(db_todo)
-    db.commit()
-    db.refresh(db_todo)
+    await db.commit()
+    todo_events.publish(user.id, _todo_event("updated", db_todo))
 
     return db_todo
 
 
 @router.delete("/{todo_id}", response_model=Message)
-def delete_todo(todo_id: int, db: SessionDep, user: CurrentUser):
-    db_todo = (
-        db.query(Todo).filter(Todo.user_id == user.id, Todo.id == todo_id).scalar()
-    )
+async def delete_todo(todo_id: int, db: SessionDep, user: CurrentUser):
+    seq = await _bump_todos_version(db, user)
+    db_todo = await _get_todo(db, user.id, todo_id)
 
     if not db_todo:
-        raise HTTPException(status_code=404, detail="Todo를 찾을 수 없습니다.")
+        raise HTTPException(status_code=404, detail=TODO_NOT_FOUND)
 
-    db.delete(db_todo)
-    db.commit()
+    await db.delete(db_todo)
+    await _write_tombstones(db, user.id, seq, [todo_id])
+    await adjust_todo_counts(db, user.id, {db_todo.state: -1})
+    await db.commit()
+    todo_events.publish(user.id, _deleted_event(todo_id, seq))
 
     return {"message": f"Todo:{todo_id}가 성공적으로 삭제 되었습니다."}
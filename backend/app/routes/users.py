@@ -1,104 +1,218 @@
 from typing import Annotated
 
-from app.database import get_db
-from app.models import User
-from app.schemas import Message, UserPublic, UserSchema
+from app.config import get_settings, settings
+from app.database import DEFAULT_SHARD, get_db, get_write_db, session_for_shard
+from app.models import (
+    ArchivedTodo,
+    Todo,
+    TodoStateCount,
+    TodoTombstone,
+    User,
+    UserDirectory,
+)
+from app.pagination import apply_keyset, split_page
+from app.schemas import Message, UserList, UserPublic, UserSchema, user_list_adapter
 from app.security import (
     create_confirmation_token,
+    forget_user,
     get_current_user,
-    get_password_hash,
+    get_password_hash_async,
     get_subject_for_token_type,
+    get_user_db,
+    get_user_shard,
+    invalidate_user_cache,
 )
-from app.tasks import send_user_registration_email
-from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Request, status
-from sqlalchemy.orm import Session
+from app.outbox import enqueue_user_registration_email
+from app.sharding import locate_user, place_user
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from fastapi.responses import Response
+from sqlalchemy import delete, func, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
 
 router = APIRouter(prefix="/users", tags=["users"])
 
-SessionDep = Annotated[Session, Depends(get_db)]
+# 사용자 디렉터리가 있는 기본 shard 세션
+SessionDep = Annotated[AsyncSession, Depends(get_db)]
+WriteSessionDep = Annotated[AsyncSession, Depends(get_write_db)]
+# 토큰 사용자의 shard 세션
+UserSessionDep = Annotated[AsyncSession, Depends(get_user_db)]
+UserShard = Annotated[str, Depends(get_user_shard)]
 CurrentUser = Annotated[User, Depends(get_current_user)]
 
+USER_COLUMNS = (UserDirectory.id, UserDirectory.username, UserDirectory.email)
+
+
+async def _check_user_available(
+    directory: AsyncSession, user: UserSchema, user_id: int | None = None
+) -> None:
+    """username 이나 email 을 다른 사용자가 쓰고 있으면 400"""
+    q = select(UserDirectory).where(
+        or_(
+            UserDirectory.username == user.username,
+            func.lower(UserDirectory.email) == user.email.lower(),
+        )
+    )
+    if user_id is not None:
+        q = q.where(UserDirectory.id != user_id)
+    db_user = await directory.scalar(q.limit(1))
+
+    if db_user and db_user.username == user.username:
+        raise HTTPException(status_code=400, detail="Username이 이미 존재합니다.")
+
+    if db_user:
+        raise HTTPException(status_code=400, detail="Email이 이미 존재합니다.")
+
 
 @router.post("/", status_code=status.HTTP_201_CREATED, response_model=Message)
-def create_user(
+async def create_user(
     user: UserSchema,
     db: SessionDep,
-    background_tasks: BackgroundTasks,
     request: Request,
 ):
-    db_user = db.query(User).filter(User.username == user.username).first()
-
-    if db_user:
-        raise HTTPException(status_code=400, detail="Username이 이미 존재합니다.")
-
-    hashed_password = get_password_hash(user.password)
+    await _check_user_available(db, user)
+
+    hashed_password = await get_password_hash_async(user.password)
+
+    # 디렉터리에서 id 를 받고 그 id 로 사용자가 놓일 shard 를 정한다
+    entry = UserDirectory(username=user.username, email=user.email)
+    db.add(entry)
+    await db.flush()
+    entry.shard = place_user(entry.id)
+
+    # 메일은 디렉터리와 같은 트랜잭션으로 outbox 에 기록하고 워커가 전송한다
+    enqueue_user_registration_email(
+        db,
+        entry.email,
+        activation_url=str(
+            request.url_for(
+                "confirm_email",
+                token=create_confirmation_token(
+                    data={"sub": entry.email}, settings=get_settings(request)
+                ),
+            )
+        ),
+    )
 
     db_user = User(
+        id=entry.id,
         email=user.email,
         username=user.username,
         password=hashed_password,
     )
-
-    db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
-    background_tasks.add_task(
-        send_user_registration_email,
-        db_user.email,
-        activation_url=request.url_for(
-            "confirm_email",
-            token=create_confirmation_token(data={"sub": db_user.email}),
-        ),
-    )
+    async with session_for_shard(entry.shard, db) as shard_db:
+        shard_db.add(db_user)
+        if shard_db is db:
+            await db.commit()
+        else:
+            # 사용자를 먼저 만들어 디렉터리가 없는 사용자를 가리키지 않게 한다
+            await shard_db.commit()
+            try:
+                await db.commit()
+            except Exception:
+                await shard_db.delete(db_user)
+                await shard_db.commit()
+                raise
 
     return {"message": "유저가 생성되었습니다. 이메일을 확인해주세요."}
 
 
-@router.get("/", status_code=status.HTTP_200_OK, response_model=list[UserPublic])
-def read_users(db: SessionDep, skip: int = 0, limit: int = 100):
-    users = db.query(User).offset(skip).limit(limit).all()
-    return users
+@router.get("/", status_code=status.HTTP_200_OK, response_model=UserList)
+async def read_users(
+    db: SessionDep,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1),
+    cursor: str | None = None,
+):
+    fast = settings.FAST_JSON_RESPONSES
+    keys = (UserDirectory.id,)
+    q = select(*USER_COLUMNS) if fast else select(UserDirectory)
+    q = apply_keyset(q, keys, cursor).offset(skip).limit(limit + 1)
+    result = await db.execute(q) if fast else await db.scalars(q)
+    users, next_cursor = split_page(result, keys, limit)
+
+    if fast:
+        content = user_list_adapter.dump_json(
+            {"users": [user._asdict() for user in users], "next_cursor": next_cursor}
+        )
+        return Response(content, media_type="application/json")
+
+    return {"users": users, "next_cursor": next_cursor}
 
 
 @router.put("/{user_id}", status_code=status.HTTP_200_OK, response_model=UserPublic)
-def update_user(
+async def update_user(
     user_id: int,
     user: UserSchema,
-    db: SessionDep,
+    db: UserSessionDep,
+    shard: UserShard,
     current_user: CurrentUser,
 ):
     if current_user.id != user_id:
         raise HTTPException(status_code=400, detail="권한이 없습니다.")
 
-    current_user.username = user.username
-    current_user.password = get_password_hash(user.password)
-    current_user.email = user.email
-
-    db.commit()
-    db.refresh(current_user)
+    old_email = current_user.email
+    async with session_for_shard(DEFAULT_SHARD, db, shard) as directory:
+        await _check_user_available(directory, user, user_id)
+
+        current_user.username = user.username
+        current_user.password = await get_password_hash_async(user.password)
+        current_user.email = user.email
+
+        await directory.execute(
+            update(UserDirectory)
+            .where(UserDirectory.id == user_id)
+            .values(username=user.username, email=user.email)
+        )
+        if directory is not db:
+            await directory.commit()
+    await db.commit()
+    forget_user(old_email, user.email)
+    await db.refresh(current_user)
 
     return current_user
 
 
 @router.delete("/{user_id}", response_model=Message)
-def delete_user(
+async def delete_user(
     user_id: int,
-    db: SessionDep,
+    db: UserSessionDep,
+    shard: UserShard,
     current_user: CurrentUser,
 ):
     if current_user.id != user_id:
         raise HTTPException(status_code=400, detail="권한이 없습니다.")
 
-    db.delete(current_user)
-    db.commit()
+    email = current_user.email
+    # todo 쓰기와 같은 순서로 users 행을 먼저 잠근다
+    await db.execute(select(User.id).where(User.id == user_id).with_for_update())
+    # cascade 로 todo 를 하나씩 불러오지 않도록 벌크 삭제한다
+    await db.execute(delete(Todo).where(Todo.user_id == user_id))
+    await db.execute(delete(ArchivedTodo).where(ArchivedTodo.user_id == user_id))
+    await db.execute(delete(TodoStateCount).where(TodoStateCount.user_id == user_id))
+    await db.execute(delete(TodoTombstone).where(TodoTombstone.user_id == user_id))
+    await db.execute(delete(User).where(User.id == user_id))
+    await db.commit()
+    # 디렉터리는 사용자를 지운 뒤에 지운다, 실패해도 같은 email 로 다시 가입할 수 없을 뿐이다
+    async with session_for_shard(DEFAULT_SHARD, db, shard) as directory:
+        await directory.execute(
+            delete(UserDirectory).where(UserDirectory.id == user_id)
+        )
+        await directory.commit()
+    forget_user(email)
 
     return {"message": "User deleted"}
 
 
 @router.get("/confirm/{token}", response_model=Message)
-def confirm_email(token: str, db: SessionDep):
-    email = get_subject_for_token_type(token, "confirmation")
-    db.query(User).filter(User.email == email).update({"is_active": True})
-    db.commit()
+async def confirm_email(token: str, db: WriteSessionDep, request: Request):
+    email = get_subject_for_token_type(token, "confirmation", get_settings(request))
+    shard = await locate_user(email)
+    if shard is not None:
+        async with session_for_shard(shard, db) as shard_db:
+            await shard_db.execute(
+                update(User).where(User.email == email).values(is_active=True)
+            )
+            await shard_db.commit()
+    invalidate_user_cache(email)
 
     return {"message": "Email confirmed"}
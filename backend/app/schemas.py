@@ -1,4 +1,5 @@
-from pydantic import BaseModel, ConfigDict, EmailStr
+from pydantic import BaseModel, ConfigDict, EmailStr, Field, TypeAdapter
+from typing_extensions import TypedDict
 
 from app.models import TodoState
 
@@ -20,6 +21,11 @@ class UserPublic(BaseModel):
     model_config = ConfigDict(from_attributes=True)
 
 
+class UserList(BaseModel):
+    users: list[UserPublic]
+    next_cursor: str | None = None
+
+
 class Token(BaseModel):
     access_token: str
     token_type: str
@@ -44,9 +50,106 @@ class TodoPublic(BaseModel):
 
 class TodoList(BaseModel):
     todos: list[TodoPublic]
+    next_cursor: str | None = None
 
 
 class TodoUpdate(BaseModel):
     title: str | None = None
     description: str | None = None
     completed: str | None = None
+
+
+class TodoChange(TodoPublic):
+    seq: int
+
+
+class TodoDeleted(BaseModel):
+    id: int
+    seq: int
+
+
+# todos 와 deleted 를 seq 순서로 합쳐 적용한다, 다음 요청의 since 는 seq
+class TodoChanges(BaseModel):
+    todos: list[TodoChange]
+    deleted: list[TodoDeleted]
+    seq: int
+
+
+class TodoStats(BaseModel):
+    draft: int = 0
+    todo: int = 0
+    doing: int = 0
+    done: int = 0
+    trash: int = 0
+    total: int = 0
+
+
+TODO_BATCH_MAX_SIZE = 1000
+
+
+class TodoBatchCreate(BaseModel):
+    todos: list[TodoSchema] = Field(min_length=1, max_length=TODO_BATCH_MAX_SIZE)
+
+
+class TodoBatchUpdateItem(TodoUpdate):
+    id: int
+
+
+class TodoBatchUpdate(BaseModel):
+    todos: list[TodoBatchUpdateItem] = Field(
+        min_length=1, max_length=TODO_BATCH_MAX_SIZE
+    )
+
+
+class TodoBatchDelete(BaseModel):
+    ids: list[int] = Field(min_length=1, max_length=TODO_BATCH_MAX_SIZE)
+
+
+class TodoBatchResult(BaseModel):
+    id: int | None = None
+    status: int
+    todo: TodoPublic | None = None
+    detail: str | None = None
+
+
+class TodoBatchResponse(BaseModel):
+    results: list[TodoBatchResult]
+
+
+class TodoImportError(BaseModel):
+    line: int
+    detail: str
+
+
+class TodoImportResult(BaseModel):
+    imported: int
+    failed: int
+    errors: list[TodoImportError]
+
+
+# 목록 응답의 빠른 경로: 컬럼만 조회한 행을 검증 없이 바로 JSON 바이트로 직렬화한다
+class TodoRow(TypedDict):
+    id: int
+    title: str
+    description: str
+    state: TodoState
+
+
+class TodoListRows(TypedDict):
+    todos: list[TodoRow]
+    next_cursor: str | None
+
+
+class UserRow(TypedDict):
+    id: int
+    username: str
+    email: str
+
+
+class UserListRows(TypedDict):
+    users: list[UserRow]
+    next_cursor: str | None
+
+
+todo_list_adapter = TypeAdapter(TodoListRows)
+user_list_adapter = TypeAdapter(UserListRows)
@@ -0,0 +1,40 @@
+from sqlalchemy import Select, column, func, literal, or_, table
+
+from app.models import Todo, todo_search_vector
+
+todos_fts = table("todos_fts", column("rowid"), column("rank"), column("todos_fts"))
+
+
+# FTS5 문법 문자가 그대로 해석되지 않도록 각 단어를 따옴표로 감싼다
+def to_fts5_query(q: str) -> str:
+    return " ".join('"' + term.replace('"', '""') + '"' for term in q.split())
+
+
+def apply_search(stmt: Select, q: str, dialect: str, entity=Todo) -> Select:
+    """q 와 일치하는 todo 만 남기고 관련도 순으로 정렬한다
+
+    검색 인덱스는 todos 에만 있으므로 보관 테이블을 합친 entity 는 부분 문자열로 찾는다.
+    """
+    if entity is not Todo:
+        dialect = None
+
+    if dialect == "postgresql":
+        query = func.plainto_tsquery(literal("simple", literal_execute=True), q)
+        vector = todo_search_vector()
+        return stmt.where(vector.op("@@")(query)).order_by(
+            func.ts_rank(vector, query).desc(), Todo.id
+        )
+
+    if dialect == "sqlite":
+        # bm25 기반 rank 는 값이 작을수록 관련도가 높다
+        return (
+            stmt.join(todos_fts, todos_fts.c.rowid == Todo.id)
+            .where(todos_fts.c.todos_fts.op("MATCH")(to_fts5_query(q)))
+            .order_by(todos_fts.c.rank, Todo.id)
+        )
+
+    terms = [
+        or_(entity.title.contains(term), entity.description.contains(term))
+        for term in q.split()
+    ]
+    return stmt.where(*terms).order_by(entity.id)
@@ -1,20 +1,52 @@
+import time
 from datetime import datetime, timedelta
+from functools import cache
 from typing import Literal
 
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Request, Response, status
 from fastapi.security import OAuth2PasswordBearer
 from jwt import DecodeError, ExpiredSignatureError, decode, encode
-from passlib.context import CryptContext
-from sqlalchemy.orm import Session
-
-from app.config import settings
-from app.database import get_db
+from sqlalchemy import inspect, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import make_transient_to_detached
+
+from app.cache import TTLCache
+from app.config import Settings, get_settings, settings
+from app.database import request_session
+from app.executor import BoundedExecutor, ExecutorBusyError
 from app.models import User
+from app.sharding import forget_user_location, is_sharded, locate_user, relocate_user
+
+
+# passlib import 와 CryptContext 생성은 첫 해시 계산 때로 미룬다
+@cache
+def get_pwd_context():
+    from passlib.context import CryptContext
+
+    return CryptContext(schemes=["bcrypt"], deprecated="auto")
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/token")
 
+# bcrypt 는 요청당 수백 ms 를 쓰므로 FastAPI 의 공유 threadpool 대신 전용 풀에서 돌린다
+password_hasher = BoundedExecutor(
+    max_workers=settings.PASSWORD_HASH_WORKERS,
+    max_queue=settings.PASSWORD_HASH_QUEUE_SIZE,
+    name="password-hasher",
+)
+
+# 토큰 subject(email) -> User 컬럼 스냅샷
+# 워커 간 무효화는 하지 않으므로 TTL 이 다른 워커에서의 최대 지연 시간이 된다
+user_cache = TTLCache(
+    maxsize=settings.USER_CACHE_MAXSIZE, ttl=settings.USER_CACHE_TTL_SECONDS
+)
+
+# (서명 키, 원본 토큰) -> 서명 검증이 끝난 페이로드, 토큰의 exp 이후로는 남지 않는다
+# 키를 함께 넣어 다른 설정으로 만든 앱이 검증한 토큰을 재사용하지 않는다
+claims_cache = TTLCache(
+    maxsize=settings.TOKEN_CACHE_MAXSIZE, ttl=settings.TOKEN_CACHE_TTL_SECONDS
+)
+
 
 def create_credentials_exception(detail: str) -> HTTPException:
     return HTTPException(
@@ -24,7 +56,15 @@ def create_credentials_exception(detail: str) -> HTTPException:
     )
 
 
-def create_access_token(data: dict):
+def create_user_moved_exception() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="사용자 데이터를 옮기고 있습니다. 잠시 후 다시 시도해주세요.",
+        headers={"Retry-After": "1"},
+    )
+
+
+def create_access_token(data: dict, settings: Settings = settings):
     to_encode = data.copy()
 
     expire = datetime.now() + timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
@@ -33,7 +73,7 @@ def create_access_token(data: dict):
     return encoded_jwt
 
 
-def create_confirmation_token(data: dict):
+def create_confirmation_token(data: dict, settings: Settings = settings):
     to_encode = data.copy()
     expire = datetime.now() + timedelta(
         minutes=settings.CONFIRMATION_TOKEN_EXPIRE_MINUTES
@@ -43,8 +83,12 @@ def create_confirmation_token(data: dict):
     return encoded_jwt
 
 
-# 특정 type 에 대한 페이로드의 sub 을 가져온다
-def get_subject_for_token_type(token: str, type: Literal["access", "confirmation"]):
+def decode_token(token: str, settings: Settings = settings) -> dict:
+    key = (settings.SECRET_KEY, token)
+    payload = claims_cache.get(key)
+    if payload is not None:
+        return payload
+
     try:
         payload = decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
     except ExpiredSignatureError:
@@ -52,6 +96,20 @@ def get_subject_for_token_type(token: str, type: Literal["access", "confirmation
     except DecodeError:
         raise create_credentials_exception("토큰이 잘못되었습니다.")
 
+    exp = payload.get("exp")
+    claims_cache.set(key, payload, ttl=None if exp is None else exp - time.time())
+
+    return payload
+
+
+# 특정 type 에 대한 페이로드의 sub 을 가져온다
+def get_subject_for_token_type(
+    token: str,
+    type: Literal["access", "confirmation"],
+    settings: Settings = settings,
+):
+    payload = decode_token(token, settings)
+
     email = payload.get("sub")
 
     if not email:
@@ -66,19 +124,95 @@ def get_subject_for_token_type(token: str, type: Literal["access", "confirmation
 
 
 def get_password_hash(password: str):
-    return pwd_context.hash(password)
+    return get_pwd_context().hash(password)
 
 
 def verify_password(plain_password: str, hashed_password: str):
-    return pwd_context.verify(plain_password, hashed_password)
+    return get_pwd_context().verify(plain_password, hashed_password)
+
+
+async def _run_password_hasher(func, *args):
+    try:
+        return await password_hasher.run(func, *args)
+    except ExecutorBusyError:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="요청이 많습니다. 잠시 후 다시 시도해주세요.",
+            headers={"Retry-After": "1"},
+        )
+
 
+async def get_password_hash_async(password: str):
+    return await _run_password_hasher(get_password_hash, password)
 
-def get_current_user(
-    db: Session = Depends(get_db), token: str = Depends(oauth2_scheme)
+
+async def verify_password_async(plain_password: str, hashed_password: str):
+    return await _run_password_hasher(verify_password, plain_password, hashed_password)
+
+
+def _snapshot_user(user: User) -> dict:
+    return {attr.key: getattr(user, attr.key) for attr in inspect(User).column_attrs}
+
+
+async def _restore_user(db: AsyncSession, snapshot: dict) -> User:
+    # 캐시된 값으로 만든 객체를 SELECT 없이 현재 세션에 붙인다
+    user = User(**snapshot)
+    make_transient_to_detached(user)
+    return await db.merge(user, load=False)
+
+
+def invalidate_user_cache(*emails: str):
+    user_cache.invalidate(*emails)
+
+
+def forget_user(*emails: str):
+    """사용자 스냅샷과 shard 위치를 함께 비운다, 사용자가 다른 shard 로 옮겨졌을 때 쓴다"""
+    invalidate_user_cache(*emails)
+    forget_user_location(*emails)
+
+
+def get_token_subject(
+    token: str = Depends(oauth2_scheme), settings: Settings = Depends(get_settings)
+) -> str:
+    return get_subject_for_token_type(token, "access", settings)
+
+
+async def get_user_shard(email: str = Depends(get_token_subject)) -> str:
+    shard = await locate_user(email)
+    if shard is None:
+        raise create_credentials_exception("이 토큰의 사용자를 찾을 수 없습니다.")
+
+    return shard
+
+
+async def get_user_db(
+    request: Request,
+    response: Response,
+    shard: str = Depends(get_user_shard),
+    email: str = Depends(get_token_subject),
 ):
-    email = get_subject_for_token_type(token, "access")
-    user = db.query(User).filter(User.email == email).first()
+    """토큰 사용자의 shard 세션, 사용자의 todo 를 다루는 라우트는 이 의존성을 쓴다
+
+    쓰기 직후의 읽기는 쿠키가 없어도 토큰 사용자 기준으로 primary 에서 한다.
+    """
+    async with request_session(request, response, shard, writer=email) as session:
+        yield session
+
+
+async def get_current_user(
+    db: AsyncSession = Depends(get_user_db), email: str = Depends(get_token_subject)
+):
+    snapshot = user_cache.get(email)
+    if snapshot is not None:
+        return await _restore_user(db, snapshot)
+
+    user = await db.scalar(select(User).where(User.email == email))
     if user is None:
+        # 캐시된 위치가 낡았으면 다음 요청이 새 shard 로 가도록 비운다
+        if is_sharded() and await relocate_user(email) is not None:
+            raise create_user_moved_exception()
         raise create_credentials_exception("이 토큰의 사용자를 찾을 수 없습니다.")
 
+    user_cache.set(email, _snapshot_user(user))
+
     return user
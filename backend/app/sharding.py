@@ -0,0 +1,346 @@
+"""사용자 단위 shard 배치와 재배치
+
+    python -m app.sharding init
+    python -m app.sharding rebalance [--limit n] [--dry-run]
+
+사용자와 그 사용자의 todo 는 한 shard 에 함께 있다. 사용자 id 를 consistent hashing
+링에 올려 shard 를 정하고, 결과는 기본 shard 의 user_directory 에 기록한다. 로그인과
+토큰 인증은 email 로 디렉터리를 찾아 shard 를 알아낸다. DATABASE_SHARDS 가 비어 있으면
+모든 사용자가 기본 shard 에 있으므로 디렉터리를 조회하지 않는다.
+
+init 은 설정된 shard 마다 todo id 구간을 정해 둔다. 사용자를 옮겨도 todo id 가 그대로
+유지되므로 shard 를 추가하면 첫 사용 전에 한 번 실행한다.
+
+rebalance 는 링과 디렉터리가 다른 사용자를 하나씩 옮긴다. 옮기는 동안 원본 users
+행을 잠가 그 사용자의 todo 쓰기만 잠시 기다리게 한다. 옮긴 뒤 다른 워커에 남은
+위치 캐시는 원본에서 사용자를 찾지 못하면 비우고 503 으로 재시도를 요청한다.
+shard 를 빼려면 DATABASE_SHARDS 에 URL 을 남긴 채 SHARD_DRAIN 에 이름을 넣고
+rebalance 를 실행한다.
+"""
+
+import argparse
+import asyncio
+import bisect
+import hashlib
+import logging
+import sys
+from collections.abc import Iterable
+from dataclasses import dataclass
+from functools import cache
+
+from sqlalchemy import delete, func, insert, select, text, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.cache import TTLCache
+from app.config import settings
+from app.database import (
+    DEFAULT_SHARD,
+    get_sessionmaker,
+    get_shard_sessionmaker,
+    session_for_shard,
+    shard_names,
+)
+from app.models import (
+    ArchivedTodo,
+    Shard,
+    Todo,
+    TodoStateCount,
+    TodoTombstone,
+    User,
+    UserDirectory,
+)
+
+logger = logging.getLogger(__name__)
+
+# 사용자를 옮길 때 복사하는 테이블, users 가 먼저 들어가야 외래 키가 맞는다
+USER_TABLES = (User, Todo, ArchivedTodo, TodoTombstone, TodoStateCount)
+
+# 소문자 email -> shard 이름
+# 옮긴 사용자는 rebalance 를 실행한 프로세스에서 바로 비운다
+# 다른 워커는 원본 shard 에서 사용자 행을 찾지 못할 때 비운다
+user_shard_cache = TTLCache(
+    maxsize=settings.USER_CACHE_MAXSIZE, ttl=settings.USER_CACHE_TTL_SECONDS
+)
+
+
+def _hash(key: str) -> int:
+    return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), "big")
+
+
+class HashRing:
+    """consistent hashing 링, shard 를 더하거나 빼도 그 shard 몫의 사용자만 자리가 바뀐다"""
+
+    def __init__(self, shards: Iterable[str], vnodes: int):
+        points = sorted(
+            (_hash(f"{shard}#{i}"), shard) for shard in shards for i in range(vnodes)
+        )
+        if not points:
+            raise ValueError("shard 가 하나 이상 있어야 합니다.")
+
+        self._hashes = [point for point, _ in points]
+        self._shards = [shard for _, shard in points]
+
+    def shard_for(self, user_id: int) -> str:
+        index = bisect.bisect(self._hashes, _hash(str(user_id)))
+        return self._shards[index % len(self._shards)]
+
+
+def is_sharded() -> bool:
+    return len(shard_names()) > 1
+
+
+@cache
+def _build_ring(shards: tuple[str, ...], vnodes: int) -> HashRing:
+    return HashRing(shards, vnodes)
+
+
+def get_ring() -> HashRing:
+    shards = [name for name in shard_names() if name not in settings.SHARD_DRAIN]
+    return _build_ring(tuple(shards), settings.SHARD_VIRTUAL_NODES)
+
+
+def place_user(user_id: int) -> str:
+    """새 사용자를 둘 shard"""
+    return get_ring().shard_for(user_id) if is_sharded() else DEFAULT_SHARD
+
+
+async def locate_user(email: str) -> str | None:
+    """email 의 사용자가 있는 shard, 디렉터리에 없으면 None"""
+    if not is_sharded():
+        return DEFAULT_SHARD
+
+    key = email.lower()
+    shard = user_shard_cache.get(key)
+    if shard is not None:
+        return shard
+
+    async with get_sessionmaker()() as db:
+        shard = await db.scalar(
+            select(UserDirectory.shard).where(func.lower(UserDirectory.email) == key)
+        )
+    if shard is not None:
+        user_shard_cache.set(key, shard)
+
+    return shard
+
+
+def forget_user_location(*emails: str) -> None:
+    user_shard_cache.invalidate(*(email.lower() for email in emails))
+
+
+async def relocate_user(email: str) -> str | None:
+    """캐시를 비우고 디렉터리에서 다시 찾는다"""
+    forget_user_location(email)
+    return await locate_user(email)
+
+
+async def _reserve_id_block(db: AsyncSession, id_base: int) -> None:
+    """todos 의 다음 id 를 id_base 뒤로 옮긴다, 이미 더 크면 그대로 둔다"""
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        await db.execute(
+            text(
+                "SELECT setval(pg_get_serial_sequence('todos', 'id'), "
+                "GREATEST(:base, (SELECT COALESCE(MAX(id), 0) FROM todos)))"
+            ),
+            {"base": id_base},
+        )
+    elif dialect == "sqlite":
+        # AUTOINCREMENT 테이블은 sqlite_sequence 에 기록된 값 다음부터 id 를 준다
+        await db.execute(
+            text("DELETE FROM sqlite_sequence WHERE name = 'todos' AND seq < :base"),
+            {"base": id_base},
+        )
+        await db.execute(
+            text(
+                "INSERT INTO sqlite_sequence (name, seq) SELECT 'todos', :base "
+                "WHERE NOT EXISTS (SELECT 1 FROM sqlite_sequence WHERE name = 'todos')"
+            ),
+            {"base": id_base},
+        )
+
+
+async def register_shard(name: str) -> int:
+    """shard 의 todo id 구간을 정하고 그 shard 의 id 를 구간 시작으로 옮긴다"""
+    async with get_sessionmaker()() as directory:
+        id_base = await directory.scalar(
+            select(Shard.id_base).where(Shard.name == name)
+        )
+        if id_base is None:
+            if name == DEFAULT_SHARD:
+                id_base = 0
+            else:
+                last = await directory.scalar(select(func.max(Shard.id_base)))
+                id_base = (last or 0) + settings.SHARD_ID_BLOCK_SIZE
+            directory.add(Shard(name=name, id_base=id_base))
+            await directory.commit()
+
+    async with get_shard_sessionmaker(name)() as db:
+        await _reserve_id_block(db, id_base)
+        await db.commit()
+
+    return id_base
+
+
+@dataclass
+class Move:
+    user_id: int
+    source: str
+    target: str
+
+
+async def plan_moves(limit: int | None = None) -> list[Move]:
+    """디렉터리의 shard 와 링의 shard 가 다른 사용자"""
+    ring = get_ring()
+    moves = []
+    async with get_sessionmaker()() as directory:
+        rows = await directory.stream(
+            select(UserDirectory.id, UserDirectory.shard)
+            .order_by(UserDirectory.id)
+            .execution_options(yield_per=1000)
+        )
+        async for user_id, shard in rows:
+            target = ring.shard_for(user_id)
+            if target == shard:
+                continue
+
+            moves.append(Move(user_id, shard, target))
+            if limit is not None and len(moves) >= limit:
+                break
+
+    return moves
+
+
+async def _copy_rows(source: AsyncSession, target: AsyncSession, user_id: int) -> None:
+    for model in USER_TABLES:
+        key = model.id if model is User else model.user_id
+        # 묘비 id 는 shard 마다 따로 발급한다
+        columns = [
+            column
+            for column in model.__table__.columns
+            if not (model is TodoTombstone and column.key == "id")
+        ]
+        rows = (await source.execute(select(*columns).where(key == user_id))).all()
+        if rows:
+            await target.execute(insert(model), [row._asdict() for row in rows])
+
+
+async def _delete_rows(db: AsyncSession, user_id: int) -> None:
+    for model in reversed(USER_TABLES):
+        key = model.id if model is User else model.user_id
+        await db.execute(delete(model).where(key == user_id))
+
+
+async def _flip_directory(db: AsyncSession, move: Move) -> None:
+    result = await db.execute(
+        update(UserDirectory)
+        .where(UserDirectory.id == move.user_id, UserDirectory.shard == move.source)
+        .values(shard=move.target)
+    )
+    if result.rowcount != 1:
+        raise RuntimeError(f"디렉터리가 바뀌었습니다: {move}")
+
+
+async def move_user(move: Move) -> bool:
+    """사용자와 그 todo 를 옮긴다, 원본에 사용자가 없으면 False
+
+    순서는 복사, 디렉터리 변경, 원본 삭제다. 디렉터리를 바꾸지 못하면 복사본을 지우고
+    원본을 그대로 둔다. 기본 shard 가 끼면 디렉터리 변경을 그 shard 의 트랜잭션에 넣는다.
+    이 프로세스의 캐시는 바로 비우고, 다른 워커는 원본에서 사용자를 찾지 못할 때 비운다.
+    """
+    from app.security import forget_user
+
+    async with (
+        get_shard_sessionmaker(move.source)() as source,
+        get_shard_sessionmaker(move.target)() as target,
+    ):
+        # 모든 todo 쓰기가 이 행의 버전을 올리므로 커밋까지 그 사용자의 쓰기가 멈춘다
+        email = await source.scalar(
+            update(User)
+            .where(User.id == move.user_id)
+            .values(todos_version=User.todos_version)
+            .returning(User.email)
+        )
+        if email is None:
+            await source.rollback()
+            return False
+
+        await _copy_rows(source, target, move.user_id)
+        if move.target == DEFAULT_SHARD:
+            await _flip_directory(target, move)
+            await target.commit()
+        else:
+            await target.commit()
+            try:
+                async with session_for_shard(
+                    DEFAULT_SHARD, source, move.source
+                ) as directory:
+                    await _flip_directory(directory, move)
+                    if directory is not source:
+                        await directory.commit()
+            except Exception:
+                await source.rollback()
+                await _delete_rows(target, move.user_id)
+                await target.commit()
+                raise
+
+        await _delete_rows(source, move.user_id)
+        await source.commit()
+
+    forget_user(email)
+    return True
+
+
+async def rebalance(
+    limit: int | None = None, pause: float = 0, dry_run: bool = False
+) -> list[Move]:
+    """링에 맞지 않는 사용자를 한 명씩 옮기고 옮긴 목록을 돌려준다"""
+    moves = await plan_moves(limit)
+    if dry_run:
+        return moves
+
+    moved = []
+    for move in moves:
+        if await move_user(move):
+            moved.append(move)
+            logger.info(
+                "사용자 %d 를 %s 에서 %s 로 옮겼습니다.",
+                move.user_id,
+                move.source,
+                move.target,
+            )
+        # 다른 쓰기가 끼어들 틈을 준다
+        await asyncio.sleep(pause)
+
+    return moved
+
+
+async def main(argv: list[str]):
+    from app.database import dispose_engine
+
+    parser = argparse.ArgumentParser(prog="python -m app.sharding")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("init")
+    rebalance_parser = commands.add_parser("rebalance")
+    rebalance_parser.add_argument("--limit", type=int)
+    rebalance_parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    try:
+        if args.command == "init":
+            for name in shard_names():
+                id_base = await register_shard(name)
+                logger.info("shard %s 의 todo id 는 %d 부터 시작합니다.", name, id_base)
+        else:
+            moves = await rebalance(
+                args.limit, settings.SHARD_REBALANCE_PAUSE_SECONDS, args.dry_run
+            )
+            for move in moves:
+                print(f"{move.user_id}\t{move.source}\t{move.target}")
+    finally:
+        await dispose_engine()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(sys.argv[1:]))
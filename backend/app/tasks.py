@@ -1,41 +1,183 @@
+import asyncio
+import logging
+from datetime import datetime, timedelta
+
 import httpx
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
 
 from app.config import settings
+from app.models import EmailOutbox, OutboxStatus
+
+logger = logging.getLogger(__name__)
 
 
 class APIResponseError(Exception):
     pass
 
 
-def send_simple_message(to: str, subject: str, body: str):
-    with httpx.Client() as client:
-        try:
-            print(settings.MAILGUN_API_KEY)
-            resp = client.post(
-                f"https://api.mailgun.net/v3/{settings.MAILGUN_DOMAIN}/messages",
-                auth=("api", settings.MAILGUN_API_KEY),
-                data={
-                    "from": f"wook <mailgun@{settings.MAILGUN_DOMAIN}>",
-                    "to": [to],
-                    "subject": subject,
-                    "text": body,
-                },
-            )
-
-            resp.raise_for_status()
-            return resp
-
-        except httpx.HTTPStatusError as e:
-            raise APIResponseError(f"{e.response.status_code} API 요청 실패")
-
-
-def send_user_registration_email(email: str, activation_url: str):
-    send_simple_message(
-        email,
-        "성공적으로 회원가입이 완료되었습니다.",
-        (
-            f"성공적으로 회원가입이 완료되었습니다. "
-            f"이메일 인증을 통해 계정을 활성화해주세요. "
-            f"인증 링크: {activation_url}"
-        ),
+def create_mailgun_client() -> httpx.AsyncClient:
+    # 워커 전체에서 하나의 커넥션 풀을 재사용한다
+    limits = httpx.Limits(
+        max_connections=settings.OUTBOX_CONCURRENCY,
+        max_keepalive_connections=settings.OUTBOX_CONCURRENCY,
+    )
+    return httpx.AsyncClient(
+        base_url=settings.MAILGUN_API_URL,
+        auth=("api", settings.MAILGUN_API_KEY),
+        limits=limits,
+        timeout=httpx.Timeout(10.0),
     )
+
+
+async def send_simple_message(
+    client: httpx.AsyncClient, to: str, subject: str, body: str
+) -> httpx.Response:
+    try:
+        resp = await client.post(
+            f"/v3/{settings.MAILGUN_DOMAIN}/messages",
+            data={
+                "from": f"wook <mailgun@{settings.MAILGUN_DOMAIN}>",
+                "to": [to],
+                "subject": subject,
+                "text": body,
+            },
+        )
+        resp.raise_for_status()
+        return resp
+
+    except httpx.HTTPStatusError as e:
+        raise APIResponseError(f"{e.response.status_code} API 요청 실패") from e
+
+
+def is_retryable(error: Exception) -> bool:
+    # 429 와 5xx, 네트워크 오류만 재시도하고 나머지 4xx 는 바로 실패 처리한다
+    if isinstance(error, APIResponseError) and isinstance(
+        error.__cause__, httpx.HTTPStatusError
+    ):
+        status_code = error.__cause__.response.status_code
+        return status_code == 429 or status_code >= 500
+    return True
+
+
+class OutboxWorker:
+    """email_outbox 를 비우는 비동기 워커
+
+    처리할 행은 next_attempt_at 을 lease 만큼 미뤄서 선점하므로, 워커가
+    전송 중에 죽어도 lease 가 지나면 다른 워커가 다시 가져간다.
+    """
+
+    def __init__(
+        self,
+        session_factory: async_sessionmaker[AsyncSession],
+        client: httpx.AsyncClient,
+        concurrency: int = settings.OUTBOX_CONCURRENCY,
+        batch_size: int = settings.OUTBOX_BATCH_SIZE,
+        max_attempts: int = settings.OUTBOX_MAX_ATTEMPTS,
+        backoff: float = settings.OUTBOX_BACKOFF_SECONDS,
+        backoff_max: float = settings.OUTBOX_BACKOFF_MAX_SECONDS,
+        lease: float = settings.OUTBOX_LEASE_SECONDS,
+    ):
+        self.session_factory = session_factory
+        self.client = client
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.backoff_max = backoff_max
+        self.lease = lease
+        self._semaphore = asyncio.Semaphore(concurrency)
+
+    def retry_delay(self, attempts: int) -> timedelta:
+        seconds = min(self.backoff * 2 ** (attempts - 1), self.backoff_max)
+        return timedelta(seconds=seconds)
+
+    async def claim(self) -> list[EmailOutbox]:
+        now = datetime.now()
+        async with self.session_factory() as db:
+            messages = (
+                await db.scalars(
+                    select(EmailOutbox)
+                    .where(
+                        EmailOutbox.status == OutboxStatus.pending,
+                        EmailOutbox.next_attempt_at <= now,
+                    )
+                    .order_by(EmailOutbox.next_attempt_at)
+                    .limit(self.batch_size)
+                    .with_for_update(skip_locked=True)
+                )
+            ).all()
+            for message in messages:
+                message.next_attempt_at = now + timedelta(seconds=self.lease)
+            await db.commit()
+
+        return list(messages)
+
+    async def deliver(self, message: EmailOutbox) -> None:
+        async with self._semaphore:
+            try:
+                await send_simple_message(
+                    self.client, message.recipient, message.subject, message.body
+                )
+                error = None
+            except Exception as e:
+                # 예상하지 못한 오류도 이 메일의 시도로 기록해 backoff 뒤에 다시 보낸다
+                error = e
+
+        async with self.session_factory() as db:
+            message = await db.merge(message)
+            message.attempts += 1
+            if error is None:
+                message.status = OutboxStatus.sent
+                message.sent_at = datetime.now()
+                message.last_error = None
+            else:
+                logger.warning("메일 전송 실패 (outbox id=%s): %s", message.id, error)
+                message.last_error = str(error) or type(error).__name__
+                if not is_retryable(error) or message.attempts >= self.max_attempts:
+                    message.status = OutboxStatus.failed
+                else:
+                    message.next_attempt_at = datetime.now() + self.retry_delay(
+                        message.attempts
+                    )
+            await db.commit()
+
+    async def run_once(self) -> int:
+        messages = await self.claim()
+        results = await asyncio.gather(
+            *(self.deliver(message) for message in messages), return_exceptions=True
+        )
+        for message, result in zip(messages, results):
+            # 결과를 기록하지 못한 메일은 lease 가 지나면 다시 가져간다
+            if isinstance(result, Exception):
+                logger.error(
+                    "메일 처리 실패 (outbox id=%s)", message.id, exc_info=result
+                )
+        return len(messages)
+
+    async def run_forever(
+        self, poll_interval: float = settings.OUTBOX_POLL_INTERVAL_SECONDS
+    ):
+        while True:
+            try:
+                claimed = await self.run_once()
+            except Exception:
+                # DB 가 잠시 끊겨도 워커를 멈추지 않고 다음 주기에 다시 가져간다
+                logger.exception("outbox 처리 실패")
+                claimed = 0
+            if claimed < self.batch_size:
+                await asyncio.sleep(poll_interval)
+
+
+async def main():
+    from app.database import dispose_engine, get_sessionmaker
+
+    try:
+        async with create_mailgun_client() as client:
+            await OutboxWorker(get_sessionmaker(), client).run_forever()
+    finally:
+        await dispose_engine()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(main())
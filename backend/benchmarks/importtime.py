@@ -0,0 +1,100 @@
+"""app.main import 시간 측정
+
+    python -m benchmarks.importtime [--budget ms] [--runs n] [--top n]
+
+python -X importtime 으로 새 프로세스에서 app.main 을 import 하고, 여러 번 실행한
+것 중 가장 빠른 누적 시간이 budget 을 넘거나 LAZY_MODULES 가 import 시점에
+불러와지면 종료 코드 1 로 끝난다. uvicorn 워커가 뜰 때마다 이 비용을 낸다.
+"""
+
+import argparse
+import subprocess
+import sys
+from dataclasses import dataclass
+
+TARGET = "app.main"
+DEFAULT_BUDGET_MS = 1500
+# 첫 사용 시점까지 import 를 미루는 모듈
+LAZY_MODULES = ("passlib", "httpx")
+
+
+@dataclass
+class ImportTime:
+    module: str
+    depth: int
+    self_us: int
+    cumulative_us: int
+
+
+def parse(stderr: str) -> list[ImportTime]:
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+
+        head, cumulative_us, name = line.split("|")
+        self_us = int(head.removeprefix("import time:"))
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        rows.append(ImportTime(name.strip(), depth, self_us, int(cumulative_us)))
+
+    return rows
+
+
+def direct_imports(rows: list[ImportTime], target: str = TARGET) -> list[ImportTime]:
+    # -X importtime 은 하위 모듈을 부모보다 먼저 출력한다
+    index = next(i for i, row in enumerate(rows) if row.module == target)
+    children = []
+    for row in reversed(rows[:index]):
+        if row.depth == 0:
+            break
+        if row.depth == 1:
+            children.append(row)
+    return children
+
+
+def measure(target: str = TARGET) -> list[ImportTime]:
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {target}"],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return parse(proc.stderr)
+
+
+def main(argv: list[str]) -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.importtime")
+    parser.add_argument("--budget", type=float, default=DEFAULT_BUDGET_MS)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args(argv)
+
+    best = min(
+        (measure() for _ in range(args.runs)),
+        key=lambda rows: next(r.cumulative_us for r in rows if r.module == TARGET),
+    )
+    total_ms = next(r.cumulative_us for r in best if r.module == TARGET) / 1000
+
+    # app.main 바로 아래에서 import 된 패키지 중 무거운 순서
+    print(f"{'module':<40} {'cumulative':>12}")
+    children = sorted(direct_imports(best), key=lambda r: r.cumulative_us, reverse=True)
+    for row in children[: args.top]:
+        print(f"{row.module:<40} {row.cumulative_us / 1000:>9.1f} ms")
+    print(f"{TARGET:<40} {total_ms:>9.1f} ms (budget {args.budget:.0f} ms)")
+
+    failed = False
+    if total_ms > args.budget:
+        print(f"import 시간이 budget 을 넘었습니다: {total_ms:.1f} ms", file=sys.stderr)
+        failed = True
+
+    imported = {r.module.split(".")[0] for r in best}
+    for module in LAZY_MODULES:
+        if module in imported:
+            print(f"{module} 가 import 시점에 불러와졌습니다.", file=sys.stderr)
+            failed = True
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,106 @@
+"""목록 응답 직렬화 경로별 행당 처리 시간 비교
+
+    python -m benchmarks.serialization [행 수 ...]
+
+- response_model: ORM 객체 -> TodoList 검증 -> jsonable_encoder -> json.dumps
+- model_dump_json: ORM 객체 -> TodoList 검증 -> model_dump_json
+- fast: 컬럼 행 -> TypeAdapter.dump_json (FAST_JSON_RESPONSES)
+"""
+
+import json
+import sys
+import time
+
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import create_engine, insert, select
+from sqlalchemy.orm import Session
+
+from app.models import Base, Todo, TodoState, User
+from app.schemas import TodoList, todo_list_adapter
+
+DEFAULT_SIZES = (1_000, 10_000, 100_000)
+TODO_COLUMNS = (Todo.id, Todo.title, Todo.description, Todo.state)
+
+
+def response_model(session: Session) -> bytes:
+    todos = session.scalars(select(Todo)).all()
+    todo_list = TodoList.model_validate({"todos": todos}, from_attributes=True)
+    return json.dumps(jsonable_encoder(todo_list)).encode()
+
+
+def model_dump_json(session: Session) -> bytes:
+    todos = session.scalars(select(Todo)).all()
+    todo_list = TodoList.model_validate({"todos": todos}, from_attributes=True)
+    return todo_list.model_dump_json().encode()
+
+
+def fast(session: Session) -> bytes:
+    todos = session.execute(select(*TODO_COLUMNS)).all()
+    return todo_list_adapter.dump_json(
+        {"todos": [todo._asdict() for todo in todos], "next_cursor": None}
+    )
+
+
+PATHS = {
+    "response_model": response_model,
+    "model_dump_json": model_dump_json,
+    "fast": fast,
+}
+
+
+def make_session(size: int) -> Session:
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    session = Session(engine)
+    session.add(User(id=1, username="bench", email="bench@test.com", password="x"))
+    session.execute(
+        insert(Todo.__table__),
+        [
+            {
+                "title": f"todo {i}",
+                "description": "description " * 4,
+                "state": list(TodoState)[i % len(TodoState)],
+                "user_id": 1,
+            }
+            for i in range(size)
+        ],
+    )
+    session.commit()
+    return session
+
+
+def measure(func, session: Session, size: int, repeat: int = 3) -> float:
+    """가장 빠른 실행의 행당 시간 (µs)"""
+    best = float("inf")
+    for _ in range(repeat):
+        session.expunge_all()
+        started = time.perf_counter()
+        func(session)
+        best = min(best, time.perf_counter() - started)
+    return best / size * 1_000_000
+
+
+def run(sizes=DEFAULT_SIZES) -> dict[int, dict[str, float]]:
+    results = {}
+    for size in sizes:
+        with make_session(size) as session:
+            results[size] = {
+                name: measure(func, session, size) for name, func in PATHS.items()
+            }
+    return results
+
+
+def main(argv: list[str]):
+    sizes = [int(arg) for arg in argv] or DEFAULT_SIZES
+    print(f"{'rows':>8} " + " ".join(f"{name:>16}" for name in PATHS) + "  speedup")
+    for size, timings in run(sizes).items():
+        speedup = timings["response_model"] / timings["fast"]
+        print(
+            f"{size:>8} "
+            + " ".join(f"{timings[name]:>13.2f} µs" for name in PATHS)
+            + f"  {speedup:>6.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
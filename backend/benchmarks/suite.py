@@ -0,0 +1,224 @@
+"""보안, 스키마, 쿼리 핫패스 마이크로 벤치마크
+
+    python -m benchmarks.suite [--output 결과.json] [--baseline 기준.json]
+                               [--tolerance 0.25] [--update-baseline]
+
+각 케이스의 호출당 중앙값(µs)을 JSON 으로 남기고, 기준 파일보다
+tolerance 이상 느려진 케이스가 있으면 종료 코드 1 로 끝난다.
+기준 값은 측정한 머신에 묶이므로 다른 머신에서는 --update-baseline 으로 다시 만든다.
+"""
+
+import argparse
+import json
+import platform
+import statistics
+import sys
+import time
+from collections.abc import Callable
+from dataclasses import asdict, dataclass
+from pathlib import Path
+
+from sqlalchemy import create_engine, insert, select
+from sqlalchemy.orm import Session
+
+from app.models import Base, Todo, TodoState, User
+from app.schemas import TodoList, TodoPublic
+from app.security import (
+    claims_cache,
+    create_access_token,
+    get_password_hash,
+    get_subject_for_token_type,
+    verify_password,
+)
+
+BASELINE_PATH = Path(__file__).with_name("baseline.json")
+DEFAULT_TOLERANCE = 0.25
+TODO_COUNT = 100
+EMAIL = "bench@test.com"
+
+
+@dataclass
+class Result:
+    iterations: int
+    median_us: float
+    min_us: float
+    mean_us: float
+
+
+@dataclass
+class Regression:
+    name: str
+    baseline_us: float
+    current_us: float
+
+    @property
+    def ratio(self) -> float:
+        return self.current_us / self.baseline_us
+
+
+def make_session() -> Session:
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    session = Session(engine)
+    session.add(User(id=1, username="bench", email=EMAIL, password="x"))
+    session.execute(
+        insert(Todo.__table__),
+        [
+            {
+                "title": f"todo {i}",
+                "description": "description " * 4,
+                "state": list(TodoState)[i % len(TodoState)],
+                "user_id": 1,
+            }
+            for i in range(TODO_COUNT)
+        ],
+    )
+    session.commit()
+    return session
+
+
+def make_cases(session: Session) -> dict[str, tuple[Callable[[], object], int]]:
+    """케이스 이름 -> (측정할 함수, 라운드당 반복 횟수)"""
+    token = create_access_token({"sub": EMAIL})
+    hashed_password = get_password_hash("bench")
+    todos = session.scalars(select(Todo)).all()
+
+    def get_subject_uncached():
+        claims_cache.clear()
+        return get_subject_for_token_type(token, "access")
+
+    def get_todos_query():
+        # get_todos 의 기본 목록 쿼리
+        session.expunge_all()
+        return session.scalars(
+            select(Todo).where(Todo.user_id == 1).order_by(Todo.id).limit(100)
+        ).all()
+
+    def get_current_user_query():
+        session.expunge_all()
+        return session.scalar(select(User).where(User.email == EMAIL))
+
+    return {
+        "create_access_token": (lambda: create_access_token({"sub": EMAIL}), 1000),
+        "get_subject_for_token_type": (get_subject_uncached, 1000),
+        "get_subject_for_token_type_cached": (
+            lambda: get_subject_for_token_type(token, "access"),
+            1000,
+        ),
+        "verify_password": (lambda: verify_password("bench", hashed_password), 1),
+        "todo_public_validate": (
+            lambda: TodoPublic.model_validate(todos[0], from_attributes=True),
+            1000,
+        ),
+        "todo_list_validate": (
+            lambda: TodoList.model_validate({"todos": todos}, from_attributes=True),
+            100,
+        ),
+        "get_todos_query": (get_todos_query, 100),
+        "get_current_user_query": (get_current_user_query, 100),
+    }
+
+
+def measure(func: Callable[[], object], number: int, rounds: int) -> Result:
+    func()
+    timings = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        for _ in range(number):
+            func()
+        timings.append((time.perf_counter() - started) / number * 1_000_000)
+
+    return Result(
+        iterations=number * rounds,
+        median_us=round(statistics.median(timings), 3),
+        min_us=round(min(timings), 3),
+        mean_us=round(statistics.fmean(timings), 3),
+    )
+
+
+def run(rounds: int = 5, only: list[str] | None = None) -> dict[str, Result]:
+    with make_session() as session:
+        cases = make_cases(session)
+        return {
+            name: measure(func, number, rounds)
+            for name, (func, number) in cases.items()
+            if not only or name in only
+        }
+
+
+def to_json(results: dict[str, Result]) -> dict:
+    return {
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "results": {name: asdict(result) for name, result in results.items()},
+    }
+
+
+def compare(
+    results: dict[str, Result], baseline: dict, tolerance: float
+) -> list[Regression]:
+    regressions = []
+    for name, result in results.items():
+        expected = baseline["results"].get(name)
+        if expected is None:
+            continue
+
+        if result.median_us > expected["median_us"] * (1 + tolerance):
+            regressions.append(
+                Regression(name, expected["median_us"], result.median_us)
+            )
+
+    return regressions
+
+
+def main(argv: list[str]) -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.suite")
+    parser.add_argument("cases", nargs="*", help="실행할 케이스 (기본: 전체)")
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--output", type=Path, help="결과 JSON 경로")
+    parser.add_argument("--baseline", type=Path, default=BASELINE_PATH)
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE)
+    parser.add_argument("--update-baseline", action="store_true")
+    args = parser.parse_args(argv)
+
+    results = run(args.rounds, args.cases)
+    data = to_json(results)
+    if args.output:
+        args.output.write_text(json.dumps(data, indent=2) + "\n")
+
+    if args.update_baseline:
+        args.baseline.write_text(json.dumps(data, indent=2) + "\n")
+        print(f"기준 파일을 갱신했습니다: {args.baseline}")
+
+    baseline = json.loads(args.baseline.read_text()) if args.baseline.exists() else None
+
+    print(f"{'case':<36} {'median':>12} {'baseline':>12} {'ratio':>7}")
+    for name, result in results.items():
+        expected = baseline and baseline["results"].get(name)
+        if expected:
+            ratio = result.median_us / expected["median_us"]
+            print(
+                f"{name:<36} {result.median_us:>9.2f} µs "
+                f"{expected['median_us']:>9.2f} µs {ratio:>6.2f}x"
+            )
+        else:
+            print(f"{name:<36} {result.median_us:>9.2f} µs {'-':>12} {'-':>7}")
+
+    if baseline is None:
+        print(f"기준 파일이 없습니다: {args.baseline}")
+        return 0
+
+    regressions = compare(results, baseline, args.tolerance)
+    for regression in regressions:
+        print(
+            f"성능 저하: {regression.name} "
+            f"{regression.baseline_us:.2f} µs -> {regression.current_us:.2f} µs "
+            f"({regression.ratio:.2f}x, 허용 {1 + args.tolerance:.2f}x)",
+            file=sys.stderr,
+        )
+
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
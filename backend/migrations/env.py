@@ -12,6 +12,14 @@ if config.config_file_name is not None:
 
 target_metadata = Base.metadata
 
+
+# FTS5 가상 테이블과 그 내부 테이블은 모델 메타데이터에 없으므로 비교에서 제외한다
+def include_name(name, type_, parent_names):
+    if type_ == "table":
+        return not (name or "").startswith("todos_fts")
+    return True
+
+
 # other values from the config, defined by the needs of env.py,
 # can be acquired:
 # my_important_option = config.get_main_option("my_important_option")
@@ -36,6 +44,7 @@ def run_migrations_offline() -> None:
         target_metadata=target_metadata,
         literal_binds=True,
         dialect_opts={"paramstyle": "named"},
+        include_name=include_name,
     )
 
     with context.begin_transaction():
@@ -56,7 +65,11 @@ def run_migrations_online() -> None:
     )
 
     with connectable.connect() as connection:
-        context.configure(connection=connection, target_metadata=target_metadata)
+        context.configure(
+            connection=connection,
+            target_metadata=target_metadata,
+            include_name=include_name,
+        )
 
         with context.begin_transaction():
             context.run_migrations()
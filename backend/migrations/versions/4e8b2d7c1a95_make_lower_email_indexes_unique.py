@@ -0,0 +1,33 @@
+"""make lower email indexes unique
+
+Revision ID: 4e8b2d7c1a95
+Revises: 133f6246aba3
+Create Date: 2026-10-18 21:02:11.417093
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4e8b2d7c1a95'
+down_revision: Union[str, None] = '133f6246aba3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# 대소문자만 다른 email 이 이미 있으면 실패한다, 먼저 정리해야 한다
+def upgrade() -> None:
+    op.drop_index('ix_users_email_lower', table_name='users')
+    op.create_index('ix_users_email_lower', 'users', [sa.text('lower(email)')], unique=True)
+    op.drop_index('ix_user_directory_email_lower', table_name='user_directory')
+    op.create_index('ix_user_directory_email_lower', 'user_directory', [sa.text('lower(email)')], unique=True)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_user_directory_email_lower', table_name='user_directory')
+    op.create_index('ix_user_directory_email_lower', 'user_directory', [sa.text('lower(email)')])
+    op.drop_index('ix_users_email_lower', table_name='users')
+    op.create_index('ix_users_email_lower', 'users', [sa.text('lower(email)')])
@@ -0,0 +1,34 @@
+"""Add indexes for users lookups and todos listing
+
+Revision ID: a3d9e4f1c6b8
+Revises: 5b1f0c7e9a2d
+Create Date: 2026-10-18 20:05:47.902311
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a3d9e4f1c6b8'
+down_revision: Union[str, None] = '5b1f0c7e9a2d'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index(op.f('ix_users_email'), 'users', ['email'], unique=True)
+    op.create_index(op.f('ix_users_username'), 'users', ['username'], unique=True)
+    op.create_index('ix_users_email_lower', 'users', [sa.text('lower(email)')])
+    op.create_index(
+        'ix_todos_user_id_state_id', 'todos', ['user_id', 'state', 'id']
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_todos_user_id_state_id', table_name='todos')
+    op.drop_index('ix_users_email_lower', table_name='users')
+    op.drop_index(op.f('ix_users_username'), table_name='users')
+    op.drop_index(op.f('ix_users_email'), table_name='users')
@@ -1,12 +1,22 @@
 import pytest
-from app.database import get_db
+from app.database import (
+    get_async_url,
+    get_db,
+    get_read_db,
+    get_write_db,
+    query_tracker,
+)
 from app.main import app
-from app.models import Base
-from app.security import get_password_hash
+from app.models import Base, UserDirectory
+from app.routes.auth import login_rate_limiter
+from app.routes.todos import todo_list_cache
+from app.security import claims_cache, get_password_hash, get_user_db, user_cache
+from app.sharding import user_shard_cache
 from fastapi.testclient import TestClient
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
 from sqlalchemy.orm import sessionmaker
-from sqlalchemy.pool import StaticPool
+from sqlalchemy.pool import NullPool
 
 # @pytest.fixture
 # def client():
@@ -14,41 +24,72 @@ from sqlalchemy.pool import StaticPool
 from tests.utils.user_factory import UserFactory
 
 
+@pytest.fixture(autouse=True)
+def clear_caches():
+    caches = [user_cache, claims_cache, todo_list_cache, user_shard_cache]
+    for cache in caches:
+        cache.clear()
+    login_rate_limiter.clear()
+    yield
+    for cache in caches:
+        cache.clear()
+    login_rate_limiter.clear()
+
+
+# 앱은 aiosqlite 로, 테스트 데이터 준비는 동기 세션으로 같은 DB 파일을 사용한다
 @pytest.fixture
-def session():
-    engine = create_engine(
-        "sqlite:///:memory:",
-        connect_args={"check_same_thread": False},
-        poolclass=StaticPool,
-    )
-    Session = sessionmaker(bind=engine)
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'test.db'}")
     Base.metadata.create_all(engine)
-    yield Session()
+    yield engine
     Base.metadata.drop_all(engine)
+    engine.dispose()
+
+
+@pytest.fixture
+def session(engine):
+    Session = sessionmaker(bind=engine)
+    with Session() as session:
+        yield session
+
+
+@pytest.fixture
+def async_engine(engine):
+    async_engine = create_async_engine(get_async_url(engine.url), poolclass=NullPool)
+    query_tracker.attach(async_engine.sync_engine)
+    return async_engine
 
 
 @pytest.fixture
-def client(session):
-    def get_session_override():
-        return session
+def client(async_engine):
+    async def get_session_override():
+        async with AsyncSession(async_engine, expire_on_commit=False) as session:
+            yield session
 
     with TestClient(app) as client:
-        app.dependency_overrides[get_db] = get_session_override
+        for dependency in (get_db, get_read_db, get_write_db, get_user_db):
+            app.dependency_overrides[dependency] = get_session_override
         yield client
 
     app.dependency_overrides.clear()
 
 
-@pytest.fixture
-def user(session):
-    password = "test"
-    user = UserFactory(password=get_password_hash(password))
+def add_user(session, user):
+    """사용자와 그 디렉터리 항목을 함께 넣는다"""
     session.add(user)
+    session.flush()
+    session.add(UserDirectory(id=user.id, username=user.username, email=user.email))
     session.commit()
     session.refresh(user)
 
+
+@pytest.fixture
+def user(session):
+    password = "test"
+    user = UserFactory(password=get_password_hash(password), is_active=True)
+    add_user(session, user)
+
     user.clean_password = "test"
-    user.is_active = True
     return user
 
 
@@ -56,10 +97,7 @@ def user(session):
 def other_user(session):
     password = "test"
     user = UserFactory(password=get_password_hash(password))
-
-    session.add(user)
-    session.commit()
-    session.refresh(user)
+    add_user(session, user)
 
     user.clean_password = "test"
 
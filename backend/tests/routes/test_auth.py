@@ -1,6 +1,8 @@
 from datetime import datetime, timedelta
 
 from app.config import settings
+from app.ratelimit import RateLimit
+from app.routes.auth import login_rate_limiter
 from freezegun import freeze_time
 
 
@@ -88,3 +90,54 @@ def test_token_expired_dont_refresh(client, user):
         )
         assert resp.status_code == 401
         assert resp.json() == {"detail": "토큰이 만료되었습니다."}
+
+
+def test_get_token_email_is_case_insensitive(client, user):
+    resp = client.post(
+        "/auth/token",
+        data={"username": user.email.upper(), "password": user.clean_password},
+    )
+
+    assert resp.status_code == 200
+
+
+def test_get_token_rate_limited_by_email(client, user, monkeypatch):
+    monkeypatch.setattr(
+        login_rate_limiter,
+        "limits",
+        (RateLimit("ip", 10, 60), RateLimit("email", 2, 60)),
+    )
+    verified = []
+    monkeypatch.setattr(
+        "app.security.verify_password", lambda *args: verified.append(args)
+    )
+
+    for _ in range(3):
+        resp = client.post(
+            "/auth/token",
+            data={"username": user.email, "password": "wrong"},
+        )
+
+    assert resp.status_code == 429
+    assert resp.headers["Retry-After"] == "30"
+    # 한도를 넘은 요청은 bcrypt 를 실행하지 않는다
+    assert len(verified) == 2
+    assert login_rate_limiter.stats().rejected["email"] == 1
+
+
+def test_get_token_rate_limited_by_ip(client, monkeypatch):
+    monkeypatch.setattr(
+        login_rate_limiter,
+        "limits",
+        (RateLimit("ip", 1, 60), RateLimit("email", 10, 60)),
+    )
+
+    first = client.post(
+        "/auth/token", data={"username": "a@a.com", "password": "testtest"}
+    )
+    second = client.post(
+        "/auth/token", data={"username": "b@b.com", "password": "testtest"}
+    )
+
+    assert first.status_code == 400
+    assert second.status_code == 429
@@ -0,0 +1,56 @@
+from app.routes.metrics import request_metrics
+
+
+def test_metrics_records_route_template(client, user, token):
+    request_metrics.reset()
+    client.patch(
+        "/todos/999",
+        headers={"Authorization": f"Bearer {token}"},
+        json={"title": "t"},
+    )
+
+    resp = client.get("/metrics")
+
+    assert resp.status_code == 200
+    assert resp.headers["content-type"].startswith("text/plain; version=0.0.4")
+    body = resp.text
+    assert (
+        'http_requests_total{method="PATCH",route="/todos/{todo_id}",status="404"} 1'
+        in body
+    )
+    assert (
+        'http_request_duration_seconds_count{method="PATCH",route="/todos/{todo_id}"} 1'
+        in body
+    )
+    assert (
+        'http_request_duration_seconds_bucket{method="PATCH",route="/todos/{todo_id}",le="+Inf"} 1'
+        in body
+    )
+    # /metrics 요청 자신은 아직 처리 중이다
+    assert "http_requests_in_flight 1" in body
+
+
+def test_metrics_groups_unmatched_routes(client):
+    request_metrics.reset()
+    client.get("/no/such/path")
+    client.get("/another/missing")
+
+    body = client.get("/metrics").text
+
+    assert (
+        'http_requests_total{method="GET",route="<unmatched>",status="404"} 2' in body
+    )
+
+
+def test_metrics_include_component_stats(client, user):
+    client.post("/auth/token", data={"username": user.email, "password": "test"})
+
+    body = client.get("/metrics").text
+
+    assert "password_hasher_completed_total" in body
+    assert 'password_hasher_wait_seconds_bucket{le="+Inf"}' in body
+    assert "password_hasher_max_wait_seconds" in body
+    assert 'cache_hits_total{cache="user"}' in body
+    assert 'login_attempts_rejected_total{scope="email"} 0' in body
+    assert "db_pool_checkouts_total" in body
+    assert "db_replicas_healthy 0" in body
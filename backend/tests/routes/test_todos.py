@@ -1,3 +1,26 @@
+import asyncio
+import csv
+import io
+import json
+from datetime import datetime
+
+import httpx
+import pytest
+
+from app.config import settings
+from app.main import app
+from app.models import (
+    ArchivedTodo,
+    Todo,
+    TodoState,
+    TodoStateCount,
+    TodoTombstone,
+    User,
+)
+from app.routes import todos as todo_routes
+from app.routes.todos import todo_events
+from sqlalchemy import event, select, update
+
 from tests.utils.todo_factory import TodoFactory
 
 
@@ -44,6 +67,94 @@ def test_get_todos_pagination(session, client, user, token):
     assert len(resp.json()["todos"]) == 4
 
 
+@pytest.mark.parametrize("query", ["limit=0", "limit=-1", "offset=-1"])
+def test_get_todos_rejects_invalid_page(client, token, query):
+    resp = client.get(f"/todos/?{query}", headers={"Authorization": f"Bearer {token}"})
+
+    assert resp.status_code == 422
+
+
+def test_get_todos_cursor_pagination(session, client, user, token):
+    session.bulk_save_objects(TodoFactory.create_batch(10, user_id=user.id))
+    session.commit()
+
+    ids = []
+    cursor = None
+    for _ in range(3):
+        url = "/todos/?limit=4" + (f"&cursor={cursor}" if cursor else "")
+        resp = client.get(url, headers={"Authorization": f"Bearer {token}"})
+        data = resp.json()
+        ids += [todo["id"] for todo in data["todos"]]
+        cursor = data["next_cursor"]
+
+    assert ids == list(range(1, 11))
+    assert cursor is None
+
+
+def test_get_todos_cursor_pagination_by_state(session, client, user, token):
+    session.bulk_save_objects(TodoFactory.create_batch(10, user_id=user.id))
+    session.commit()
+
+    resp = client.get(
+        "/todos/?order=state&limit=5",
+        headers={"Authorization": f"Bearer {token}"},
+    )
+    first = resp.json()
+    resp = client.get(
+        f"/todos/?order=state&limit=5&cursor={first['next_cursor']}",
+        headers={"Authorization": f"Bearer {token}"},
+    )
+    second = resp.json()
+
+    todos = first["todos"] + second["todos"]
+    assert [(t["state"], t["id"]) for t in todos] == sorted(
+        (t["state"], t["id"]) for t in todos
+    )
+    assert len({t["id"] for t in todos}) == 10
+
+
+def test_get_todos_invalid_cursor(client, token):
+    resp = client.get(
+        "/todos/?cursor=wrong",
+        headers={"Authorization": f"Bearer {token}"},
+    )
+
+    assert resp.status_code == 400
+    assert resp.json() == {"detail": "커서가 잘못되었습니다."}
+
+
+def test_get_todos_search_ranked(session, client, user, token):
+    session.bulk_save_objects(
+        [
+            TodoFactory(user_id=user.id, title="buy milk", description="today"),
+            TodoFactory(user_id=user.id, title="milk", description="milk milk"),
+            TodoFactory(user_id=user.id, title="walk", description="the dog"),
+            TodoFactory(user_id=user.id + 1, title="milk", description="other"),
+        ]
+    )
+    session.commit()
+
+    resp = client.get(
+        "/todos/?q=milk",
+        headers={"Authorization": f"Bearer {token}"},
+    )
+
+    assert [todo["id"] for todo in resp.json()["todos"]] == [2, 1]
+
+
+def test_get_todos_search_is_not_fts_syntax(session, client, user, token):
+    session.add(TodoFactory(user_id=user.id, title='say "hi" OR', description="x"))
+    session.commit()
+
+    resp = client.get(
+        '/todos/?q="hi" OR',
+        headers={"Authorization": f"Bearer {token}"},
+    )
+
+    assert resp.status_code == 200
+    assert len(resp.json()["todos"]) == 1
+
+
 def test_get_todos_filter_title(session, client, user, token):
     session.bulk_save_objects(
         TodoFactory.create_batch(10, user_id=user.id, title="Test")
@@ -142,3 +253,536 @@ def test_delete_todo_error(client, token):
 
     assert resp.status_code == 404
     assert resp.json() == {"detail": "Todo를 찾을 수 없습니다."}
+
+
+def test_create_todos_batch(client, token):
+    resp = client.post(
+        "/todos/batch",
+        headers={"Authorization": f"Bearer {token}"},
+        json={
+            "todos": [
+                {"title": "a", "description": "a", "state": "draft"},
+                {"title": "b", "description": "b", "state": "todo"},
+            ]
+        },
+    )
+
+    assert resp.status_code == 200
+    results = resp.json()["results"]
+    assert [r["status"] for r in results] == [201, 201]
+    assert [r["todo"]["title"] for r in results] == ["a", "b"]
+
+
+def test_patch_todos_batch(session, client, user, other_user, token):
+    mine = TodoFactory(user_id=user.id, title="mine")
+    theirs = TodoFactory(user_id=other_user.id, title="theirs")
+    session.add_all([mine, theirs])
+    session.commit()
+
+    resp = client.patch(
+        "/todos/batch",
+        headers={"Authorization": f"Bearer {token}"},
+        json={
+            "todos": [
+                {"id": mine.id, "title": "patched"},
+                {"id": theirs.id, "title": "patched"},
+            ]
+        },
+    )
+
+    results = resp.json()["results"]
+    assert results[0]["status"] == 200
+    assert results[0]["todo"]["title"] == "patched"
+    assert results[0]["todo"]["description"] == mine.description
+    assert results[1] == {
+        "id": theirs.id,
+        "status": 404,
+        "todo": None,
+        "detail": "Todo를 찾을 수 없습니다.",
+    }
+    session.refresh(theirs)
+    assert theirs.title == "theirs"
+
+
+def test_patch_todos_batch_locks_user_before_reading_todos(
+    session, client, async_engine, user, token
+):
+    todo = TodoFactory(user_id=user.id)
+    session.add(todo)
+    session.commit()
+    headers = {"Authorization": f"Bearer {token}"}
+    # 사용자 스냅샷을 캐시에 올려 배치 요청이 users 를 따로 조회하지 않게 한다
+    client.get("/todos/", headers=headers)
+
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, many):
+        statements.append(statement)
+
+    event.listen(async_engine.sync_engine, "before_cursor_execute", record)
+    try:
+        resp = client.patch(
+            "/todos/batch",
+            headers=headers,
+            json={"todos": [{"id": todo.id, "title": "patched"}]},
+        )
+    finally:
+        event.remove(async_engine.sync_engine, "before_cursor_execute", record)
+
+    assert resp.json()["results"][0]["status"] == 200
+    # archive 와 같은 순서로 users 행을 먼저 잠근다
+    assert (
+        statements[0].split()
+        == "SELECT users.todos_version FROM users WHERE users.id = ?".split()
+    )
+
+
+def test_delete_todos_batch(session, client, user, token):
+    todos = TodoFactory.create_batch(2, user_id=user.id)
+    session.add_all(todos)
+    session.commit()
+    ids = [todo.id for todo in todos]
+
+    resp = client.request(
+        "DELETE",
+        "/todos/batch",
+        headers={"Authorization": f"Bearer {token}"},
+        json={"ids": [*ids, 999]},
+    )
+
+    results = resp.json()["results"]
+    assert [r["status"] for r in results] == [200, 200, 404]
+    assert session.scalars(select(Todo)).all() == []
+
+
+def test_delete_todos_batch_without_match_keeps_version(client, token):
+    headers = {"Authorization": f"Bearer {token}"}
+    etag = client.get("/todos/", headers=headers).headers["etag"]
+
+    resp = client.request(
+        "DELETE", "/todos/batch", headers=headers, json={"ids": [999]}
+    )
+
+    assert [r["status"] for r in resp.json()["results"]] == [404]
+    assert client.get("/todos/", headers=headers).headers["etag"] == etag
+
+
+def test_export_todos_ndjson(session, client, user, other_user, token):
+    session.add_all(TodoFactory.create_batch(3, user_id=user.id))
+    session.add_all(TodoFactory.create_batch(2, user_id=other_user.id))
+    session.commit()
+
+    resp = client.get(
+        "/todos/export?format=ndjson",
+        headers={"Authorization": f"Bearer {token}"},
+    )
+
+    assert resp.status_code == 200
+    assert resp.headers["content-type"] == "application/x-ndjson"
+    rows = [json.loads(line) for line in resp.text.splitlines()]
+    assert [row["id"] for row in rows] == [1, 2, 3]
+    assert set(rows[0]) == {"id", "title", "description", "state"}
+
+
+def test_export_todos_csv(session, client, user, token):
+    todo = TodoFactory(user_id=user.id, title="a, b", description='say "hi"')
+    session.add(todo)
+    session.commit()
+
+    resp = client.get(
+        "/todos/export?format=csv",
+        headers={"Authorization": f"Bearer {token}"},
+    )
+
+    rows = list(csv.reader(io.StringIO(resp.text)))
+    assert rows == [
+        ["id", "title", "description", "state"],
+        [str(todo.id), "a, b", 'say "hi"', todo.state.value],
+    ]
+
+
+def test_import_todos_ndjson(session, client, user, token):
+    title = "할 일".encode()
+    body = [
+        b'{"title": "' + title[:2],
+        title[2:] + b'", "description": "a", "state": "draft"}\n{"title": "b", ',
+        b'"description": "b", "state": "todo"}\n',
+        b'{"title": "c", "description": "c", "state": "wrong"}\n',
+        b"not json\n\n",
+    ]
+
+    resp = client.post(
+        "/todos/import?format=ndjson",
+        headers={"Authorization": f"Bearer {token}"},
+        content=iter(body),
+    )
+
+    data = resp.json()
+    assert resp.status_code == 200
+    assert data["imported"] == 2
+    assert data["failed"] == 2
+    assert [error["line"] for error in data["errors"]] == [3, 4]
+    titles = session.scalars(select(Todo.title).where(Todo.user_id == user.id))
+    assert titles.all() == ["할 일", "b"]
+
+
+def test_import_todos_spools_rows_before_writing(
+    session, client, user, token, monkeypatch
+):
+    # 작은 청크와 임시 파일 크기로 여러 청크가 디스크에 모이게 한다
+    monkeypatch.setattr(todo_routes, "IMPORT_CHUNK_SIZE", 2)
+    monkeypatch.setattr(todo_routes, "IMPORT_SPOOL_MAX_SIZE", 64)
+    body = "".join(
+        json.dumps({"title": f"t{i}", "description": "d", "state": "todo"}) + "\n"
+        for i in range(5)
+    )
+
+    resp = client.post(
+        "/todos/import",
+        headers={"Authorization": f"Bearer {token}"},
+        content=body.encode(),
+    )
+
+    assert resp.json()["imported"] == 5
+    rows = session.execute(select(Todo.title, Todo.seq).order_by(Todo.id)).all()
+    assert [title for title, _ in rows] == [f"t{i}" for i in range(5)]
+    assert len({seq for _, seq in rows}) == 1
+    counts = session.scalars(select(TodoStateCount.count)).all()
+    assert counts == [5]
+
+
+def test_import_todos_csv(session, client, user, token):
+    lines = [
+        "title,description,state",
+        'a,"multi\nline, ""quoted""",done',
+        "b,b",
+        "c,c,doing",
+    ]
+    body = "\n".join(lines).encode()
+
+    resp = client.post(
+        "/todos/import?format=csv",
+        headers={"Authorization": f"Bearer {token}"},
+        content=body,
+    )
+
+    data = resp.json()
+    assert data["imported"] == 2
+    assert data["errors"] == [{"line": 4, "detail": "컬럼 수가 헤더와 다릅니다."}]
+    todo = session.scalar(select(Todo).where(Todo.title == "a"))
+    assert todo.description == 'multi\nline, "quoted"'
+
+
+def test_get_todos_not_modified(session, client, user, token):
+    session.add_all(TodoFactory.create_batch(3, user_id=user.id))
+    session.commit()
+    headers = {"Authorization": f"Bearer {token}"}
+
+    resp = client.get("/todos/", headers=headers)
+    etag = resp.headers["etag"]
+
+    resp = client.get("/todos/", headers=headers | {"If-None-Match": etag})
+
+    assert resp.status_code == 304
+    assert resp.headers["etag"] == etag
+
+
+def test_get_todos_etag_changes_after_write(client, token):
+    headers = {"Authorization": f"Bearer {token}"}
+    etag = client.get("/todos/", headers=headers).headers["etag"]
+
+    client.post(
+        "/todos/",
+        headers=headers,
+        json={"title": "t", "description": "d", "state": "draft"},
+    )
+    resp = client.get("/todos/", headers=headers | {"If-None-Match": etag})
+
+    assert resp.status_code == 200
+    assert resp.headers["etag"] != etag
+    assert len(resp.json()["todos"]) == 1
+
+
+def test_get_todos_etag_depends_on_query(client, token):
+    headers = {"Authorization": f"Bearer {token}"}
+    etag = client.get("/todos/", headers=headers).headers["etag"]
+
+    resp = client.get("/todos/?state=done", headers=headers | {"If-None-Match": etag})
+
+    assert resp.status_code == 200
+
+
+def test_get_todos_fast_json_matches_default(session, client, user, token, monkeypatch):
+    session.add_all(TodoFactory.create_batch(5, user_id=user.id))
+    session.commit()
+    headers = {"Authorization": f"Bearer {token}"}
+
+    default = client.get("/todos/?limit=3", headers=headers).json()
+    monkeypatch.setattr(settings, "FAST_JSON_RESPONSES", True)
+    # 쿼리 파라미터를 바꿔 응답 캐시를 거치지 않게 한다
+    fast = client.get("/todos/?limit=3&fast=1", headers=headers).json()
+
+    assert fast == default
+
+
+def test_get_todo_stats_tracks_writes(client, token):
+    headers = {"Authorization": f"Bearer {token}"}
+    for state in ("draft", "todo", "todo"):
+        resp = client.post(
+            "/todos/",
+            headers=headers,
+            json={"title": "t", "description": "d", "state": state},
+        )
+    todo_id = resp.json()["id"]
+    client.delete(f"/todos/{todo_id}", headers=headers)
+    client.post(
+        "/todos/batch",
+        headers=headers,
+        json={"todos": [{"title": "t", "description": "d", "state": "done"}] * 2},
+    )
+    client.post(
+        "/todos/import",
+        headers=headers,
+        content='{"title": "t", "description": "d", "state": "trash"}\n',
+    )
+    resp = client.request(
+        "DELETE", "/todos/batch", headers=headers, json={"ids": [1, 999]}
+    )
+
+    resp = client.get("/todos/stats", headers=headers)
+
+    assert resp.status_code == 200
+    assert resp.json() == {
+        "draft": 0,
+        "todo": 1,
+        "doing": 0,
+        "done": 2,
+        "trash": 1,
+        "total": 4,
+    }
+
+
+def test_get_todo_stats_is_per_user(session, client, other_user, token):
+    session.add(TodoStateCount(user_id=other_user.id, state=TodoState.done, count=3))
+    session.commit()
+
+    resp = client.get("/todos/stats", headers={"Authorization": f"Bearer {token}"})
+
+    assert resp.json()["total"] == 0
+
+
+def test_get_todo_changes_since(client, token):
+    headers = {"Authorization": f"Bearer {token}"}
+    todo = {"title": "t", "description": "d", "state": "todo"}
+    first = client.post("/todos/", headers=headers, json=todo).json()
+    second = client.post("/todos/", headers=headers, json=todo).json()
+    since = client.get("/todos/changes", headers=headers).json()["seq"]
+
+    client.patch(f"/todos/{first['id']}", headers=headers, json={"title": "new"})
+    client.delete(f"/todos/{second['id']}", headers=headers)
+    batch = client.post("/todos/batch", headers=headers, json={"todos": [todo] * 2})
+    created = [result["id"] for result in batch.json()["results"]]
+
+    resp = client.get(f"/todos/changes?since={since}", headers=headers)
+
+    assert resp.status_code == 200
+    changes = resp.json()
+    assert changes["seq"] == since + 3
+    assert [(t["id"], t["title"], t["seq"]) for t in changes["todos"]] == [
+        (first["id"], "new", since + 1),
+        (created[0], "t", since + 3),
+        (created[1], "t", since + 3),
+    ]
+    assert changes["deleted"] == [{"id": second["id"], "seq": since + 2}]
+
+    resp = client.get(f"/todos/changes?since={changes['seq']}", headers=headers)
+
+    assert resp.json() == {"todos": [], "deleted": [], "seq": changes["seq"]}
+
+
+def test_get_todo_changes_since_zero_returns_everything(client, token):
+    headers = {"Authorization": f"Bearer {token}"}
+    client.post(
+        "/todos/import",
+        headers=headers,
+        content='{"title": "a", "description": "d", "state": "todo"}\n' * 3,
+    )
+
+    resp = client.get("/todos/changes", headers=headers)
+
+    assert [todo["title"] for todo in resp.json()["todos"]] == ["a"] * 3
+    assert {todo["seq"] for todo in resp.json()["todos"]} == {resp.json()["seq"]}
+
+
+def test_get_todo_changes_is_per_user(session, client, user, other_user, token):
+    session.add(TodoFactory(user_id=other_user.id, seq=1))
+    session.add(TodoTombstone(user_id=other_user.id, todo_id=100, seq=1))
+    session.execute(update(User).values(todos_version=1))
+    session.commit()
+
+    resp = client.get("/todos/changes", headers={"Authorization": f"Bearer {token}"})
+
+    assert resp.json() == {"todos": [], "deleted": [], "seq": 1}
+
+
+def test_get_todo_changes_since_ahead(client, token):
+    resp = client.get(
+        "/todos/changes?since=10", headers={"Authorization": f"Bearer {token}"}
+    )
+
+    assert resp.status_code == 410
+
+
+def _archive(session, user_id, id, state=TodoState.done, seq=0):
+    session.add(
+        ArchivedTodo(
+            id=id,
+            title=f"archived {id}",
+            description="d",
+            state=state,
+            user_id=user_id,
+            seq=seq,
+            updated_at=datetime(2000, 1, 1),
+        )
+    )
+    session.commit()
+
+
+def test_get_todos_reads_archive_only_for_archived_states(session, client, user, token):
+    session.add_all(TodoFactory.create_batch(2, user_id=user.id, state=TodoState.done))
+    session.commit()
+    _archive(session, user.id, 100)
+    _archive(session, user.id, 101, TodoState.trash)
+    headers = {"Authorization": f"Bearer {token}"}
+
+    resp = client.get("/todos/", headers=headers)
+    assert [todo["id"] for todo in resp.json()["todos"]] == [1, 2]
+
+    resp = client.get("/todos/?state=done&limit=2", headers=headers)
+    assert [todo["id"] for todo in resp.json()["todos"]] == [1, 2]
+
+    resp = client.get(
+        f"/todos/?state=done&cursor={resp.json()['next_cursor']}", headers=headers
+    )
+    assert resp.json()["todos"] == [
+        {"id": 100, "title": "archived 100", "description": "d", "state": "done"}
+    ]
+
+    resp = client.get("/todos/?state=trash&q=archived", headers=headers)
+    assert [todo["id"] for todo in resp.json()["todos"]] == [101]
+
+
+def test_patch_archived_todo_restores_it(session, client, user, token):
+    _archive(session, user.id, 100)
+
+    resp = client.patch(
+        "/todos/100",
+        headers={"Authorization": f"Bearer {token}"},
+        json={"title": "restored"},
+    )
+
+    assert resp.status_code == 200
+    assert resp.json()["title"] == "restored"
+    assert session.get(Todo, 100).updated_at > datetime(2000, 1, 1)
+    assert session.scalar(select(ArchivedTodo)) is None
+
+
+def test_delete_archived_todos(session, client, user, token):
+    _archive(session, user.id, 100)
+    _archive(session, user.id, 101)
+    headers = {"Authorization": f"Bearer {token}"}
+
+    assert client.delete("/todos/100", headers=headers).status_code == 200
+    resp = client.request(
+        "DELETE", "/todos/batch", headers=headers, json={"ids": [101]}
+    )
+
+    assert resp.json()["results"] == [
+        {"id": 101, "status": 200, "todo": None, "detail": None}
+    ]
+    assert session.scalar(select(ArchivedTodo)) is None
+    assert session.scalar(select(Todo)) is None
+
+
+def test_get_todo_changes_includes_archive(session, client, user, token):
+    session.execute(update(User).values(todos_version=2))
+    _archive(session, user.id, 100, seq=1)
+    _archive(session, user.id, 101, seq=2)
+
+    resp = client.get(
+        "/todos/changes?since=1", headers={"Authorization": f"Bearer {token}"}
+    )
+
+    assert [todo["id"] for todo in resp.json()["todos"]] == [101]
+
+
+def test_stream_todos_pushes_changes(client, token):
+    headers = {"Authorization": f"Bearer {token}"}
+
+    async def main():
+        messages = asyncio.Queue()
+        disconnected = asyncio.Event()
+
+        async def receive():
+            await disconnected.wait()
+            return {"type": "http.disconnect"}
+
+        scope = {
+            "type": "http",
+            "asgi": {"version": "3.0"},
+            "http_version": "1.1",
+            "method": "GET",
+            "scheme": "http",
+            "path": "/todos/stream",
+            "raw_path": b"/todos/stream",
+            "root_path": "",
+            "query_string": b"",
+            "headers": [(b"authorization", headers["Authorization"].encode())],
+            "server": ("test", 80),
+            "client": ("test", 1234),
+        }
+        stream = asyncio.create_task(app(scope, receive, messages.put))
+
+        start = await messages.get()
+        assert start["status"] == 200
+        assert (b"content-type", b"text/event-stream; charset=utf-8") in start[
+            "headers"
+        ]
+        assert (await messages.get())["body"].startswith(b"retry:")
+
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://test"
+        ) as other:
+            resp = await other.post(
+                "/todos/",
+                headers=headers,
+                json={"title": "t", "description": "d", "state": "todo"},
+            )
+            todo_id = resp.json()["id"]
+            await other.delete(f"/todos/{todo_id}", headers=headers)
+
+        created = (await messages.get())["body"].decode()
+        deleted = (await messages.get())["body"].decode()
+        disconnected.set()
+        await asyncio.wait_for(stream, 5)
+
+        return created, deleted, todo_id
+
+    created, deleted, todo_id = asyncio.run(main())
+
+    assert created.startswith("event: created\ndata: ")
+    assert json.loads(created.split("data: ")[1])["todo"] == {
+        "id": todo_id,
+        "title": "t",
+        "description": "d",
+        "state": "todo",
+    }
+    assert deleted.startswith("event: deleted\ndata: ")
+    deleted_event = json.loads(deleted.split("data: ")[1])
+    assert deleted_event == {
+        "type": "deleted",
+        "seq": json.loads(created.split("data: ")[1])["seq"] + 1,
+        "id": todo_id,
+    }
+    assert todo_events.stats().subscribers == 0
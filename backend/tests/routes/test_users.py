@@ -1,29 +1,79 @@
+import pytest
+from app.config import settings
+from app.models import EmailOutbox, OutboxStatus, Todo, User, UserDirectory
 from app.schemas import UserPublic
+from sqlalchemy import select
 
-# TODO
-# def test_create_user(client):
-#     resp = client.post(
-#         "/users/",
-#         json={"username": "wook", "email": "wook@wook.com", "password": "wook"},
-#     )
-#     assert resp.status_code == 201
-#     assert resp.json() == {
-#         "username": "wook",
-#         "email": "wook@wook.com",
-#         "id": 1,
-#     }
+from tests.utils.todo_factory import TodoFactory
+
+
+def test_create_user(client, session):
+    resp = client.post(
+        "/users/",
+        json={"username": "wook", "email": "wook@wook.com", "password": "wook"},
+    )
+    assert resp.status_code == 201
+    assert resp.json() == {"message": "유저가 생성되었습니다. 이메일을 확인해주세요."}
+
+    message = session.scalar(select(EmailOutbox))
+    assert message.recipient == "wook@wook.com"
+    assert message.status == OutboxStatus.pending
+    assert "/users/confirm/" in message.body
+
+    entry = session.scalar(select(UserDirectory))
+    user = session.scalar(select(User))
+    assert (entry.id, entry.shard) == (user.id, "default")
+
+
+def test_create_user_rejects_email_differing_in_case(client):
+    client.post(
+        "/users/",
+        json={"username": "foo", "email": "Foo@x.com", "password": "foo"},
+    )
+    resp = client.post(
+        "/users/",
+        json={"username": "bar", "email": "foo@x.com", "password": "bar"},
+    )
+
+    assert resp.status_code == 400
+    assert resp.json() == {"detail": "Email이 이미 존재합니다."}
 
 
 def test_read_users(client):
     response = client.get("/users")
     assert response.status_code == 200
-    assert response.json() == []
+    assert response.json() == {"users": [], "next_cursor": None}
 
 
 def test_read_users_with_users(client, user):
     user_schema = UserPublic.model_validate(user).model_dump()
     response = client.get("/users/")
-    assert response.json() == [user_schema]
+    assert response.json() == {"users": [user_schema], "next_cursor": None}
+
+
+def test_read_users_fast_json_matches_default(client, user, other_user, monkeypatch):
+    default = client.get("/users/?limit=1").json()
+    monkeypatch.setattr(settings, "FAST_JSON_RESPONSES", True)
+    fast = client.get("/users/?limit=1").json()
+
+    assert fast == default
+
+
+@pytest.mark.parametrize("query", ["limit=0", "limit=-1", "skip=-1"])
+def test_read_users_rejects_invalid_page(client, user, query):
+    assert client.get(f"/users/?{query}").status_code == 422
+
+
+def test_read_users_cursor_pagination(client, user, other_user):
+    resp = client.get("/users/?limit=1")
+    first = resp.json()
+    resp = client.get(f"/users/?limit=1&cursor={first['next_cursor']}")
+    second = resp.json()
+
+    assert [u["id"] for u in first["users"] + second["users"]] == sorted(
+        [user.id, other_user.id]
+    )
+    assert second["next_cursor"] is None
 
 
 def test_update_user(client, user, token):
@@ -40,6 +90,33 @@ def test_update_user(client, user, token):
     }
 
 
+def test_update_user_rejects_taken_username_and_email(client, user, other_user, token):
+    headers = {"Authorization": f"Bearer {token}"}
+    resp = client.put(
+        f"/users/{user.id}",
+        headers=headers,
+        json={"username": other_user.username, "email": "a@a.com", "password": "w"},
+    )
+    assert resp.status_code == 400
+    assert resp.json() == {"detail": "Username이 이미 존재합니다."}
+
+    resp = client.put(
+        f"/users/{user.id}",
+        headers=headers,
+        json={"username": "woos", "email": other_user.email.upper(), "password": "w"},
+    )
+    assert resp.status_code == 400
+    assert resp.json() == {"detail": "Email이 이미 존재합니다."}
+
+    # 자기 username 과 email 은 그대로 둘 수 있다
+    resp = client.put(
+        f"/users/{user.id}",
+        headers=headers,
+        json={"username": user.username, "email": user.email, "password": "w"},
+    )
+    assert resp.status_code == 200
+
+
 def test_delete_user(client, user, token):
     resp = client.delete(
         f"/users/{user.id}",
@@ -67,3 +144,19 @@ def test_delete_user_wrong_user(client, other_user, token):
     )
     assert resp.status_code == 400
     assert resp.json() == {"detail": "권한이 없습니다."}
+
+
+def test_delete_user_deletes_todos(client, session, user, token):
+    user_id = user.id
+    session.add_all(TodoFactory.create_batch(3, user_id=user_id))
+    session.commit()
+
+    resp = client.delete(
+        f"/users/{user_id}",
+        headers={"Authorization": f"Bearer {token}"},
+    )
+
+    assert resp.status_code == 200
+    session.expire_all()
+    assert session.scalars(select(Todo)).all() == []
+    assert session.get(User, user_id) is None
@@ -1,5 +1,61 @@
+import subprocess
+import sys
+
+import pytest
+from app import database
+from app.config import settings
+from app.main import create_app
+from app.models import Base
+from app.security import create_access_token
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+
+
 def test_root(client):
     resp = client.get("/")
 
     assert resp.status_code == 200
     assert resp.json() == {"Hello": "World"}
+
+
+def test_import_is_lazy():
+    # 엔진, passlib, httpx 는 import 시점에 만들거나 불러오지 않는다
+    code = (
+        "import sys, app.main, app.database as db; "
+        "assert db._engine is None; "
+        "assert 'passlib' not in sys.modules; "
+        "assert 'httpx' not in sys.modules"
+    )
+    subprocess.run([sys.executable, "-c", code], check=True)
+
+
+def test_create_app_uses_given_settings(tmp_path):
+    url = f"sqlite:///{tmp_path / 'app.db'}"
+    engine = create_engine(url)
+    Base.metadata.create_all(engine)
+    engine.dispose()
+    test_settings = settings.model_copy(
+        update={"DEBUG": True, "DATABASE_URL": url, "SECRET_KEY": "another-secret"}
+    )
+    app = create_app(test_settings)
+
+    with TestClient(app) as client:
+        assert app.state.settings is test_settings
+        assert database._engine.url.database == str(tmp_path / "app.db")
+        assert client.get("/").json() == {"Hello": "World"}
+
+        # 토큰은 넘긴 설정의 키로 검증한다
+        for token_settings, detail in [
+            (settings, "토큰이 잘못되었습니다."),
+            (test_settings, "이 토큰의 사용자를 찾을 수 없습니다."),
+        ]:
+            token = create_access_token({"sub": "a@test.com"}, settings=token_settings)
+            resp = client.get("/todos/", headers={"Authorization": f"Bearer {token}"})
+            assert resp.status_code == 401
+            assert resp.json()["detail"] == detail
+
+        # 다른 설정으로 엔진을 다시 만들지 않는다
+        with pytest.raises(RuntimeError):
+            database.init_engine(settings)
+
+    assert database._engine is None
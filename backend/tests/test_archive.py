@@ -0,0 +1,61 @@
+import asyncio
+from datetime import datetime, timedelta
+
+from app.archive import compact
+from app.counters import get_todo_counts, recompute_todo_counts
+from app.models import ArchivedTodo, Todo, TodoState, User
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from tests.utils.todo_factory import TodoFactory
+
+OLD = datetime(2000, 1, 1)
+
+
+def test_compact_moves_old_done_and_trash(session, async_engine, user):
+    session.add_all(
+        [
+            TodoFactory(user_id=user.id, state=TodoState.done, updated_at=OLD),
+            TodoFactory(user_id=user.id, state=TodoState.trash, updated_at=OLD),
+            TodoFactory(user_id=user.id, state=TodoState.trash, updated_at=OLD),
+            TodoFactory(user_id=user.id, state=TodoState.todo, updated_at=OLD),
+            TodoFactory(user_id=user.id, state=TodoState.done),
+        ]
+    )
+    session.commit()
+    before = datetime.now() - timedelta(days=1)
+
+    # 배치 크기보다 많아도 여러 트랜잭션에 나눠 모두 옮긴다
+    archived = asyncio.run(compact(async_sessionmaker(async_engine), before, 2))
+
+    assert archived == 3
+    assert session.scalars(select(ArchivedTodo.id).order_by(ArchivedTodo.id)).all() == [
+        1,
+        2,
+        3,
+    ]
+    assert session.scalars(select(Todo.id).order_by(Todo.id)).all() == [4, 5]
+    assert session.scalar(select(User.todos_version).where(User.id == user.id)) == 2
+
+
+def test_recompute_todo_counts_includes_archive(session, async_engine, user):
+    session.add(TodoFactory(user_id=user.id, state=TodoState.done))
+    session.add(
+        ArchivedTodo(
+            id=100,
+            title="t",
+            description="d",
+            state=TodoState.done,
+            user_id=user.id,
+            seq=0,
+            updated_at=OLD,
+        )
+    )
+    session.commit()
+
+    async def main():
+        async with AsyncSession(async_engine) as db:
+            await recompute_todo_counts(db)
+            return await get_todo_counts(db, user.id)
+
+    assert asyncio.run(main()) == {TodoState.done: 2}
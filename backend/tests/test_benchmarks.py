@@ -0,0 +1,32 @@
+from benchmarks.suite import Result, compare, run
+
+BASELINE = {
+    "results": {
+        "fast": {"median_us": 10.0},
+        "slow": {"median_us": 10.0},
+    }
+}
+
+
+def make_result(median_us):
+    return Result(iterations=1, median_us=median_us, min_us=median_us, mean_us=0)
+
+
+def test_compare_reports_regressions_over_tolerance():
+    results = {
+        "fast": make_result(12.0),
+        "slow": make_result(13.0),
+        "new": make_result(100.0),
+    }
+
+    regressions = compare(results, BASELINE, tolerance=0.25)
+
+    assert [regression.name for regression in regressions] == ["slow"]
+    assert regressions[0].ratio == 1.3
+
+
+def test_run_selected_cases():
+    results = run(rounds=1, only=["todo_public_validate"])
+
+    assert list(results) == ["todo_public_validate"]
+    assert results["todo_public_validate"].median_us > 0
@@ -0,0 +1,54 @@
+from datetime import datetime, timedelta
+
+from app.cache import TTLCache
+from freezegun import freeze_time
+
+
+def test_cache_hit_and_miss():
+    cache = TTLCache(maxsize=2, ttl=60)
+    cache.set("a", 1)
+
+    assert cache.get("a") == 1
+    assert cache.get("b") is None
+    assert cache.stats().hits == 1
+    assert cache.stats().misses == 1
+
+
+def test_cache_evicts_least_recently_used():
+    cache = TTLCache(maxsize=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.stats().evictions == 1
+
+
+def test_cache_limits_total_bytes():
+    cache = TTLCache(maxsize=10, ttl=60, maxbytes=10)
+    cache.set("a", b"aaaa")
+    cache.set("b", b"bbbb")
+    cache.set("c", b"cccc")
+
+    assert cache.get("a") is None
+    assert cache.stats().bytes == 8
+
+    # maxbytes 보다 큰 값은 저장하지 않고 같은 키의 이전 값도 지운다
+    cache.set("b", b"x" * 11)
+    assert cache.get("b") is None
+    assert cache.get("c") == b"cccc"
+    assert cache.stats().bytes == 4
+
+
+def test_cache_entry_expires():
+    cur = datetime.now()
+    cache = TTLCache(maxsize=2, ttl=60)
+    with freeze_time(cur):
+        cache.set("a", 1)
+        assert cache.get("a") == 1
+
+    with freeze_time(cur + timedelta(seconds=61)):
+        assert cache.get("a") is None
+        assert len(cache) == 0
@@ -0,0 +1,53 @@
+import asyncio
+
+from app.counters import adjust_todo_counts, get_todo_counts, recompute_todo_counts
+from app.models import TodoState
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from tests.utils.todo_factory import TodoFactory
+
+
+def run(async_engine, func):
+    async def main():
+        async with AsyncSession(async_engine) as db:
+            result = await func(db)
+            await db.commit()
+            return result
+
+    return asyncio.run(main())
+
+
+def test_adjust_todo_counts_upserts(async_engine, user):
+    async def adjust(db):
+        await adjust_todo_counts(db, user.id, {TodoState.todo: 2, TodoState.done: 0})
+        await adjust_todo_counts(db, user.id, {TodoState.todo: -1, TodoState.done: 1})
+        return await get_todo_counts(db, user.id)
+
+    assert run(async_engine, adjust) == {TodoState.todo: 1, TodoState.done: 1}
+
+
+def test_recompute_todo_counts(session, async_engine, user, other_user):
+    session.add_all(TodoFactory.create_batch(4, user_id=user.id, state=TodoState.doing))
+    session.add_all(TodoFactory.create_batch(2, user_id=other_user.id))
+    session.commit()
+
+    async def drift(db):
+        await adjust_todo_counts(db, user.id, {TodoState.draft: 5})
+        await adjust_todo_counts(db, other_user.id, {TodoState.draft: 5})
+
+    run(async_engine, drift)
+    run(async_engine, lambda db: recompute_todo_counts(db, [user.id]))
+
+    assert run(async_engine, lambda db: get_todo_counts(db, user.id)) == {
+        TodoState.doing: 4
+    }
+    # 다른 사용자의 카운터는 건드리지 않는다
+    assert run(async_engine, lambda db: get_todo_counts(db, other_user.id)) == {
+        TodoState.draft: 5
+    }
+
+    run(async_engine, recompute_todo_counts)
+    assert (
+        sum(run(async_engine, lambda db: get_todo_counts(db, other_user.id)).values())
+        == 2
+    )
@@ -0,0 +1,87 @@
+import asyncio
+import threading
+
+import pytest
+from app.executor import BoundedExecutor, ExecutorBusyError
+
+
+def test_executor_runs_function():
+    executor = BoundedExecutor(max_workers=1, max_queue=1, name="test")
+
+    result = asyncio.run(executor.run(sum, [1, 2, 3]))
+
+    assert result == 6
+    stats = executor.stats()
+    assert stats.completed == 1
+    assert stats.wait_time.count == 1
+    assert stats.wait_time.sum == stats.total_wait_seconds
+    executor.shutdown()
+
+
+def test_executor_rejects_when_queue_is_full():
+    executor = BoundedExecutor(max_workers=1, max_queue=1, name="test")
+    release = threading.Event()
+
+    async def main():
+        running = asyncio.create_task(executor.run(release.wait))
+        queued = asyncio.create_task(executor.run(release.wait))
+        await asyncio.sleep(0.05)
+
+        stats = executor.stats()
+        assert stats.running == 1
+        assert stats.queue_depth == 1
+
+        with pytest.raises(ExecutorBusyError):
+            await executor.run(release.wait)
+
+        release.set()
+        await asyncio.gather(running, queued)
+
+    asyncio.run(main())
+
+    stats = executor.stats()
+    assert stats.rejected == 1
+    assert stats.completed == 2
+    assert stats.max_wait_seconds > 0
+    executor.shutdown()
+
+
+def test_executor_keeps_bound_when_caller_is_cancelled():
+    executor = BoundedExecutor(max_workers=1, max_queue=1, name="test")
+    release = threading.Event()
+
+    async def main():
+        running = asyncio.create_task(executor.run(release.wait))
+        queued = asyncio.create_task(executor.run(release.wait))
+        await asyncio.sleep(0.05)
+
+        # 실행 중인 작업은 취소해도 스레드가 돌고 있으므로 자리를 차지한다
+        running.cancel()
+        await asyncio.sleep(0.05)
+        stats = executor.stats()
+        assert (stats.running, stats.queue_depth) == (1, 1)
+        with pytest.raises(ExecutorBusyError):
+            await asyncio.wait_for(executor.run(release.wait), 1)
+
+        # 시작하지 않은 작업은 취소하면 자리가 빈다
+        queued.cancel()
+        await asyncio.sleep(0.05)
+        stats = executor.stats()
+        assert (stats.running, stats.queue_depth) == (1, 0)
+        waiting = asyncio.create_task(executor.run(release.wait))
+        await asyncio.sleep(0.05)
+
+        release.set()
+        await waiting
+        await asyncio.gather(running, queued, return_exceptions=True)
+
+    try:
+        asyncio.run(main())
+    finally:
+        release.set()
+
+    executor.shutdown()
+    stats = executor.stats()
+    assert (stats.running, stats.queue_depth) == (0, 0)
+    assert stats.rejected == 1
+    assert stats.completed == 2
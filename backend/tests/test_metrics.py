@@ -0,0 +1,44 @@
+from app.metrics import Histogram, PrometheusWriter, RequestMetrics
+
+
+def test_histogram_cumulative_buckets():
+    histogram = Histogram([0.1, 1])
+    for value in (0.05, 0.1, 0.5, 3):
+        histogram.observe(value)
+
+    snapshot = histogram.snapshot()
+
+    assert snapshot.counts == (2, 3, 4)
+    assert snapshot.count == 4
+    assert snapshot.sum == 3.65
+
+
+def test_request_metrics_counts_by_route_and_status():
+    metrics = RequestMetrics(buckets=[0.1])
+    for status, seconds in ((200, 0.05), (200, 0.2), (404, 0.01)):
+        metrics.start()
+        metrics.finish("GET", "/todos/{todo_id}", status, seconds)
+
+    assert metrics.requests() == {
+        ("GET", "/todos/{todo_id}", 200): 2,
+        ("GET", "/todos/{todo_id}", 404): 1,
+    }
+    assert metrics.latency()["GET", "/todos/{todo_id}"].counts == (2, 3)
+    assert metrics.in_flight == 0
+
+
+def test_prometheus_writer_histogram():
+    histogram = Histogram([0.5])
+    histogram.observe(0.25)
+    writer = PrometheusWriter()
+    writer.metric("latency_seconds", "histogram", "latency")
+    writer.histogram("latency_seconds", histogram.snapshot(), route='/a"b')
+
+    assert writer.render().splitlines() == [
+        "# HELP latency_seconds latency",
+        "# TYPE latency_seconds histogram",
+        'latency_seconds_bucket{route="/a\\"b",le="0.5"} 1',
+        'latency_seconds_bucket{route="/a\\"b",le="+Inf"} 1',
+        'latency_seconds_sum{route="/a\\"b"} 0.25',
+        'latency_seconds_count{route="/a\\"b"} 1',
+    ]
@@ -0,0 +1,70 @@
+import logging
+from typing import Annotated
+
+import pytest
+from app.database import get_db
+from app.middleware import QueryStatsMiddleware
+from app.models import User
+from app.routes import todos, users
+from app.security import get_user_db
+from fastapi import Depends, FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from tests.utils.todo_factory import TodoFactory
+
+
+@pytest.fixture
+def debug_client(async_engine):
+    async def get_session_override():
+        async with AsyncSession(async_engine, expire_on_commit=False) as session:
+            yield session
+
+    app = FastAPI()
+    app.add_middleware(QueryStatsMiddleware, n_plus_one_threshold=3, debug=True)
+    app.include_router(users.router)
+    app.include_router(todos.router)
+    app.dependency_overrides[get_db] = get_session_override
+    app.dependency_overrides[get_user_db] = get_session_override
+
+    @app.get("/n-plus-one")
+    async def n_plus_one(db: Annotated[AsyncSession, Depends(get_db)]):
+        for user_id in range(3):
+            await db.scalar(select(User).where(User.id == user_id))
+        return {}
+
+    with TestClient(app) as client:
+        yield client
+
+
+def test_debug_headers_report_query_count(debug_client, session, user, token):
+    todo = TodoFactory(user_id=user.id)
+    session.add(todo)
+    session.commit()
+
+    resp = debug_client.patch(
+        f"/todos/{todo.id}",
+        headers={"Authorization": f"Bearer {token}"},
+        json={"title": "patched"},
+    )
+
+    assert resp.status_code == 200
+    # 사용자 조회, todo 조회, todo 수정, 버전 증가
+    assert resp.headers["X-DB-Query-Count"] == "4"
+    assert float(resp.headers["X-DB-Query-Time-Ms"]) > 0
+    assert resp.headers["X-DB-Repeated-Queries"] == "0"
+
+
+def test_repeated_queries_are_logged(debug_client, caplog):
+    with caplog.at_level(logging.WARNING, logger="app.middleware"):
+        resp = debug_client.get("/n-plus-one")
+
+    assert resp.headers["X-DB-Repeated-Queries"] == "1"
+    assert "N+1 의심: GET /n-plus-one" in caplog.text
+
+
+def test_headers_hidden_without_debug(client):
+    resp = client.get("/")
+
+    assert "X-DB-Query-Count" not in resp.headers
@@ -0,0 +1,49 @@
+import asyncio
+
+from app.config import settings
+from app.database import build_engine, get_pool_options
+from app.pool import PoolMonitor
+from sqlalchemy.engine import make_url
+
+
+def test_pool_options_from_settings():
+    options = get_pool_options(make_url("postgresql+asyncpg://db/app"), settings)
+
+    assert options["pool_size"] == settings.DB_POOL_SIZE
+    assert options["max_overflow"] == settings.DB_MAX_OVERFLOW
+    assert options["pool_timeout"] == settings.DB_POOL_TIMEOUT
+
+
+def test_memory_sqlite_has_no_pool_size():
+    options = get_pool_options(make_url("sqlite+aiosqlite://"), settings)
+
+    assert "pool_size" not in options
+
+
+def test_pool_monitor_tracks_checkouts_and_overflow(tmp_path):
+    test_settings = settings.model_copy(
+        update={
+            "DATABASE_URL": f"sqlite:///{tmp_path / 'pool.db'}",
+            "DB_POOL_SIZE": 1,
+            "DB_MAX_OVERFLOW": 2,
+        }
+    )
+    monitor = PoolMonitor()
+    engine = build_engine(test_settings, monitor)
+
+    async def main():
+        connections = [await engine.connect() for _ in range(3)]
+        stats = monitor.stats()
+        for connection in connections:
+            await connection.close()
+        await engine.dispose()
+        return stats
+
+    stats = asyncio.run(main())
+
+    assert stats.size == 1
+    assert stats.checked_out == 3
+    assert stats.overflow == 2
+    assert stats.checkouts == 3
+    assert stats.connections_opened == 3
+    assert monitor.stats().connections_closed == 3
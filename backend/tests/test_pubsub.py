@@ -0,0 +1,34 @@
+import asyncio
+
+from app.pubsub import RESET, Broker
+
+
+def test_publish_reaches_only_key_subscribers():
+    async def main():
+        broker = Broker(maxsize=10)
+        with broker.subscribe(1) as first, broker.subscribe(2) as second:
+            broker.publish(1, "a", "b")
+
+            assert await first.get() == "a"
+            assert await first.get() == "b"
+            assert await second.get(timeout=0.01) is None
+            assert broker.stats().subscribers == 2
+
+        assert broker.stats().subscribers == 0
+        assert broker.stats().published == 2
+
+    asyncio.run(main())
+
+
+def test_slow_subscriber_gets_reset():
+    async def main():
+        broker = Broker(maxsize=2)
+        with broker.subscribe(1) as subscription:
+            broker.publish(1, "a", "b", "c", "d")
+            broker.publish(1, "e")
+
+            assert await subscription.get() == RESET
+            assert await subscription.get() == "e"
+            assert broker.stats().dropped == 1
+
+    asyncio.run(main())
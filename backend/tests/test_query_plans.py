@@ -0,0 +1,106 @@
+import re
+from contextlib import contextmanager
+
+import pytest
+from app.security import create_confirmation_token
+from sqlalchemy import event
+
+from tests.utils.todo_factory import TodoFactory
+
+# 첫 페이지는 PK 순서로 LIMIT 만큼만 읽으므로 전체 스캔이 아니다
+ALLOWED_SCANS = {
+    ("GET", "/users/?limit=1"): {"user_directory"},
+}
+
+EXPLAINED_STATEMENTS = ("SELECT", "UPDATE", "DELETE")
+
+ROUTES = [
+    ("POST", "/auth/token", {"data": {"username": "{email}", "password": "test"}}),
+    ("POST", "/auth/refresh_token", {}),
+    ("GET", "/todos/", {}),
+    ("GET", "/todos/?state=done", {}),
+    ("GET", "/todos/?title=a&description=b", {}),
+    ("GET", "/todos/?order=state&limit=2", {}),
+    ("GET", "/todos/?q=milk", {}),
+    ("GET", "/todos/stats", {}),
+    ("GET", "/todos/changes?since=0", {}),
+    ("POST", "/todos/", {"json": {"title": "t", "description": "d", "state": "todo"}}),
+    ("PATCH", "/todos/{todo_id}", {"json": {"title": "patched"}}),
+    ("DELETE", "/todos/{todo_id}", {}),
+    ("GET", "/users/?limit=1", {}),
+    (
+        "PUT",
+        "/users/{user_id}",
+        {"json": {"username": "woos", "email": "wook@wook.com", "password": "w"}},
+    ),
+    ("DELETE", "/users/{user_id}", {}),
+    ("GET", "/users/confirm/{confirm_token}", {}),
+]
+
+
+@contextmanager
+def capture_queries(async_engine):
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, many):
+        if not many:
+            statements.append((statement, parameters))
+
+    target = async_engine.sync_engine
+    event.listen(target, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(target, "before_cursor_execute", before_cursor_execute)
+
+
+def find_full_scans(engine, statements):
+    scans = set()
+    with engine.connect() as conn:
+        for statement, parameters in statements:
+            if not statement.lstrip().upper().startswith(EXPLAINED_STATEMENTS):
+                continue
+
+            plan = conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters)
+            for row in plan:
+                match = re.match(r"SCAN (\w+)", row[-1])
+                if match and "VIRTUAL TABLE" not in row[-1]:
+                    scans.add(match.group(1))
+
+    return scans
+
+
+@pytest.mark.parametrize(("method", "url", "kwargs"), ROUTES)
+def test_route_queries_use_indexes(
+    engine, async_engine, session, client, user, other_user, token, method, url, kwargs
+):
+    todos = TodoFactory.create_batch(5, user_id=user.id)
+    todos += TodoFactory.create_batch(5, user_id=other_user.id)
+    session.add_all(todos)
+    session.commit()
+
+    values = {
+        "email": user.email,
+        "user_id": user.id,
+        "todo_id": todos[0].id,
+        "confirm_token": create_confirmation_token({"sub": user.email}),
+    }
+    kwargs = {
+        key: {
+            k: v.format(**values) if isinstance(v, str) else v for k, v in value.items()
+        }
+        for key, value in kwargs.items()
+    }
+
+    with capture_queries(async_engine) as statements:
+        resp = client.request(
+            method,
+            url.format(**values),
+            headers={"Authorization": f"Bearer {token}"},
+            **kwargs,
+        )
+
+    assert resp.status_code < 400
+    assert statements
+    allowed = ALLOWED_SCANS.get((method, url), set())
+    assert find_full_scans(engine, statements) <= allowed
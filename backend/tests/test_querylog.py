@@ -0,0 +1,43 @@
+import logging
+
+from app.querylog import QueryTracker, track_queries
+from sqlalchemy import create_engine, text
+
+
+def make_engine(slow_query_seconds=1.0):
+    engine = create_engine("sqlite://")
+    QueryTracker(slow_query_seconds).attach(engine)
+    return engine
+
+
+def test_track_queries_counts_statements():
+    engine = make_engine()
+    with track_queries() as stats, engine.connect() as conn:
+        for i in range(3):
+            conn.execute(text("SELECT :i"), {"i": i})
+        conn.execute(text("SELECT 1"))
+
+    assert stats.count == 4
+    assert stats.total_seconds > 0
+    assert stats.repeated(3) == {"SELECT ?": 3}
+
+
+def test_queries_outside_block_are_not_counted():
+    engine = make_engine()
+    with track_queries() as stats:
+        pass
+
+    with engine.connect() as conn:
+        conn.execute(text("SELECT 1"))
+
+    assert stats.count == 0
+
+
+def test_slow_query_is_logged(caplog):
+    engine = make_engine(slow_query_seconds=0)
+    with caplog.at_level(logging.WARNING, logger="app.querylog"):
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+
+    assert "느린 쿼리" in caplog.text
+    assert "SELECT 1" in caplog.text
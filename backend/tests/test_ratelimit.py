@@ -0,0 +1,58 @@
+from datetime import datetime, timedelta
+
+import pytest
+from app.ratelimit import MemoryBackend, RateLimit, RateLimiter, RateLimitExceeded
+from freezegun import freeze_time
+
+
+def test_rate_limiter_rejects_after_limit():
+    limiter = RateLimiter(MemoryBackend(maxsize=10), RateLimit("ip", 2, 60))
+    limiter.hit(ip="1.1.1.1")
+    limiter.hit(ip="1.1.1.1")
+
+    with pytest.raises(RateLimitExceeded) as exc:
+        limiter.hit(ip="1.1.1.1")
+
+    assert exc.value.scope == "ip"
+    assert exc.value.retry_after == pytest.approx(30, abs=1)
+    limiter.hit(ip="2.2.2.2")
+    assert limiter.stats().allowed == 3
+    assert limiter.stats().rejected == {"ip": 1}
+
+
+def test_rate_limiter_refills_over_time():
+    cur = datetime.now()
+    limiter = RateLimiter(MemoryBackend(maxsize=10), RateLimit("ip", 2, 60))
+    with freeze_time(cur):
+        limiter.hit(ip="a")
+        limiter.hit(ip="a")
+        with pytest.raises(RateLimitExceeded):
+            limiter.hit(ip="a")
+
+    with freeze_time(cur + timedelta(seconds=31)):
+        limiter.hit(ip="a")
+        with pytest.raises(RateLimitExceeded):
+            limiter.hit(ip="a")
+
+
+def test_rate_limiter_checks_every_scope():
+    limiter = RateLimiter(
+        MemoryBackend(maxsize=10), RateLimit("ip", 10, 60), RateLimit("email", 1, 60)
+    )
+    limiter.hit(ip="a", email="wook@wook.com")
+
+    with pytest.raises(RateLimitExceeded) as exc:
+        limiter.hit(ip="b", email="wook@wook.com")
+
+    assert exc.value.scope == "email"
+    assert limiter.stats().rejected == {"ip": 0, "email": 1}
+
+
+def test_memory_backend_evicts_least_recently_used():
+    backend = MemoryBackend(maxsize=2)
+    for key in ("a", "b", "c"):
+        backend.acquire(key, 1, 1)
+
+    assert len(backend) == 2
+    # 버려진 키는 가득 찬 버킷으로 다시 시작한다
+    assert backend.acquire("a", 1, 1) == 0
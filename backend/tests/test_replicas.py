@@ -0,0 +1,154 @@
+import shutil
+
+import pytest
+from app import database
+from app.config import settings
+from app.main import create_app
+from app.models import Base, Todo, TodoState
+from app.replicas import ReplicaSet
+from app.routes.todos import todo_list_cache
+from app.security import create_access_token
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, update
+from sqlalchemy.engine import make_url
+from sqlalchemy.orm import Session
+
+from tests.utils.user_factory import UserFactory
+
+
+def test_replica_set_round_robin_and_ejection(monkeypatch):
+    now = 100.0
+    monkeypatch.setattr("app.replicas.time.monotonic", lambda: now)
+    a, b = object(), object()
+    replicas = ReplicaSet([a, b], eject_seconds=30)
+
+    assert replicas.candidates() == [a, b]
+    assert replicas.candidates() == [b, a]
+
+    replicas.eject(a)
+    assert replicas.candidates() == [b]
+    assert replicas.candidates() == [b]
+    assert replicas.stats().healthy == 1
+
+    now += 30
+    assert replicas.candidates() == [a, b]
+    assert replicas.stats().ejections == 1
+
+
+def create_database(path, email):
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(engine)
+    with Session(engine) as session:
+        user = UserFactory(email=email, is_active=True)
+        session.add(user)
+        session.flush()
+        session.add(
+            Todo(
+                title="primary", description="d", state=TodoState.todo, user_id=user.id
+            )
+        )
+        session.commit()
+    engine.dispose()
+    return f"sqlite:///{path}"
+
+
+# replica 는 primary 의 사본에서 todo 제목만 바꿔 어디서 읽었는지 구분한다
+def create_replica(primary, path):
+    shutil.copy(make_url(primary).database, path)
+    engine = create_engine(f"sqlite:///{path}")
+    with engine.begin() as connection:
+        connection.execute(update(Todo).values(title="replica"))
+    engine.dispose()
+    return f"sqlite:///{path}"
+
+
+@pytest.fixture
+def replica_client(tmp_path):
+    email = "replica@test.com"
+    primary = create_database(tmp_path / "primary.db", email)
+    replica = create_replica(primary, tmp_path / "replica.db")
+    test_settings = settings.model_copy(
+        update={"DATABASE_URL": primary, "DATABASE_REPLICA_URLS": [replica]}
+    )
+
+    with TestClient(create_app(test_settings)) as client:
+        client.headers["Authorization"] = (
+            f"Bearer {create_access_token(data={'sub': email})}"
+        )
+        yield client
+
+
+def titles(resp):
+    return [todo["title"] for todo in resp.json()["todos"]]
+
+
+def test_get_reads_from_replica(replica_client):
+    assert titles(replica_client.get("/todos/")) == ["replica"]
+
+
+def test_reads_own_writes_from_primary(replica_client):
+    resp = replica_client.post(
+        "/todos/", json={"title": "new", "description": "d", "state": "todo"}
+    )
+    assert database.LAST_WRITE_COOKIE in resp.cookies
+
+    assert titles(replica_client.get("/todos/")) == ["primary", "new"]
+
+
+def test_reads_own_writes_without_cookies(replica_client):
+    replica_client.post(
+        "/todos/", json={"title": "new", "description": "d", "state": "todo"}
+    )
+    replica_client.cookies.clear()
+
+    # 쿠키를 보내지 않는 API 클라이언트도 토큰 사용자 기준으로 primary 에서 읽는다
+    assert titles(replica_client.get("/todos/")) == ["primary", "new"]
+
+    # 기록이 만료되면 다시 replica 에서 읽는다
+    database._recent_writers.clear()
+    todo_list_cache.clear()
+    assert titles(replica_client.get("/todos/")) == ["replica"]
+
+
+def test_unreachable_replica_is_ejected(tmp_path):
+    email = "replica@test.com"
+    primary = create_database(tmp_path / "primary.db", email)
+    test_settings = settings.model_copy(
+        update={
+            "DATABASE_URL": primary,
+            "DATABASE_REPLICA_URLS": [f"sqlite:///{tmp_path / 'missing' / 'x.db'}"],
+        }
+    )
+    headers = {"Authorization": f"Bearer {create_access_token(data={'sub': email})}"}
+
+    with TestClient(create_app(test_settings)) as client:
+        assert titles(client.get("/todos/", headers=headers)) == ["primary"]
+        assert titles(client.get("/todos/", headers=headers)) == ["primary"]
+
+        stats = database.get_replicas().stats()
+        assert (stats.replicas, stats.healthy, stats.ejections) == (1, 0, 1)
+
+
+def test_replica_dying_after_pool_is_warm_is_ejected(tmp_path, monkeypatch):
+    email = "replica@test.com"
+    primary = create_database(tmp_path / "primary.db", email)
+    (tmp_path / "replica").mkdir()
+    replica = create_replica(primary, tmp_path / "replica" / "replica.db")
+    test_settings = settings.model_copy(
+        update={"DATABASE_URL": primary, "DATABASE_REPLICA_URLS": [replica]}
+    )
+    headers = {"Authorization": f"Bearer {create_access_token(data={'sub': email})}"}
+
+    with TestClient(create_app(test_settings)) as client:
+        assert titles(client.get("/todos/", headers=headers)) == ["replica"]
+
+        # 풀에 남은 커넥션은 끊기고 새 연결도 열리지 않는다
+        [engine] = database.get_replicas().engines
+        monkeypatch.setattr(engine.sync_engine.dialect, "do_ping", lambda conn: False)
+        shutil.rmtree(tmp_path / "replica")
+        # 같은 버전의 목록 캐시가 replica 에서 읽은 응답을 돌려주지 않게 한다
+        todo_list_cache.clear()
+
+        assert titles(client.get("/todos/", headers=headers)) == ["primary"]
+        stats = database.get_replicas().stats()
+        assert (stats.healthy, stats.ejections) == (0, 1)
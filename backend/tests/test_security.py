@@ -1,5 +1,16 @@
+from datetime import datetime, timedelta
+
+import pytest
 from app.config import settings
-from app.security import create_access_token, create_confirmation_token
+from app.security import (
+    claims_cache,
+    create_access_token,
+    create_confirmation_token,
+    get_subject_for_token_type,
+    user_cache,
+)
+from fastapi import HTTPException
+from freezegun import freeze_time
 from jwt import decode
 
 
@@ -21,3 +32,64 @@ def test_create_confirmation_token():
 
     assert decoded_token["test"] == "test"
     assert decoded_token["type"] == "confirmation"
+
+
+def test_current_user_is_cached(client, user, token):
+    headers = {"Authorization": f"Bearer {token}"}
+    client.post("/auth/refresh_token", headers=headers)
+    client.post("/auth/refresh_token", headers=headers)
+
+    stats = user_cache.stats()
+    assert stats.misses == 1
+    assert stats.hits == 1
+
+
+def test_update_user_invalidates_cache(client, user, token):
+    headers = {"Authorization": f"Bearer {token}"}
+    client.post("/auth/refresh_token", headers=headers)
+    assert len(user_cache) == 1
+
+    client.put(
+        f"/users/{user.id}",
+        headers=headers,
+        json={"username": "woos", "email": "wook@wook.com", "password": "wwwwww"},
+    )
+
+    assert user_cache.get(user.email) is None
+    assert len(user_cache) == 0
+
+
+def test_verified_claims_are_cached():
+    token = create_access_token({"sub": "test@test.com"})
+
+    assert get_subject_for_token_type(token, "access") == "test@test.com"
+    assert get_subject_for_token_type(token, "access") == "test@test.com"
+
+    stats = claims_cache.stats()
+    assert stats.misses == 1
+    assert stats.hits == 1
+
+
+def test_cached_claims_still_check_token_type():
+    token = create_confirmation_token({"sub": "test@test.com"})
+    get_subject_for_token_type(token, "confirmation")
+
+    with pytest.raises(HTTPException) as exc:
+        get_subject_for_token_type(token, "access")
+
+    assert exc.value.detail == "토큰의 타입이 잘못되었습니다."
+
+
+def test_cached_claims_expire_with_token(monkeypatch):
+    monkeypatch.setattr(claims_cache, "ttl", 24 * 60 * 60)
+    cur = datetime.now()
+    with freeze_time(cur):
+        token = create_confirmation_token({"sub": "test@test.com"})
+        get_subject_for_token_type(token, "confirmation")
+
+    minutes = settings.CONFIRMATION_TOKEN_EXPIRE_MINUTES + 1
+    with freeze_time(cur + timedelta(minutes=minutes)):
+        with pytest.raises(HTTPException) as exc:
+            get_subject_for_token_type(token, "confirmation")
+
+    assert exc.value.detail == "토큰이 만료되었습니다."
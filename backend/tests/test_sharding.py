@@ -0,0 +1,228 @@
+import json
+from collections import Counter
+from types import SimpleNamespace
+
+import pytest
+from app.config import settings
+from app.main import create_app
+from app.models import Base, Todo, User, UserDirectory
+from app.security import create_confirmation_token
+from app.sharding import HashRing, plan_moves, rebalance, register_shard
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import Session
+
+SHARDS = ("default", "a", "b")
+
+
+def test_hash_ring_moves_only_to_added_shard():
+    before = HashRing(["default", "a"], vnodes=64)
+    after = HashRing(["default", "a", "b"], vnodes=64)
+
+    placed = {user_id: before.shard_for(user_id) for user_id in range(1000)}
+    moved = {
+        user_id: after.shard_for(user_id)
+        for user_id, shard in placed.items()
+        if after.shard_for(user_id) != shard
+    }
+
+    assert set(moved.values()) == {"b"}
+    counts = Counter(after.shard_for(user_id) for user_id in range(1000))
+    assert min(counts.values()) > 200
+
+
+@pytest.fixture
+def shard_urls(tmp_path):
+    urls = {}
+    for name in SHARDS:
+        url = f"sqlite:///{tmp_path / name}.db"
+        engine = create_engine(url)
+        Base.metadata.create_all(engine)
+        engine.dispose()
+        urls[name] = url
+    return urls
+
+
+def shard_client(shard_urls, shards):
+    test_settings = settings.model_copy(
+        update={
+            "DATABASE_URL": shard_urls["default"],
+            "DATABASE_SHARDS": {name: shard_urls[name] for name in shards},
+        }
+    )
+    return TestClient(create_app(test_settings))
+
+
+def query(url, stmt):
+    engine = create_engine(url)
+    with Session(engine) as session:
+        rows = session.execute(stmt).all()
+    engine.dispose()
+    return rows
+
+
+def directory(shard_urls):
+    return dict(
+        query(shard_urls["default"], select(UserDirectory.id, UserDirectory.shard))
+    )
+
+
+def sign_up(client, name):
+    email = f"{name}@test.com"
+    resp = client.post(
+        "/users/", json={"username": name, "email": email, "password": "pw"}
+    )
+    assert resp.status_code == 201
+    token = create_confirmation_token(data={"sub": email})
+    assert client.get(f"/users/confirm/{token}").status_code == 200
+
+    resp = client.post("/auth/token", data={"username": email, "password": "pw"})
+    return {"Authorization": f"Bearer {resp.json()['access_token']}"}
+
+
+def create_todo(client, headers, title):
+    resp = client.post(
+        "/todos/",
+        json={"title": title, "description": "d", "state": "todo"},
+        headers=headers,
+    )
+    assert resp.status_code == 200
+    return resp.json()
+
+
+def titles(client, headers):
+    return [
+        todo["title"] for todo in client.get("/todos/", headers=headers).json()["todos"]
+    ]
+
+
+def test_users_and_todos_live_on_their_shard(shard_urls):
+    with shard_client(shard_urls, SHARDS) as client:
+        for name in SHARDS:
+            client.portal.call(register_shard, name)
+
+        users = {name: sign_up(client, name) for name in ("u1", "u2", "u3", "u4")}
+        todos = {
+            name: create_todo(client, headers, name) for name, headers in users.items()
+        }
+        assert client.post(
+            "/users/", json={"username": "u1", "email": "x@test.com", "password": "pw"}
+        ).json() == {"detail": "Username이 이미 존재합니다."}
+        listed = client.get("/users/").json()["users"]
+
+    placement = directory(shard_urls)
+    assert len(set(placement.values())) > 1
+    assert [user["username"] for user in listed] == list(users)
+    for user in listed:
+        shard = placement[user["id"]]
+        todo = todos[user["username"]]
+        rows = query(
+            shard_urls[shard], select(Todo.id).where(Todo.user_id == user["id"])
+        )
+        assert rows == [(todo["id"],)]
+        # shard 마다 todo id 구간이 다르다
+        assert todo["id"] // settings.SHARD_ID_BLOCK_SIZE == SHARDS.index(shard)
+
+
+@pytest.fixture
+def rebalanced(shard_urls, monkeypatch):
+    """shard 두 개에 사용자를 만들고 shard 를 하나 더해 옮긴다
+
+    rebalance 는 이 프로세스의 캐시를 비우므로, 캐시를 비우지 않게 해서 옮기기 전의
+    shard 를 기억하는 다른 워커처럼 만든다.
+    """
+    names = [f"u{i}" for i in range(8)]
+    with shard_client(shard_urls, SHARDS[:2]) as client:
+        for name in SHARDS[:2]:
+            client.portal.call(register_shard, name)
+        users = {name: sign_up(client, name) for name in names}
+        todos = {
+            name: create_todo(client, headers, name) for name, headers in users.items()
+        }
+        ids = {
+            user["username"]: user["id"]
+            for user in client.get("/users/").json()["users"]
+        }
+
+    with shard_client(shard_urls, SHARDS) as client:
+        client.portal.call(register_shard, "b")
+        for name, headers in users.items():
+            assert titles(client, headers) == [name]
+
+        moves = client.portal.call(plan_moves)
+        assert moves
+        assert {move.target for move in moves} == {"b"}
+        with monkeypatch.context() as patch:
+            patch.setattr("app.security.forget_user", lambda *emails: None)
+            assert client.portal.call(rebalance) == moves
+
+        moved = {move.user_id for move in moves}
+        yield SimpleNamespace(
+            client=client,
+            moved=[name for name in names if ids[name] in moved],
+            users=users,
+            todos=todos,
+        )
+
+    placement = directory(shard_urls)
+    for user_id in moved:
+        assert placement[user_id] == "b"
+        assert query(shard_urls["a"], select(User.id).where(User.id == user_id)) == []
+        assert query(shard_urls["b"], select(User.id).where(User.id == user_id))
+
+
+USER_REQUESTS = {
+    "list": lambda client, todo: client.get("/todos/"),
+    "stats": lambda client, todo: client.get("/todos/stats"),
+    "export": lambda client, todo: client.get("/todos/export"),
+    "patch": lambda client, todo: client.patch(
+        f"/todos/{todo['id']}", json={"state": "done"}
+    ),
+    "delete": lambda client, todo: client.delete(f"/todos/{todo['id']}"),
+}
+
+
+@pytest.mark.parametrize("name", USER_REQUESTS)
+def test_stale_location_after_rebalance_asks_to_retry(rebalanced, name):
+    send = USER_REQUESTS[name]
+    client = rebalanced.client
+    for user in rebalanced.moved:
+        client.headers.update(rebalanced.users[user])
+        todo = rebalanced.todos[user]
+
+        resp = send(client, todo)
+        assert resp.status_code == 503
+        assert resp.headers["Retry-After"] == "1"
+
+        resp = send(client, todo)
+        assert resp.status_code == 200
+        if name == "stats":
+            assert resp.json()["todo"] == 1
+        elif name == "export":
+            assert json.loads(resp.text)["title"] == user
+
+
+def test_rebalance_keeps_todos_and_clears_local_caches(shard_urls):
+    names = [f"u{i}" for i in range(8)]
+    with shard_client(shard_urls, SHARDS[:2]) as client:
+        for name in SHARDS[:2]:
+            client.portal.call(register_shard, name)
+        users = {name: sign_up(client, name) for name in names}
+        for name, headers in users.items():
+            create_todo(client, headers, name)
+
+    with shard_client(shard_urls, SHARDS) as client:
+        client.portal.call(register_shard, "b")
+        for name, headers in users.items():
+            assert titles(client, headers) == [name]
+
+        assert client.portal.call(rebalance)
+        assert client.portal.call(plan_moves) == []
+
+        # 이 프로세스에서 옮겼으므로 재시도 없이 새 shard 에서 읽는다
+        for name, headers in users.items():
+            assert titles(client, headers) == [name]
+
+        headers = users[names[0]]
+        create_todo(client, headers, "after")
+        assert titles(client, headers) == [names[0], "after"]
@@ -0,0 +1,263 @@
+import asyncio
+import json
+import threading
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+
+import httpx
+import pytest
+from app.config import settings
+from app.models import EmailOutbox, OutboxStatus
+from app.outbox import enqueue_email
+from app.tasks import OutboxWorker, create_mailgun_client
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+
+@pytest.fixture
+def outbox(session):
+    def create(count=1):
+        messages = [
+            EmailOutbox(recipient=f"user{i}@test.com", subject="s", body="b")
+            for i in range(count)
+        ]
+        session.add_all(messages)
+        session.commit()
+        return messages
+
+    return create
+
+
+def run_worker(async_engine, handler, **kwargs):
+    async def run():
+        transport = httpx.MockTransport(handler)
+        async with httpx.AsyncClient(
+            base_url="https://mailgun.test", transport=transport
+        ) as client:
+            factory = async_sessionmaker(async_engine, expire_on_commit=False)
+            worker = OutboxWorker(factory, client, **kwargs)
+            return await worker.run_once()
+
+    return asyncio.run(run())
+
+
+def load(session):
+    session.expire_all()
+    return session.scalars(select(EmailOutbox).order_by(EmailOutbox.id)).all()
+
+
+def test_worker_sends_pending_messages(session, async_engine, outbox):
+    outbox(3)
+    requests = []
+
+    def handler(request):
+        requests.append(request)
+        return httpx.Response(200, json={"message": "Queued"})
+
+    assert run_worker(async_engine, handler) == 3
+
+    assert len(requests) == 3
+    assert all(request.url.path.endswith("/messages") for request in requests)
+    for message in load(session):
+        assert message.status == OutboxStatus.sent
+        assert message.attempts == 1
+        assert message.sent_at is not None
+
+
+def test_worker_limits_batch_size(session, async_engine, outbox):
+    outbox(3)
+
+    assert run_worker(async_engine, lambda r: httpx.Response(200), batch_size=2) == 2
+    statuses = [message.status for message in load(session)]
+    assert statuses.count(OutboxStatus.sent) == 2
+
+
+def test_worker_retries_with_backoff(session, async_engine, outbox):
+    outbox()
+    before = datetime.now()
+
+    run_worker(async_engine, lambda r: httpx.Response(503), backoff=10)
+
+    [message] = load(session)
+    assert message.status == OutboxStatus.pending
+    assert message.attempts == 1
+    assert message.last_error == "503 API 요청 실패"
+    assert (message.next_attempt_at - before).total_seconds() >= 10
+
+    # backoff 시간이 지나기 전에는 다시 가져가지 않는다
+    assert run_worker(async_engine, lambda r: httpx.Response(200)) == 0
+
+
+def test_worker_fails_after_max_attempts(session, async_engine, outbox):
+    [message] = outbox()
+    message.attempts = 2
+    session.commit()
+
+    run_worker(async_engine, lambda r: httpx.Response(500), max_attempts=3)
+
+    [message] = load(session)
+    assert message.status == OutboxStatus.failed
+    assert message.attempts == 3
+
+
+def test_worker_does_not_retry_client_errors(session, async_engine, outbox):
+    outbox()
+
+    run_worker(async_engine, lambda r: httpx.Response(400))
+
+    [message] = load(session)
+    assert message.status == OutboxStatus.failed
+
+
+def test_worker_retries_network_errors(session, async_engine, outbox):
+    outbox()
+
+    def handler(request):
+        raise httpx.ConnectError("connection refused")
+
+    run_worker(async_engine, handler)
+
+    [message] = load(session)
+    assert message.status == OutboxStatus.pending
+    assert message.last_error == "connection refused"
+
+
+def test_worker_records_unexpected_send_errors(session, async_engine, outbox):
+    outbox(3)
+
+    def handler(request):
+        if b"user0" in request.content:
+            raise RuntimeError("boom")
+        return httpx.Response(200)
+
+    assert run_worker(async_engine, handler, backoff=10) == 3
+
+    failed, *sent = load(session)
+    assert failed.status == OutboxStatus.pending
+    assert failed.attempts == 1
+    assert failed.last_error == "boom"
+    assert failed.next_attempt_at > datetime.now()
+    assert all(message.status == OutboxStatus.sent for message in sent)
+
+
+def test_worker_delivers_others_when_one_delivery_raises(
+    session, async_engine, outbox, monkeypatch
+):
+    outbox(3)
+    deliver = OutboxWorker.deliver
+
+    async def flaky_deliver(self, message):
+        if message.recipient == "user1@test.com":
+            raise RuntimeError("db down")
+        await deliver(self, message)
+
+    monkeypatch.setattr(OutboxWorker, "deliver", flaky_deliver)
+
+    assert run_worker(async_engine, lambda r: httpx.Response(200)) == 3
+
+    statuses = [message.status for message in load(session)]
+    assert statuses == [OutboxStatus.sent, OutboxStatus.pending, OutboxStatus.sent]
+
+
+def test_worker_keeps_running_after_errors(monkeypatch):
+    worker = OutboxWorker(None, None, batch_size=1)
+    results = iter([RuntimeError("db down"), 1, 0])
+
+    async def run_once():
+        result = next(results)
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    sleeps = []
+
+    async def sleep(seconds):
+        sleeps.append(seconds)
+        if len(sleeps) == 2:
+            raise asyncio.CancelledError
+
+    monkeypatch.setattr(worker, "run_once", run_once)
+    monkeypatch.setattr("app.tasks.asyncio.sleep", sleep)
+
+    with pytest.raises(asyncio.CancelledError):
+        asyncio.run(worker.run_forever(poll_interval=5))
+    # 실패한 주기와 빈 주기 뒤에만 쉰다
+    assert sleeps == [5, 5]
+
+
+# Mailgun 대신 응답하는 로컬 HTTP 서버, statuses 에 넣은 상태 코드를 차례로 돌려준다
+@pytest.fixture
+def mailgun_server(monkeypatch):
+    stub = SimpleNamespace(statuses=[], requests=[])
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers["Content-Length"]))
+            stub.requests.append((self.path, self.headers["Authorization"], body))
+            status = stub.statuses.pop(0) if stub.statuses else 200
+            content = json.dumps({"message": "Queued"}).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(content)))
+            self.end_headers()
+            self.wfile.write(content)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    monkeypatch.setattr(
+        settings, "MAILGUN_API_URL", f"http://127.0.0.1:{server.server_port}"
+    )
+    yield stub
+    server.shutdown()
+    server.server_close()
+
+
+def test_worker_retries_against_stub_server(
+    session, async_engine, outbox, mailgun_server
+):
+    outbox(2)
+    mailgun_server.statuses.append(503)
+
+    async def run():
+        async with create_mailgun_client() as client:
+            factory = async_sessionmaker(async_engine, expire_on_commit=False)
+            worker = OutboxWorker(factory, client, backoff=0)
+            return [await worker.run_once(), await worker.run_once()]
+
+    assert asyncio.run(run()) == [2, 1]
+
+    assert len(mailgun_server.requests) == 3
+    for path, authorization, body in mailgun_server.requests:
+        assert path == f"/v3/{settings.MAILGUN_DOMAIN}/messages"
+        assert authorization.startswith("Basic ")
+        assert b"subject=s" in body
+    messages = load(session)
+    assert all(message.status == OutboxStatus.sent for message in messages)
+    assert sorted(message.attempts for message in messages) == [1, 2]
+
+
+def test_retry_delay_is_capped():
+    worker = OutboxWorker(None, None, backoff=5, backoff_max=60)
+
+    assert [worker.retry_delay(n).total_seconds() for n in (1, 2, 3, 5)] == [
+        5,
+        10,
+        20,
+        60,
+    ]
+
+
+def test_enqueue_email(session):
+    enqueue_email(session, "wook@wook.com", "subject", "body")
+    session.commit()
+
+    [message] = load(session)
+    assert message.status == OutboxStatus.pending
+    assert message.attempts == 0